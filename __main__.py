@@ -1,22 +1,29 @@
 import csv
 import json
 import logging
-import xmlrpc.client
+import sys
 from functools import partial
 from operator import is_not
-from typing import Union, Iterable, List
+from typing import Union, Iterable, List, TYPE_CHECKING
 
-import jsonpickle
-
-from game import gui
-from game.game import ConsoleViewer, Game
+from game.checkpoint import CHECKPOINT_INTERVAL, CannotLoadCheckpoint
+from game.constants import CLOCK_MODES, CLOCK_MOVE
+from game.game import ConsoleViewer, Game, TeeViewer
+from game.metrics import timing_report
 from game.quoridor import Board
-from game.trace import load_trace
+from game.trace import get_results, Result, CannotLoadTrace, StreamingTrace, read_trace, \
+    write_trace_file, open_trace, split_compression, BINARY_EXTENSION, STREAM_EXTENSION
+
+# the GUI, the RPC transport and the optional features are imported when used,
+# so that short headless games start fast (see benchmarks.startup)
+if TYPE_CHECKING:
+    from game.rpc import TimedServerProxy
 
 
-def connect_agent(uri: str) -> xmlrpc.client.ServerProxy:
+def connect_agent(uri: str) -> 'TimedServerProxy':
     """Connect to a remote player and return a proxy for the Player object."""
-    return xmlrpc.client.ServerProxy(uri, allow_none=True)
+    from game.rpc import TimedServerProxy
+    return TimedServerProxy(uri)
 
 
 def load_percepts(csvfile: Union[str, Iterable[str]]) -> List[List[int]]:
@@ -38,12 +45,6 @@ def load_percepts(csvfile: Union[str, Iterable[str]]) -> List[List[int]]:
     return percepts
 
 
-class Result:
-    def __init__(self, team_name, rank):
-        self.team_name = team_name
-        self.rank = rank
-
-
 def result_serialize(obj):
     """JSON serializer for objects not serializable by default json code"""
 
@@ -56,6 +57,11 @@ def result_serialize(obj):
 if __name__ == "__main__":
     import argparse
 
+    if sys.argv[1:2] == ["batch"]:
+        from game.batch import main
+        main(sys.argv[2:], f"{sys.argv[0]} batch")
+        sys.exit()
+
     def posfloatarg(string):
         value = float(string)
         if value <= 0:
@@ -63,9 +69,16 @@ if __name__ == "__main__":
                                              string)
         return value
 
+    def nonnegfloatarg(string):
+        value = float(string)
+        if value < 0:
+            raise argparse.ArgumentTypeError("%s is negative" % string)
+        return value
+
     parser = argparse.ArgumentParser(
         usage="%(prog)s [options] AGENT1 AGENT2 [AGENT3 AGENT4]\n" +
-              "       %(prog)s [options] -r FILE")
+              "       %(prog)s [options] -r FILE\n" +
+              "       %(prog)s batch MANIFEST [options]")
     parser.add_argument("agent1", nargs='?', default='human',
                         help="URI of the first agent (blue player) or" +
                              " keyword 'human' (default: human)",
@@ -100,18 +113,62 @@ if __name__ == "__main__":
     g.add_argument("--headless", action="store_true", default=False,
                    help="run without user interface (players cannot be" +
                         " human)")
-    g.add_argument("-r", "--replay", type=argparse.FileType('r'),
+    g.add_argument("-r", "--replay", type=argparse.FileType('rb'),
                    help="replay the trace written in FILE",
                    metavar="FILE")
-    parser.add_argument("-w", "--write", type=argparse.FileType('w'),
+    parser.add_argument("-w", "--write",
                         help="write the trace to FILE for replay with -r" +
-                             " (no effect on replay)",
+                             " (no effect on replay); a FILE ending with" +
+                             " .jsonl is written while the game is played," +
+                             " one ending with " + BINARY_EXTENSION + " is" +
+                             " written in the compact binary format, and" +
+                             " FILE is compressed if it ends with .gz, .bz2" +
+                             " or .xz",
                         metavar="FILE")
+    parser.add_argument("--dedup", action="store_true", default=False,
+                        help="with -w, write the trace as a reference to" +
+                             " the same game already written in the" +
+                             " directory of FILE, if any")
+    parser.add_argument("--timing-report", action="store_true", default=False,
+                        help="print the timing percentiles of every agent at" +
+                             " the end of the game")
+    parser.add_argument("--stream", type=int,
+                        help="stream the game live to web spectators on port" +
+                             " PORT (Server-Sent Events at" +
+                             " /games/live/events)",
+                        metavar="PORT")
+    parser.add_argument("--ponder", action="store_true", default=False,
+                        help="notify the agents of every action so that they" +
+                             " can think during the other players' turns")
+    g = parser.add_argument_group("Checkpoint options")
+    g.add_argument("--checkpoint",
+                   help="save the state of the game to FILE every few steps" +
+                        " so that it can be resumed with --resume; FILE is" +
+                        " removed once the game is finished",
+                   metavar="FILE")
+    g.add_argument("--checkpoint-interval", type=int, default=CHECKPOINT_INTERVAL,
+                   help="number of steps between two checkpoints" +
+                        " (default: %(default)s)",
+                   metavar="STEPS")
+    g.add_argument("--resume",
+                   help="resume the game saved in FILE by --checkpoint with" +
+                        " the agents given (the rule options, time credits" +
+                        " and names are those of the saved game)",
+                   metavar="FILE")
     g = parser.add_argument_group("Rule options (no effect on replay)")
     g.add_argument("-t", "--time", type=posfloatarg,
                    help="set the time credit per player (default: untimed" +
                         " game)",
                    metavar="SECONDS")
+    g.add_argument("--clock", choices=CLOCK_MODES, default=CLOCK_MOVE,
+                   help="time control: credit reset before every move, or one" +
+                        " bank for the whole game, optionally with an" +
+                        " increment (fischer) or delay (bronstein) per move" +
+                        " (default: %(default)s)")
+    g.add_argument("--increment", type=nonnegfloatarg, default=0.0,
+                   help="increment or delay per move of the fischer and" +
+                        " bronstein clocks (default: %(default)s)",
+                   metavar="SECONDS")
     g.add_argument("--board", type=argparse.FileType('r'),
                    help="load initial board from FILE", metavar="FILE")
     g = parser.add_argument_group("Replay options")
@@ -121,12 +178,21 @@ if __name__ == "__main__":
                    metavar="SECONDS", default=2.0)
     g.add_argument("--realtime", action="store_true", default=False,
                    help="replay with the real durations")
+    g.add_argument("--no-delay", action="store_true", default=False,
+                   help="replay the steps as fast as they are shown")
+    g.add_argument("--start", type=int, default=0,
+                   help="skip to step STEP of a replayed trace",
+                   metavar="STEP")
     args = parser.parse_args()
     if args.replay is None and args.headless and \
             (args.agent1 == "human" or args.agent2 == "human" or args.agent3 == "human" or args.agent4 == "human"):
         parser.error("human players are not allowed in headless mode")
+    if args.replay is not None and args.resume is not None:
+        parser.error("argument --resume: not allowed with argument -r/--replay")
 
-    if args.realtime:
+    if args.no_delay:
+        args.speed = 0.0
+    elif args.realtime:
         args.speed = -args.speed
 
     level = logging.INFO
@@ -140,9 +206,9 @@ if __name__ == "__main__":
         # replay mode
         logging.info("Loading trace '%s'", args.replay.name)
         try:
-            trace = load_trace(args.replay)
-            args.replay.close()
-        except (IOError, jsonpickle.UnpicklingError) as e:
+            with args.replay:
+                trace = read_trace(args.replay, args.replay.name)
+        except (IOError, CannotLoadTrace) as e:
             logging.error("Unable to load trace. Reason: %s", e)
             exit(1)
         board = trace.get_initial_board()
@@ -167,6 +233,7 @@ if __name__ == "__main__":
     else:
         if args.gui:
             try:
+                from game import gui
                 viewer = gui.TkViewer()
             except Exception as e:
                 logging.warning("Unable to load GUI, falling back to" +
@@ -180,9 +247,11 @@ if __name__ == "__main__":
         print(args.agent1)
         agents = list(filter(partial(is_not, None),[args.agent1, args.agent2, args.agent3, args.agent4]))
         credits = [None, None, None, None][0:len(agents)]
+        # the game never waits for the GUI, which shows its events at frame rate
+        game_viewer = viewer.queued() if args.gui else viewer
         for i in range(len(agents)):
             if agents[i] == 'human':
-                agents[i] = viewer
+                agents[i] = game_viewer
             else:
                 logging.info("Connecting to agent %s", i)
                 agents[i] = connect_agent(agents[i])
@@ -190,34 +259,84 @@ if __name__ == "__main__":
         if len(args.names) > 0 and len(args.names) > len(agents):
             logging.error("Wrong player names count")
             exit(1)
-        game = Game(agents, board, viewer, credits, None, args.names)
+        streaming = args.write is not None and \
+            split_compression(args.write)[0].endswith(STREAM_EXTENSION)
+        if streaming:
+            try:
+                trace_file = open_trace(args.write, 'w')
+            except IOError as e:
+                logging.error("Unable to write trace. Reason: %s", e)
+                exit(1)
+        stream_server = None
+        if args.stream is not None:
+            from game.stream import StreamServer, StreamingViewer
+            try:
+                stream_server = StreamServer('', args.stream)
+            except OSError as e:
+                logging.error("Unable to stream the game. Reason: %s", e)
+                exit(1)
+            stream_server.start()
+            spectators = StreamingViewer(stream_server.channel('live'), args.names)
+            game_viewer = spectators if game_viewer is None else \
+                TeeViewer(game_viewer, spectators)
+        if args.resume is None:
+            trace = StreamingTrace(board, credits.copy(), args.names, trace_file) \
+                if streaming else None
+            game = Game(agents, board, game_viewer, credits, trace, args.names, args.ponder,
+                        args.clock, args.increment, checkpoint=args.checkpoint,
+                        checkpoint_interval=args.checkpoint_interval)
+        else:
+            logging.info("Resuming game '%s'", args.resume)
+            try:
+                game = Game.resume(args.resume, agents, game_viewer,
+                                   checkpoint_interval=args.checkpoint_interval)
+            except (IOError, CannotLoadCheckpoint) as e:
+                logging.error("Unable to resume game. Reason: %s", e)
+                exit(1)
+            if args.checkpoint is not None:
+                game.checkpoint = args.checkpoint
+            if streaming:
+                # the actions already played are written first
+                trace = StreamingTrace(game.trace.initial_board, game.trace.time_limits,
+                                       game.trace.player_names, trace_file)
+                for step, (player, action, t) in enumerate(game.trace.actions):
+                    trace.add_action(player, action, t)
+                    if step < len(game.trace.metrics):
+                        trace.add_metrics(game.trace.metrics[step])
+                game.trace = trace
 
         def play():
             try:
                 game.play()
             except KeyboardInterrupt:
                 exit()
+            if args.timing_report:
+                print(timing_report(game.trace))
+            if streaming:
+                trace_file.close()
             if args.write is not None:
-                logging.info("Writing trace to '%s'", args.write.name)
+                if not streaming:
+                    logging.info("Writing trace to '%s'", args.write)
                 try:
-                    game.trace.write(args.write)
-                    args.write.close()
+                    if args.dedup:
+                        from game.dedup import write_deduplicated
+                        original = write_deduplicated(game.trace, args.write,
+                                                      written=streaming)
+                        if original is not None:
+                            logging.info("Same game as '%s'", original)
+                    elif not streaming:
+                        write_trace_file(game.trace, args.write)
                 except IOError as e:
                     logging.error("Unable to write trace. Reason: %s", e)
+            if stream_server is not None:
+                stream_server.stop()
             if args.gui:
                 logging.debug("Replaying trace.")
                 viewer.replay(game.trace, args.speed, show_end=True)
             if args.output is not None:
                 logging.debug("Writting results")
                 try:
-                    if len(game.trace.player_names) > 0:
-                        ranking = []
-                        for rankIndex in range(0,len(game.trace.players_ranking)):
-                            list.append(ranking, Result(game.trace.player_names[game.trace.players_ranking[rankIndex]], rankIndex))
-                        for index in filter(lambda x: x not in game.trace.players_ranking, range(0, len(game.trace.player_names))):
-                            list.append(ranking, Result(game.trace.player_names[index], 100))
-                    else:
-                        ranking = [Result(str(game.trace.winner), game.trace.winner)]
+                    ranking = get_results(game.trace)
                     json.dump(ranking, args.output, default=result_serialize)
                     args.output.close()
                 except IOError as e:
@@ -231,5 +350,7 @@ if __name__ == "__main__":
             play()
     else:
         # Replay mode
+        if args.timing_report:
+            print(timing_report(trace))
         logging.debug("Replaying trace.")
-        viewer.replay(trace, args.speed)
+        viewer.replay(trace, args.speed, start=args.start)
@@ -0,0 +1,5 @@
+"""Performance benchmarks of the game engine and of the trace tools.
+
+Run them from the root of the repository, e.g.
+    python -m benchmarks.trace_load
+"""
@@ -0,0 +1,37 @@
+"""Synthetic corpus of game traces for the benchmarks.
+
+Games are played by seeded random agents placing walls and walking
+towards their goal, so that traces have the size and the mix of actions of
+real games.
+"""
+import os
+import random
+from typing import List
+
+from game.board import Board
+from game.game import Game
+from game.simulation import RandomAgent
+from game.trace import Trace
+
+
+def random_trace(rng: random.Random, player_names: List[str] = None) -> Trace:
+    """Play a game between two random agents and return its trace."""
+    game = Game([RandomAgent(rng), RandomAgent(rng)], Board(), time_credits=[60.0, 60.0],
+                player_names=player_names or [])
+    game.play()
+    return game.trace
+
+
+def write_corpus(directory: str, count: int, seed: int = 0, extension: str = '.json') -> List[str]:
+    """Write count random traces in directory and return their paths."""
+    from game.trace import write_trace_file
+
+    rng = random.Random(seed)
+    teams = [f'team{k}' for k in range(8)]
+    paths = []
+    for game in range(count):
+        trace = random_trace(rng, rng.sample(teams, 2))
+        path = os.path.join(directory, f'game{game:05}{extension}')
+        write_trace_file(trace, path)
+        paths.append(path)
+    return paths
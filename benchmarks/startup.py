@@ -0,0 +1,87 @@
+"""Startup time of headless games, measured with python -X importtime.
+
+A fresh interpreter runs the imports of __main__.py and connects the proxy
+of a remote agent, as a headless game does before playing. The benchmark
+fails if the best run takes longer than the budget, or loads one of
+UNUSED_MODULES. Bytecode should be cached (PYTHONDONTWRITEBYTECODE unset),
+as on the game servers.
+
+Usage:
+    python -m benchmarks.startup [--budget MS] [--repeat N]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import List, NamedTuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEADLESS_STARTUP = ("import runpy\n"
+                    "cli = runpy.run_path('__main__.py', run_name='cli')\n"
+                    "cli['connect_agent']('http://localhost:8000')\n")
+
+# modules only imported by the GUI, the asynchronous server, the agents and
+# the trace tools
+UNUSED_MODULES = ('tkinter', 'game.gui', 'game.viewer_queue', 'game.stream', 'game.dedup',
+                  'jsonpickle', 'numpy', 'asyncio', 'xmlrpc.server')
+
+STARTUP_BUDGET = 90.0  # milliseconds
+
+
+class ImportTime(NamedTuple):
+    """Import of a module reported by python -X importtime, in microseconds."""
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def import_times(code: str = HEADLESS_STARTUP) -> List[ImportTime]:
+    """Run code in a fresh interpreter from the root of the repository and
+    return its imports, in the order they end.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # the name is indented by 2 spaces per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        times.append(ImportTime(name.strip(), int(self_us), int(cumulative_us), depth))
+    return times
+
+
+def total_ms(times: List[ImportTime]) -> float:
+    """Return the total import time in milliseconds."""
+    return sum(t.cumulative_us for t in times if t.depth == 0) / 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.startup',
+                                     description='Measure the startup of headless games.')
+    parser.add_argument('--budget', type=float, default=STARTUP_BUDGET,
+                        help='maximum import time in ms (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of runs, the best one is kept (default: %(default)s)')
+    parser.add_argument('--top', type=int, default=10,
+                        help='number of slowest imports shown (default: %(default)s)')
+    args = parser.parse_args()
+
+    times = min((import_times() for _ in range(args.repeat)), key=total_ms)
+    total = total_ms(times)
+    print(f'{len(times)} modules imported in {total:.1f} ms (budget {args.budget:g} ms)')
+    for t in sorted(times, key=lambda t: -t.self_us)[:args.top]:
+        print(f'{t.module:<32}{t.self_us / 1000:>8.2f} ms')
+
+    unused = sorted({t.module for t in times} & set(UNUSED_MODULES))
+    if unused:
+        sys.exit(f'unused modules imported: {", ".join(unused)}')
+    if total > args.budget:
+        sys.exit(f'startup over budget by {total - args.budget:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Compare the schema-based trace decoder with jsonpickle.
+
+Usage:
+    python -m benchmarks.trace_load [--games N] [DIR]
+
+The traces written in DIR (*.json, jsonpickle format) are decoded, or a
+synthetic corpus of N games if DIR is not given.
+"""
+import argparse
+import glob
+import os
+import tempfile
+import time
+from typing import Callable, List
+
+import jsonpickle
+
+from benchmarks.corpus import write_corpus
+from game.trace import decode_trace
+
+
+def bench(decode: Callable[[str], object], texts: List[str], repeat: int) -> float:
+    """Return the best time in seconds to decode all texts."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            decode(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.trace_load',
+                                     description='Compare trace decoders.')
+    parser.add_argument('directory', nargs='?', metavar='DIR',
+                        help='directory of traces (default: synthetic corpus)')
+    parser.add_argument('--games', type=int, default=200,
+                        help='size of the synthetic corpus (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of runs, the best one is kept (default: %(default)s)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.directory is None:
+            paths = write_corpus(directory, args.games)
+        else:
+            paths = sorted(glob.glob(os.path.join(args.directory, '*.json')))
+        texts = []
+        for path in paths:
+            with open(path) as f:
+                texts.append(f.read())
+
+    size = sum(len(text) for text in texts)
+    print(f'{len(texts)} traces, {size / 1e6:.1f} MB')
+    reference = bench(jsonpickle.decode, texts, args.repeat)
+    schema = bench(decode_trace, texts, args.repeat)
+    print(f'{"jsonpickle.decode":<20}{reference:>8.3f} s')
+    print(f'{"decode_trace":<20}{schema:>8.3f} s  ({reference / schema:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+"""Corpus-wide statistics over game traces.
+
+The actions of many traces are loaded once into columnar NumPy arrays (see
+Corpus), so that the statistics are computed in vectorised passes rather
+than by looping over actions in Python. The actions of binary traces are
+read straight from their fixed-width records.
+
+Usage:
+    python -m game.analytics traces/ -j 8
+"""
+import concurrent.futures
+import os
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from game.board import Action
+from game.constants import ACTION_TYPES, MOVE
+from game.exceptions import NoPathError
+from game.trace import ACTION_DTYPE_FIELDS, ACTION_RECORD, Trace, action_array, find_traces, \
+    read_trace_file
+
+ACTION_DTYPE = np.dtype(ACTION_DTYPE_FIELDS)
+assert ACTION_DTYPE.itemsize == ACTION_RECORD.size
+
+PERCENTILES = (50, 90, 99, 100)
+NO_DISTANCE = -1
+
+
+class GameColumns(NamedTuple):
+    """Columns of the actions of a single game."""
+    actions: np.ndarray
+    distance: np.ndarray
+    player_names: List[str]
+    winner: int
+
+
+def pawn_distances(trace: Trace) -> np.ndarray:
+    """Return the length of the shortest path to its goal of the player of
+    every action, once the action is played.
+    """
+    board = trace.get_initial_board()
+    distances = np.empty(len(trace.actions), dtype=np.int16)
+    for step, (player, action, _) in enumerate(trace.actions):
+        board.apply_action(action, player)
+        try:
+            distances[step] = board.get_min_steps_before_victory(player)
+        except NoPathError:
+            distances[step] = NO_DISTANCE
+    return distances
+
+
+def game_columns(trace: Trace, distances: bool = True) -> GameColumns:
+    """Return the columns of a trace."""
+    actions = action_array(trace.actions)
+    distance = pawn_distances(trace) if distances else \
+        np.full(len(actions), NO_DISTANCE, dtype=np.int16)
+    names = list(trace.player_names) or \
+        [f'P{player}' for player in range(len(trace.initial_board.pawns))]
+    return GameColumns(actions, distance, names, trace.winner)
+
+
+def _file_columns(path: str, distances: bool) -> GameColumns:
+    return game_columns(read_trace_file(path), distances)
+
+
+class Corpus:
+
+    """Actions of many games, stored column by column.
+
+    Attributes (one entry per action):
+    game -- index of the game
+    step -- step number of the action in its game, starting from 1
+    player -- the player of the action
+    agent -- index in agents of the name of the player
+    kind -- index of the kind of the action in game.constants.ACTION_TYPES
+    i, j -- coordinates of the action
+    think -- time taken by the player, in seconds
+    distance -- shortest path length of the player to its goal after the
+        action, or NO_DISTANCE if not computed
+
+    Attributes (one entry per game):
+    lengths -- number of actions of every game
+    winners -- index in agents of the winner of every game
+    game_agents -- index in agents of the players of every game, -1 if none
+
+    agents -- names of the agents, sorted
+    """
+
+    def __init__(self, games: Sequence[GameColumns]) -> None:
+        self.agents: List[str] = sorted({name for game in games for name in game.player_names})
+        agent_index = {name: index for index, name in enumerate(self.agents)}
+
+        self.lengths = np.array([len(game.actions) for game in games], dtype=np.int64)
+        self.winners = np.array([agent_index[game.player_names[game.winner]]
+                                 if game.winner < len(game.player_names) else -1
+                                 for game in games], dtype=np.int32)
+        actions = np.concatenate([game.actions for game in games]) if games else \
+            np.empty(0, dtype=ACTION_DTYPE)
+        self.game = np.repeat(np.arange(len(games), dtype=np.int32), self.lengths)
+        starts = np.cumsum(self.lengths) - self.lengths
+        self.step = np.arange(len(actions), dtype=np.int64) - np.repeat(starts, self.lengths) + 1
+        self.player = actions['player'].astype(np.int8)
+        self.kind = actions['kind'].astype(np.int8)
+        self.i = actions['i'].astype(np.int8)
+        self.j = actions['j'].astype(np.int8)
+        self.think = actions['think'].astype(np.float64)
+        self.distance = np.concatenate([game.distance for game in games]) if games else \
+            np.empty(0, dtype=np.int16)
+
+        # agent of every action: look up (game, player) in the table of game players
+        self.game_agents = np.full((len(games), 4), -1, dtype=np.int32)
+        for index, game in enumerate(games):
+            self.game_agents[index, :len(game.player_names)] = [agent_index[name]
+                                                                for name in game.player_names]
+        self.agent = self.game_agents[self.game, self.player]
+
+    def __len__(self) -> int:
+        return len(self.step)
+
+    @classmethod
+    def from_traces(cls, traces: Iterable[Trace], distances: bool = True) -> 'Corpus':
+        """Build the corpus of traces.
+
+        Arguments:
+        traces -- the traces
+        distances -- compute the distance column, which replays every game
+        """
+        return cls([game_columns(trace, distances) for trace in traces])
+
+    @classmethod
+    def from_files(cls, paths: Iterable[str], workers: int = 1,
+                   distances: bool = True) -> 'Corpus':
+        """Build the corpus of the trace files in paths, loaded by a pool of
+        workers processes.
+        """
+        paths = list(find_traces(paths))
+        if workers <= 1:
+            return cls([_file_columns(path, distances) for path in paths])
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            return cls(list(executor.map(_file_columns, paths, [distances] * len(paths),
+                                         chunksize=16)))
+
+    def think_percentiles(self,
+                          percentiles: Sequence[float] = PERCENTILES) -> Dict[str, np.ndarray]:
+        """Return the percentiles of the think time of every agent."""
+        # group the think times by agent with a single sort
+        order = np.argsort(self.agent, kind='stable')
+        think = self.think[order]
+        bounds = np.searchsorted(self.agent[order], np.arange(len(self.agents) + 1))
+        return {name: np.percentile(think[bounds[index]:bounds[index + 1]], percentiles)
+                for index, name in enumerate(self.agents) if bounds[index] < bounds[index + 1]}
+
+    def wall_usage_per_step(self) -> np.ndarray:
+        """Return the fraction of actions that are walls, for every step
+        number (index 0 is unused).
+        """
+        is_wall = (self.kind != ACTION_TYPES.index(MOVE)).astype(np.float64)
+        walls = np.bincount(self.step, weights=is_wall)
+        counts = np.bincount(self.step)
+        return np.divide(walls, counts, out=np.zeros_like(walls), where=counts > 0)
+
+    def first_moves(self) -> Dict[Action, int]:
+        """Return the number of games opened by every action."""
+        first = self.step == 1
+        codes = (self.kind[first].astype(np.int32) * 256 + self.i[first]) * 256 + self.j[first]
+        values, counts = np.unique(codes, return_counts=True)
+        return {(ACTION_TYPES[code // 65536], code // 256 % 256, code % 256): int(count)
+                for code, count in zip(values.tolist(), counts.tolist())}
+
+    def length_histogram(self, bins: int = 20) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the histogram of the number of actions of the games, as
+        given by numpy.histogram.
+        """
+        return np.histogram(self.lengths, bins=bins)
+
+    def win_rates(self) -> Dict[str, float]:
+        """Return the fraction of its games won by every agent."""
+        games = np.bincount(self.game_agents[self.game_agents >= 0], minlength=len(self.agents))
+        wins = np.bincount(self.winners[self.winners >= 0], minlength=len(self.agents))
+        return {name: wins[index] / games[index]
+                for index, name in enumerate(self.agents) if games[index]}
+
+    def mean_distance_per_step(self, player: Optional[int] = None) -> np.ndarray:
+        """Return the mean distance to its goal of the player of the actions
+        of every step number, optionally of a single player.
+        """
+        keep = self.distance != NO_DISTANCE
+        if player is not None:
+            keep &= self.player == player
+        total = np.bincount(self.step[keep], weights=self.distance[keep].astype(np.float64))
+        counts = np.bincount(self.step[keep], minlength=len(total))
+        return np.divide(total, counts, out=np.full_like(total, np.nan), where=counts > 0)
+
+
+def report(corpus: Corpus) -> str:
+    """Return a summary of the statistics of a corpus."""
+    lines = [f'{len(corpus.lengths)} games, {len(corpus)} actions']
+    if not len(corpus):
+        return lines[0]
+
+    lines.append('')
+    lines.append(f'{"agent":<16}{"win rate":>10}' + ''.join(
+        f'{"max" if p == 100 else f"p{p}":>10}' for p in PERCENTILES) + '  think (ms)')
+    percentiles = corpus.think_percentiles()
+    for name, rate in corpus.win_rates().items():
+        lines.append(f'{name[:15]:<16}{rate:>10.1%}' + ''.join(
+            f'{value * 1000:>10.2f}' for value in percentiles.get(name, [])))
+
+    counts, edges = corpus.length_histogram(bins=10)
+    lines.append('')
+    lines.append('game length')
+    for count, low, high in zip(counts, edges, edges[1:]):
+        lines.append(f'{low:>6.0f} - {high:<6.0f}{count:>8}')
+
+    lines.append('')
+    lines.append('first moves')
+    first_moves = sorted(corpus.first_moves().items(), key=lambda item: -item[1])
+    for action, count in first_moves[:5]:
+        lines.append(f'{str(action):<16}{count:>8}')
+
+    usage = corpus.wall_usage_per_step()
+    lines.append('')
+    lines.append('wall usage per step')
+    for start in range(1, len(usage), 10):
+        lines.append(f'{start:>4}-{min(start + 9, len(usage) - 1):<4}'
+                     f'{usage[start:start + 10].mean():>8.1%}')
+    return '\n'.join(lines)
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m game.analytics',
+                                     description='Statistics over a corpus of traces.')
+    parser.add_argument('paths', nargs='+', metavar='PATH', help='trace file or directory')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1,
+                        help='number of loading processes (default: %(default)s)')
+    parser.add_argument('--no-distances', dest='distances', action='store_false', default=True,
+                        help='do not replay the games to compute pawn distances')
+    args = parser.parse_args()
+    print(report(Corpus.from_files(args.paths, args.workers, args.distances)))
+
+
+if __name__ == '__main__':
+    main()
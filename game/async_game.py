@@ -0,0 +1,91 @@
+"""Quoridor game engine running on asyncio.
+
+Game.timed_exec enforces the time credits through the process-wide default
+socket timeout, which forbids running several games in the same process.
+AsyncGame awaits every agent call with asyncio.wait_for and the remaining
+time credit of the agent, plus the same slack as Game, as deadline, so that a
+single event loop can host many concurrent games against remote agents (see
+game.rpc.AsyncServerProxy). Both engines play the same turns, those of
+BaseGame, and only differ in the way they call the agents.
+
+Example:
+    games = [AsyncGame([AsyncServerProxy(a), AsyncServerProxy(b)], Board())
+             for a, b in pairings]
+    asyncio.run(asyncio.gather(*(game.play() for game in games)))
+"""
+import asyncio
+import xmlrpc.client
+from functools import partial
+from typing import Any, Tuple
+
+from game.board import Action
+from game.game import BaseGame, NOTIFY_TIMEOUT
+
+
+class AsyncGame(BaseGame):
+    """Quoridor game whose agents are awaited instead of blocking.
+
+    Agent methods may be coroutine functions (e.g. the methods of an
+    AsyncServerProxy); plain methods of local agents are run in the default
+    executor of the event loop so that they do not block the other games.
+    """
+
+    async def play(self) -> None:
+        """Play the game, from the start or from where it was resumed."""
+        turns = self._turns()
+        call = self._advance(turns)
+        while call is not None:
+            outcome: Any = None
+            try:
+                if call.method == 'notify':
+                    await self._notify(*call.args)
+                else:
+                    outcome = await self.timed_exec(call.method, *call.args, agent=call.agent)
+            except Exception as e:
+                call = self._advance(turns, error=e)
+            else:
+                call = self._advance(turns, outcome)
+
+    async def _notify(self, action: Action) -> None:
+        """Notify the other pondering agents of the action just played."""
+        agents = self._agents_to_notify()
+        results = await asyncio.gather(
+            *(asyncio.wait_for(self._call(agent, 'notify', self.step, self.player, action),
+                               NOTIFY_TIMEOUT)
+              for agent in agents),
+            return_exceptions=True)
+        for agent, result in zip(agents, results):
+            if isinstance(result, Exception):
+                self._stop_notifying(agent, result)
+
+    async def timed_exec(self, fn_name: str, *args: Any, agent: int = None) -> Tuple[Any, float]:
+        """Execute a function with the time limit for the current
+        player.
+
+        This returns a tuple (result, t) with the function result and the time taken
+        in seconds, transport overhead excluded. If agent is None, the agent will be
+        computed from self.player.
+        """
+        if agent is None:
+            agent = self.player % len(self.agents)
+
+        timeout = self._call_timeout(agent)
+        start = self.timer()
+
+        try:
+            result = await asyncio.wait_for(
+                self._call(agent, fn_name, *args, self.credits[agent]), timeout)
+        except asyncio.TimeoutError:
+            raise self._timed_out(agent)
+        except (xmlrpc.client.Fault, OSError) as e:
+            raise self._call_failed(agent, e) from e
+
+        return self._charged(agent, start, result)
+
+    async def _call(self, agent: int, fn_name: str, *args: Any) -> Any:
+        """Call fn_name on agent without blocking the event loop."""
+        method = getattr(self.agents[agent], fn_name)
+        if asyncio.iscoroutinefunction(method):
+            return await method(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, partial(method, *args))
@@ -0,0 +1,194 @@
+"""Batches of matches described by a manifest, e.g. for regression sweeps.
+
+The matches of a manifest are played concurrently by a MatchServer (see
+game.server), their results are appended to a JSON Lines file as soon as
+they finish, and a leaderboard of the players is printed at the end.
+
+A manifest is either a JSON list of matches, in the format of POST /matches
+of game.server, or a CSV file with a header row and the columns agent1 to
+agent4, name1 to name4, time, walls (walls of every player), clock,
+increment and ponder, empty cells taking their default. Both accept a
+repeat field, the number of times the match is played (default: 1). Players
+without a name are named after the URI of their agent, and players sharing
+a name (e.g. an agent playing against itself) are told apart by their seat:
+'http://a:1 #1' and 'http://a:1 #2'.
+
+Usage:
+    python __main__.py batch manifest.csv -j 8 --results results.jsonl
+    python -m game.batch manifest.json -j 8 --traces traces/
+"""
+import csv
+import json
+import logging
+import os
+from typing import Any, Dict, List, NamedTuple, Sequence
+
+from game.server import FINISHED, InvalidMatchError, MatchRequest, MatchServer
+from game.trace import UNRANKED
+
+CSV_BOOLEANS = {'': False, '0': False, 'false': False, 'no': False,
+                '1': True, 'true': True, 'yes': True}
+
+
+def _csv_match(row: Dict[str, str]) -> Dict[str, Any]:
+    """Return the JSON representation of the match of a CSV row."""
+    agents = [row[f'agent{index}'] for index in range(1, 5) if row.get(f'agent{index}')]
+    match: Dict[str, Any] = {'agents': agents}
+    names = [row.get(f'name{index}') or '' for index in range(1, len(agents) + 1)]
+    if any(names):
+        match['names'] = names
+    if row.get('time'):
+        match['time'] = row['time']
+    if row.get('walls'):
+        match['walls'] = [row['walls']] * len(agents)
+    for field in ('clock', 'increment', 'repeat'):
+        if row.get(field):
+            match[field] = row[field]
+    ponder = (row.get('ponder') or '').strip().lower()
+    if ponder not in CSV_BOOLEANS:
+        raise InvalidMatchError(f'invalid ponder value: {ponder!r}')
+    match['ponder'] = CSV_BOOLEANS[ponder]
+    return match
+
+
+def _unique_names(names: Sequence[str]) -> List[str]:
+    """Return names, those appearing several times followed by the seat of
+    their player.
+    """
+    return [f'{name} #{seat}' if names.count(name) > 1 else name
+            for seat, name in enumerate(names, 1)]
+
+
+def read_manifest(path: str) -> List[MatchRequest]:
+    """Return the matches of the manifest at path, a .csv file or JSON,
+    every match repeated as requested.
+
+    Raise InvalidMatchError if a match is malformed.
+    """
+    with open(path, newline='') as f:
+        if path.lower().endswith('.csv'):
+            matches = [_csv_match(row) for row in csv.DictReader(f)]
+        else:
+            matches = json.load(f)
+    if not isinstance(matches, list):
+        raise InvalidMatchError('a manifest is a list of matches')
+
+    requests = []
+    for match in matches:
+        try:
+            repeat = int(match.get('repeat', 1))
+        except (AttributeError, TypeError, ValueError) as e:
+            raise InvalidMatchError(f'malformed match: {e}')
+        request = MatchRequest.from_dict(match)
+        request.names = _unique_names(request.names or request.agents)
+        requests.extend([request] * repeat)
+    return requests
+
+
+def run_batch(requests: Sequence[MatchRequest], workers: int = 8, results_file: str = None,
+              trace_dir: str = None) -> List[Dict[str, Any]]:
+    """Play matches concurrently and return their results, in the order
+    they finished.
+
+    Arguments:
+    requests -- the matches
+    workers -- number of matches played simultaneously
+    results_file -- JSON Lines file to which the results are appended, as
+        soon as they finish, or None
+    trace_dir -- directory where the trace of every match is written, or
+        None to keep no trace
+    """
+    matches = MatchServer(workers, max(len(requests), 1), trace_dir, results_file)
+    matches.start()
+    try:
+        finished = matches.subscribe()
+        for request in requests:
+            matches.submit(request)
+        results: List[Dict[str, Any]] = []
+        for _ in requests:
+            result = finished.get()
+            logging.info('Match %d/%d: %s', len(results) + 1, len(requests), result['status'])
+            results.append(result)
+        return results
+    finally:
+        matches.stop()
+
+
+class Standing(NamedTuple):
+    """Aggregated results of a player over a batch.
+
+    Unranked players (disconnected or expelled) count as last of their
+    match in the average rank.
+    """
+    name: str
+    games: int
+    wins: int
+    average_rank: float
+    average_think: float
+
+
+def leaderboard(results: Sequence[Dict[str, Any]]) -> List[Standing]:
+    """Return the standings of the players of the finished matches, by
+    number of wins then average rank.
+    """
+    games: Dict[str, int] = {}
+    wins: Dict[str, int] = {}
+    ranks: Dict[str, float] = {}
+    think: Dict[str, float] = {}
+    for result in results:
+        if result['status'] != FINISHED:
+            continue
+        names = result['names']
+        for ranking in result['ranking']:
+            name = ranking['team_name']
+            rank = ranking['rank'] if ranking['rank'] != UNRANKED else len(names) - 1
+            games[name] = games.get(name, 0) + 1
+            wins[name] = wins.get(name, 0) + (rank == 0)
+            ranks[name] = ranks.get(name, 0.0) + rank
+        for name, seconds in zip(names, result['think']):
+            think[name] = think.get(name, 0.0) + seconds
+    standings = [Standing(name, count, wins[name], ranks[name] / count, think[name] / count)
+                 for name, count in games.items()]
+    return sorted(standings, key=lambda s: (-s.wins, s.average_rank, s.name))
+
+
+def report(results: Sequence[Dict[str, Any]]) -> str:
+    """Return the leaderboard of a batch as a table."""
+    failed = sum(result['status'] != FINISHED for result in results)
+    lines = [f'{len(results)} matches, {failed} failed', '',
+             f'{"player":<32}{"games":>8}{"wins":>8}{"avg rank":>10}{"think (ms)":>12}']
+    for s in leaderboard(results):
+        lines.append(f'{s.name[:31]:<32}{s.games:>8}{s.wins:>8}{s.average_rank:>10.2f}'
+                     f'{s.average_think * 1000:>12.2f}')
+    return '\n'.join(lines)
+
+
+def main(argv: List[str] = None, prog: str = 'python -m game.batch') -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog=prog,
+                                     description='Play the matches of a manifest.')
+    parser.add_argument('manifest', help='CSV or JSON file of the matches')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1,
+                        help='number of simultaneous matches (default: %(default)s)')
+    parser.add_argument('--results', metavar='FILE',
+                        help='append the result of every match to FILE (JSON Lines)')
+    parser.add_argument('--traces', metavar='DIR',
+                        help='write the trace of every match in DIR')
+    parser.add_argument('-v', '--verbose', action='store_true', default=False,
+                        help='be verbose')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format="%(asctime)s -- %(levelname)s: %(message)s",
+                        level=logging.INFO if args.verbose else logging.WARNING)
+    try:
+        requests = read_manifest(args.manifest)
+    except (OSError, ValueError, InvalidMatchError) as e:
+        parser.error(f'unable to read manifest: {e}')
+    if args.traces is not None:
+        os.makedirs(args.traces, exist_ok=True)
+    print(report(run_batch(requests, args.workers, args.results, args.traces)))
+
+
+if __name__ == '__main__':
+    main()
@@ -432,6 +432,18 @@ class Board:
 
         return self
 
+    def apply_action(self, action: Action, player: int) -> Board:
+        """Play an Action already known to be valid, e.g. replayed from a
+        trace, without checking it.
+        """
+        kind, x, y = action
+        if kind == MOVE:
+            self.pawns[player] = (x, y)
+        else:
+            (self.horiz_walls if kind == WALL_H else self.verti_walls).append((x, y))
+            self.player_walls[player] -= 1
+        return self
+
     def players_on_goal(self) -> Iterator[bool]:
         return map(self.is_player_on_goal, range(self.player_count))
 
@@ -0,0 +1,64 @@
+"""Checkpoints of games in progress, from which they can be resumed.
+
+A checkpoint holds the whole state of a Game (see Game.checkpoint_state)
+and its partial trace. It is a single JSON line followed by the trace in
+the binary format of game.trace.write_binary, cheap to write every few
+steps. The file is replaced atomically, so that a crash while writing
+leaves the previous checkpoint intact.
+"""
+import json
+import os
+from typing import Any, Dict, Mapping, Tuple
+
+from game.trace import CannotLoadTrace, Trace, load_binary, write_binary
+
+CHECKPOINT_FORMAT = 'quoridor-checkpoint'
+CHECKPOINT_VERSION = 1
+# number of steps between two checkpoints
+CHECKPOINT_INTERVAL = 10
+
+
+class CannotLoadCheckpoint(Exception):
+    """Occurs when the checkpoint cannot be loaded."""
+
+
+def write_checkpoint(state: Mapping[str, Any], trace: Trace, path: str) -> None:
+    """Write atomically at path the state of a game and its partial trace.
+
+    Arguments:
+    state -- the state of the game, made of plain JSON types
+    trace -- the trace of the actions played so far
+    path -- the checkpoint file
+    """
+    header = dict(state, format=CHECKPOINT_FORMAT, version=CHECKPOINT_VERSION)
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(json.dumps(header, separators=(',', ':')).encode('utf-8') + b'\n')
+        write_binary(trace, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def read_checkpoint(path: str) -> Tuple[Dict[str, Any], Trace]:
+    """Return the state of a game and its partial trace written at path by
+    write_checkpoint. The trace can be extended.
+
+    Raise CannotLoadCheckpoint if the file is not a valid checkpoint.
+    """
+    with open(path, 'rb') as f:
+        try:
+            state = json.loads(f.readline().decode('utf-8'))
+        except ValueError as e:
+            raise CannotLoadCheckpoint(e) from e
+        if not isinstance(state, dict) or state.get('format') != CHECKPOINT_FORMAT:
+            raise CannotLoadCheckpoint('not a checkpoint')
+        if state.get('version') != CHECKPOINT_VERSION:
+            raise CannotLoadCheckpoint(f"unsupported checkpoint version {state.get('version')}")
+        try:
+            trace = load_binary(f)
+        except CannotLoadTrace as e:
+            raise CannotLoadCheckpoint(e) from e
+    trace.actions = list(trace.actions)
+    trace.metrics = list(trace.metrics)
+    return state, trace
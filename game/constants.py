@@ -15,3 +15,12 @@ PLAYER_1 = 0
 PLAYER_2 = 1
 PLAYER_3 = 2
 PLAYER_4 = 3
+
+
+# Time controls
+
+CLOCK_MOVE = 'move'  # the time credit is reset before every move
+CLOCK_BANK = 'bank'  # a single time credit for the whole game
+CLOCK_FISCHER = 'fischer'  # bank, plus an increment after every move
+CLOCK_BRONSTEIN = 'bronstein'  # bank, the first seconds of every move are free
+CLOCK_MODES = (CLOCK_MOVE, CLOCK_BANK, CLOCK_FISCHER, CLOCK_BRONSTEIN)
@@ -0,0 +1,204 @@
+"""Deduplication of archived games.
+
+Deterministic agents play the same games over and over. trace_hash gives
+every trace a canonical content hash covering its initial board, its actions
+and the names of its players, but not the times of the actions. A trace
+whose hash is already known in its directory is stored as a reference to the
+original file (see game.trace.write_reference), resolved transparently by
+game.trace.read_trace_file.
+
+The hashes known in a directory are kept in its HASH_INDEX file, one
+'<hash> <relative path>' line per original trace, so that a new trace is
+deduplicated without reading the others (see write_deduplicated, used by
+__main__.py --dedup).
+
+Usage:
+    python -m game.dedup traces/ -j 8
+"""
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import struct
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from game.constants import ACTION_TYPES
+from game.trace import CannotLoadTrace, Trace, find_traces, is_reference_file, pack_board, \
+    read_trace_file, write_reference, write_trace_file
+
+HASH_INDEX = '.trace-hashes'
+CANONICAL_ACTION = struct.Struct('<BBBB')  # player, kind, i, j
+KIND_CODES = {kind: code for code, kind in enumerate(ACTION_TYPES)}
+
+
+def trace_hash(trace: Trace) -> str:
+    """Return the canonical hash of a trace, as an hexadecimal string.
+
+    Traces of the same game have the same hash whatever their format and
+    the times of their actions.
+    """
+    digest = hashlib.sha256(pack_board(trace.initial_board))
+    digest.update(json.dumps(list(trace.player_names)).encode('utf-8'))
+    pack = CANONICAL_ACTION.pack
+    digest.update(b''.join(pack(player, KIND_CODES[kind], i, j)
+                           for player, (kind, i, j), _ in trace.actions))
+    return digest.hexdigest()
+
+
+class HashIndex:
+
+    """Hashes of the original traces of a directory, stored in its
+    HASH_INDEX file.
+
+    The file is only appended to, and is read on first use.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = os.path.abspath(directory)
+        self.path = os.path.join(self.directory, HASH_INDEX)
+        self._originals: Optional[Dict[str, str]] = None
+
+    def _load(self) -> Dict[str, str]:
+        if self._originals is None:
+            self._originals = {}
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    for line in f:
+                        digest, _, path = line.rstrip('\n').partition(' ')
+                        self._originals.setdefault(digest, path)
+            except FileNotFoundError:
+                pass
+        return self._originals
+
+    def get(self, digest: str) -> Optional[str]:
+        """Return the path of the original trace of hash digest, or None if
+        unknown or deleted.
+        """
+        path = self._load().get(digest)
+        if path is None:
+            return None
+        path = os.path.join(self.directory, path)
+        return path if os.path.exists(path) else None
+
+    def add(self, digest: str, path: str) -> None:
+        """Record the trace at path as the original of hash digest."""
+        relative = os.path.relpath(os.path.abspath(path), self.directory)
+        self._load()[digest] = relative
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(f'{digest} {relative}\n')
+
+
+def deduplicate_trace(trace: Trace, path: str, index: HashIndex, write: bool = False,
+                      compression: str = None) -> Optional[str]:
+    """Store a trace at path as a reference if its game is already in
+    index, otherwise record it as an original.
+
+    Return the path of the original if a reference was written.
+
+    Arguments:
+    trace -- the trace
+    path -- the trace file
+    index -- the hash index of a directory containing path
+    write -- write trace at path with game.trace.write_trace_file if it is
+        an original, instead of keeping the file already written
+    compression -- a key of game.trace.COMPRESSIONS, when writing
+    """
+    digest = trace_hash(trace)
+    original = index.get(digest)
+    if original is not None and os.path.abspath(original) != os.path.abspath(path):
+        write_reference(trace, original, path, digest)
+        return original
+    if write:
+        write_trace_file(trace, path, compression)
+    if original is None:
+        index.add(digest, path)
+    return None
+
+
+def write_deduplicated(trace: Trace, path: str, compression: str = None,
+                       written: bool = False) -> Optional[str]:
+    """Write a trace like game.trace.write_trace_file, or as a reference
+    if the same game is already in the directory of path.
+
+    Return the path of the original if a reference was written.
+
+    Arguments:
+    trace -- the trace
+    path -- the trace file
+    compression -- a key of game.trace.COMPRESSIONS
+    written -- the trace is already written at path (e.g. streamed), and
+        is only replaced if it is a duplicate
+    """
+    index = HashIndex(os.path.dirname(os.path.abspath(path)))
+    return deduplicate_trace(trace, path, index, not written, compression)
+
+
+def _read_trace(path: str) -> Tuple[str, Optional[Trace]]:
+    """Return the kind of the file at path ('trace', 'reference' or
+    'failed') and its trace if it is not a reference.
+    """
+    try:
+        if is_reference_file(path):
+            return 'reference', None
+        return 'trace', read_trace_file(path)
+    except (OSError, CannotLoadTrace) as e:
+        logging.warning("Unable to load trace '%s'. Reason: %s", path, e)
+        return 'failed', None
+
+
+def _read_all(paths: Iterable[str],
+              workers: int) -> Iterator[Tuple[str, Tuple[str, Optional[Trace]]]]:
+    paths = list(paths)
+    if workers <= 1:
+        for path in paths:
+            yield path, _read_trace(path)
+        return
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        yield from zip(paths, executor.map(_read_trace, paths, chunksize=16))
+
+
+def deduplicate_directory(directory: str, workers: int = 1) -> Dict[str, int]:
+    """Replace by references the duplicated traces of a directory and its
+    subdirectories, keeping the first one of every game in path order.
+
+    Return the number of 'originals', 'duplicates' replaced, existing
+    'references' and traces 'failed' to load.
+
+    Arguments:
+    directory -- the directory of the traces, where HASH_INDEX is stored
+    workers -- number of processes loading the traces
+    """
+    index = HashIndex(directory)
+    counts = {'originals': 0, 'duplicates': 0, 'references': 0, 'failed': 0}
+    for path, (kind, trace) in _read_all(find_traces([directory]), workers):
+        if kind == 'reference':
+            counts['references'] += 1
+        elif trace is None:
+            counts['failed'] += 1
+        elif deduplicate_trace(trace, path, index) is None:
+            counts['originals'] += 1
+        else:
+            counts['duplicates'] += 1
+    return counts
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m game.dedup',
+                                     description='Replace duplicated games by references.')
+    parser.add_argument('directories', nargs='+', metavar='DIRECTORY',
+                        help='directory of traces')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1,
+                        help='number of loading processes (default: %(default)s)')
+    args = parser.parse_args()
+
+    logging.basicConfig(format="%(asctime)s -- %(levelname)s: %(message)s")
+    for directory in args.directories:
+        counts = deduplicate_directory(directory, args.workers)
+        print(f'{directory}: ' + ', '.join(f'{count} {name}' for name, count in counts.items()))
+
+
+if __name__ == '__main__':
+    main()
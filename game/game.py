@@ -18,33 +18,64 @@ along with this program; if not, see <http://www.gnu.org/licenses/>.
 
 """
 import logging
+import os
 import time
 import socket
 from abc import abstractmethod
 from itertools import filterfalse, tee, chain
-from typing import Callable, Tuple, Iterable, Optional, List, cast, Any
+from typing import Callable, Dict, Tuple, Iterable, Optional, List, cast, Any, Generator, \
+    NamedTuple, Type, TypeVar
 
 import xmlrpc.client
 
 from game.board import Board, Action
+from game.checkpoint import CHECKPOINT_INTERVAL, read_checkpoint, write_checkpoint
+from game.constants import CLOCK_MODES, CLOCK_MOVE, CLOCK_FISCHER, CLOCK_BRONSTEIN, MOVE
 from game.exceptions import InvalidActionError
+from game.metrics import MetricsSink, StepMetrics
 from game.quoridor import Agent
-from game.trace import Trace
+from game.rpc import CallTimings
+from game.trace import Trace, board_from_dict, board_to_dict
 
 
 Score = Tuple[int, int]
 
 MAX_STEPS_GAME_OVER: int = 1000
 
+# seconds an agent may take to acknowledge a notification when pondering
+NOTIFY_TIMEOUT: float = 1.0
+
+# seconds a call may outlast the time credit of an agent before being cut
+# off, the expiry itself being decided by BaseGame._charge
+DEADLINE_SLACK: float = 1.0
+
+
+# reason of the players expelled because their agent could not be reached,
+# who are connected again when the game is resumed from its checkpoint
+CONNECTION_LOST = 'Connection lost'
+
 
 class TimeCreditExpiredError(Exception):
     """An agent has expired its time credit."""
 
 
+class AgentDisconnectedError(Exception):
+    """An agent could not be reached, e.g. while its container restarts."""
+
+
 class BoardNotInitializedError(Exception):
     """Occurs when trying to board functions before it was initialized."""
 
 
+def replay_delay(speed: float, t: float) -> float:
+    """Return the duration in replay of a step that took t seconds (see
+    Viewer.replay).
+    """
+    if speed < 0:
+        return -t / speed
+    return speed
+
+
 class Viewer(Agent):
     """Interface for an Quoridor viewer and human agent."""
 
@@ -82,21 +113,57 @@ class Viewer(Agent):
         """Initialize the viewer with an initial board."""
         self._board = board
 
-    def replay(self, trace: Trace, speed: float = 1.0, show_end: bool = False) -> None:
-        """Replay a game given its saved trace."""
-        step = 0
-        self.init_viewer(trace.get_initial_board())
+    def show(self, step: int, board: Board) -> None:
+        """Show the board after step step at once, instead of updating the
+        viewer with the actions of the steps not shown yet (see
+        game.viewer_queue.QueuedViewer).
+        """
+        self._board = board
+
+    def replay(self, trace: Trace, speed: float = 1.0, show_end: bool = False,
+               start: int = 0) -> None:
+        """Replay a game given its saved trace.
+
+        When the viewer falls behind the pace of the replay, the steps late
+        are not shown one by one: the first one on time is shown at once
+        with show.
 
-        for player, action, t in trace.actions:
-            step += 1
+        Arguments:
+        trace -- trace of the game
+        speed -- duration of each step in seconds; if negative, the steps
+            last the time taken by the players divided by -speed (-1 for
+            real time, -4 for 4 times as fast); 0 to show the steps as fast
+            as the viewer renders them
+        show_end -- start with the final state instead of the initial state
+            (interactive viewers only)
+        start -- the first step shown, the previous ones being skipped
+        """
+        start = max(0, min(start, len(trace.actions)))
+        board = trace.snapshots()[start]
+        self.init_viewer(board.clone())
+
+        deadline = time.perf_counter()
+        late = False
+        for step in range(start + 1, len(trace.actions) + 1):
+            player, action, t = trace.actions[step - 1]
+            board.apply_action(action, player)
+            deadline += replay_delay(speed, t)
+            if speed and step < len(trace.actions) and \
+                    time.perf_counter() > deadline + replay_delay(speed, trace.actions[step][2]):
+                # even the next step is late: coalesce this one with it
+                late = True
+                continue
             self.playing(step, player)
-            if speed < 0:
-                time.sleep(-t / speed)
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            if late:
+                self.show(step, board.clone())
+                late = False
             else:
-                time.sleep(speed)
-            self.update(step, action, player)
+                self.update(step, action, player)
 
-        self.finished(step, trace.winner, trace.reason)
+        self.finished(len(trace.actions), trace.winner, trace.reason)
 
     @property
     def board(self) -> Board:
@@ -118,6 +185,41 @@ class HeadlessViewer(Agent):
     def play(self, percepts: Board, player: int, step: int, time_left: float) -> Action: ...
 
 
+class TeeViewer(Viewer):
+    """Viewer forwarding the events of a game to several viewers, the first
+    one playing for human players.
+    """
+
+    def __init__(self, *viewers: Viewer) -> None:
+        super().__init__()
+        self.viewers = viewers
+
+    def init_viewer(self, board: Board) -> None:
+        super().init_viewer(board)
+        for viewer in self.viewers:
+            viewer.init_viewer(board.clone())
+
+    def playing(self, step: int, player: int) -> None:
+        for viewer in self.viewers:
+            viewer.playing(step, player)
+
+    def update(self, step: int, action: Action, player: int) -> None:
+        for viewer in self.viewers:
+            viewer.update(step, action, player)
+
+    def show(self, step: int, board: Board) -> None:
+        super().show(step, board)
+        for viewer in self.viewers:
+            viewer.show(step, board.clone())
+
+    def finished(self, steps: int, winner: int, reason: str = "") -> None:
+        for viewer in self.viewers:
+            viewer.finished(steps, winner, reason)
+
+    def play(self, percepts: Board, player: int, step: int, time_left: float) -> Optional[Action]:
+        return self.viewers[0].play(percepts, player, step, time_left)
+
+
 class ConsoleViewer(Viewer):
     """Simple console viewer."""
 
@@ -130,7 +232,12 @@ class ConsoleViewer(Viewer):
 
     def update(self, step: int, action: Action, player: int) -> None:
         print('Step', step, '- player', player, 'has played', action)
-        self.board.play_action(action, player)
+        self.board.apply_action(action, player)
+        print(self.board)
+
+    def show(self, step: int, board: Board) -> None:
+        super().show(step, board)
+        print('Step', step)
         print(self.board)
 
     def play(self, percepts: Board, player: int, step: int, time_left: float) -> Action:
@@ -153,8 +260,23 @@ class ConsoleViewer(Viewer):
             print('Reason:', reason)
 
 
-class Game:
-    """Main Quoridor game class."""
+class AgentCall(NamedTuple):
+    """Call of method on an agent with args, its time credit excepted."""
+    method: str
+    agent: int
+    args: Tuple[Any, ...]
+
+
+G = TypeVar('G', bound='BaseGame')
+
+
+class BaseGame:
+    """Bookkeeping of a Quoridor game, whatever the way its agents are
+    called.
+
+    The game itself is played by _turns; the engines (Game and
+    game.async_game.AsyncGame) only perform the agent calls it yields.
+    """
 
     def __init__(self,
                  agents: List[Viewer],
@@ -162,7 +284,14 @@ class Game:
                  viewer: Viewer = None,
                  time_credits: List[Optional[float]] = None,
                  trace: Trace = None,
-                 player_names: List[str] = None):
+                 player_names: List[str] = None,
+                 ponder: bool = False,
+                 clock: str = CLOCK_MOVE,
+                 increment: float = 0.0,
+                 metrics_sink: MetricsSink = None,
+                 timer: Callable[[], float] = None,
+                 checkpoint: str = None,
+                 checkpoint_interval: int = CHECKPOINT_INTERVAL):
         """New Quoridor game.
 
         Arguments:
@@ -172,8 +301,30 @@ class Game:
         viewer -- the viewer or None if none should be used
         time_credits -- a sequence of 2 elements containing the time credit in
             seconds for each agent, or None for a time-unlimited agent.
+        trace -- the trace to fill, or None to create a new one
+        player_names -- names of the players, in corresponding order
+        ponder -- notify every agent of the actions of the other players
+            (see Agent.notify) so that they can think during their turns
+        clock -- time control, one of game.constants.CLOCK_MODES: the credit
+            is reset before every move (CLOCK_MOVE, default) or is a bank
+            for the whole game (CLOCK_BANK), receiving increment seconds
+            after every move (CLOCK_FISCHER) or not counting the first
+            increment seconds of every move (CLOCK_BRONSTEIN)
+        increment -- increment or delay in seconds of the clock
+        metrics_sink -- function called with the StepMetrics of every step,
+            or None
+        timer -- function returning the current time in seconds, measuring
+            the time taken by the agents (default: time.perf_counter)
+        checkpoint -- file where the state of the game is saved every
+            checkpoint_interval steps (see Game.resume), or None; it is
+            removed once the game is finished, unless a player was expelled
+            because its agent could not be reached: the last checkpoint
+            saved before is kept to play the game on with that agent
+        checkpoint_interval -- number of steps between two checkpoints
 
         """
+        if clock not in CLOCK_MODES:
+            raise ValueError(f'unknown clock mode: {clock!r}')
         self.agents = agents
         self.board = board
         self.viewer = viewer or HeadlessViewer()
@@ -181,62 +332,301 @@ class Game:
         self.starting_credits = self.credits.copy()
         self.step = 0
         self.player = 0
-        self.trace = trace if trace is not None else Trace(board, self.credits, player_names or [])
+        self.clock = clock
+        self.increment = increment
+        self.metrics_sink = metrics_sink
+        self.timer = timer or time.perf_counter
+        self.checkpoint = checkpoint
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_step = 0
+        self.resumed = False
+        self.trace = trace if trace is not None else Trace(
+            board, self.starting_credits.copy(), player_names or [])
+        self.is_connected: List[bool] = []
+        self.reasons: List[Tuple[Optional[int], str]] = []
+        self.winning_order: List[int] = []
+        # maintained incrementally by play, to check the end of the game cheaply
+        self.on_goal: List[bool] = []
+        self.connected_count = 0
+        self.on_goal_count = 0
+        self.ponder = ponder
+        self.is_notified: List[bool] = []
+
+    @classmethod
+    def resume(cls: Type[G], path: str, agents: List[Viewer], viewer: Viewer = None,
+               metrics_sink: MetricsSink = None, timer: Callable[[], float] = None,
+               checkpoint_interval: int = CHECKPOINT_INTERVAL) -> G:
+        """Return the game saved in the checkpoint file at path, to be
+        played on from the step it was saved at. The game keeps on saving
+        its checkpoints at path.
+
+        Raise game.checkpoint.CannotLoadCheckpoint if the file is not a
+        valid checkpoint.
 
-    def play(self) -> None:
-        """Play the game."""
-        logging.info('Starting new game')
-        self.viewer.init_viewer(self.board.clone())
-        is_connected: List[bool] = [True] * self.board.player_count
-        reasons: List[Tuple[Optional[int], str]] = [(None, "")] * self.board.player_count
-        winning_order: List[int] = []
+        Arguments:
+        path -- the checkpoint file
+        agents -- the agents of the players, in the same order as in the
+            saved game; they are initialized again with the current board,
+            including those expelled because they could not be reached
+        viewer -- the viewer or None if none should be used
+        metrics_sink -- see Game
+        timer -- see Game
+        checkpoint_interval -- see Game
+        """
+        state, trace = read_checkpoint(path)
+        game = cls(agents, board_from_dict(state['board']), viewer, list(state['credits']),
+                   trace, trace.player_names, state['ponder'], state['clock'],
+                   state['increment'], metrics_sink, timer, path, checkpoint_interval)
+        game.starting_credits = list(state['starting_credits'])
+        game.step = game.checkpoint_step = state['step']
+        game.player = state['player']
+        game.is_connected = list(state['is_connected'])
+        game.reasons = [(step, reason) for step, reason in state['reasons']]
+        game.winning_order = list(state['winning_order'])
+        game.is_notified = list(state['is_notified'])
+        for player, (_, reason) in enumerate(game.reasons):
+            if reason.startswith(CONNECTION_LOST):
+                game.is_connected[player] = True
+                game.reasons[player] = (None, "")
+                game.is_notified[player] = game.ponder
+        game.resumed = True
+        return game
+
+    def checkpoint_state(self) -> Dict[str, Any]:
+        """Return the state of the game between two steps, made of plain
+        JSON types, the trace excepted.
+        """
+        return {
+            'step': self.step,
+            'player': self.player,
+            'credits': self.credits,
+            'starting_credits': self.starting_credits,
+            'clock': self.clock,
+            'increment': self.increment,
+            'ponder': self.ponder,
+            'is_connected': self.is_connected,
+            'reasons': self.reasons,
+            'winning_order': self.winning_order,
+            'is_notified': self.is_notified,
+            'board': board_to_dict(self.board),
+        }
+
+    def save_checkpoint(self) -> None:
+        """Save the state of the game and its trace to the checkpoint file."""
+        if self.checkpoint is None:
+            return
+        logging.debug('Saving checkpoint of step %d', self.step)
+        write_checkpoint(self.checkpoint_state(), self.trace, self.checkpoint)
+        self.checkpoint_step = self.step
+
+    def _turns(self) -> Generator[AgentCall, Any, None]:
+        """Play the game, from the start or from where it was resumed,
+        yielding every agent call to the engine.
+
+        The engine sends back the outcome of each call, as returned by its
+        timed_exec for 'initialize' and 'play', or throws in the exception
+        the call raised.
+        """
+        self._start()
 
         for agent in range(self.board.player_count):
-            try:
-                logging.debug('Initializing agent %d', agent)
-                self.timed_exec('initialize', self.board, [agent], agent=agent)
-            except Exception:
-                logging.info('Player %s is flagged as disconnected during initialisation', agent)
-                is_connected[agent] = False
-                reasons[agent] = (self.step, 'disconnected during Initialisation')
+            if self.is_connected[agent]:
+                try:
+                    logging.debug('Initializing agent %d', agent)
+                    yield AgentCall('initialize', agent, (self.board, [agent]))
+                except Exception as e:
+                    self._expel_on_initialize(agent, e)
             self.player = (self.player + 1) % len(self.agents)
 
-        disconnected_msg_template = 'Player %s is flagged as disconnected during play, reason:%s'
-
-        while not self.board.is_finished() and (
-                sum(is_connected) - sum(self.board.players_on_goal())) > 1 and (
-                self.step < MAX_STEPS_GAME_OVER):
-            if is_connected[self.player] and not self.board.is_player_on_goal(self.player):
+        while self._is_running():
+            if self._should_play(self.player):
                 try:
-                    self.step += 1
-                    logging.debug('Asking player %d to play step %d', self.player, self.step)
-                    self.viewer.playing(self.step, self.player)
-                    self.credits[self.player] = self.starting_credits[self.player]
-                    action, t = self.timed_exec('play', self.board, self.player, self.step)
-                    self.board.play_action(action, self.player)
-                    self.viewer.update(self.step, action, self.player)
-                    self.trace.add_action(self.player, action, t)
-
-                    if self.board.is_player_on_goal(self.player):
-                        winning_order.append(self.player)
-
-                except InvalidActionError as e:
-                    logging.info(disconnected_msg_template, self.player, e)
-                    is_connected[self.player] = False
-                    reasons[self.player] = (self.step, f'Invalid action {e}')
-
-                except TimeCreditExpiredError as e:
-                    logging.info(disconnected_msg_template, self.player, e)
-                    is_connected[self.player] = False
-                    reasons[self.player] = (self.step, f'Timeout {e}')
-
+                    self._begin_step()
+                    action, t = yield AgentCall('play', self.player,
+                                                (self.board, self.player, self.step))
+                    self._end_step(action, t)
+                    if self.ponder:
+                        yield AgentCall('notify', self.player, (action,))
                 except Exception as e:
-                    logging.info(disconnected_msg_template, self.player, e)
-                    is_connected[self.player] = False
-                    reasons[self.player] = (self.step, 'Unknown error')
+                    self._expel(e)
 
-            self.player = (self.player + 1) % len(self.agents)
+            self._next_player()
+
+        self._finish()
+
+    @staticmethod
+    def _advance(turns: Generator[AgentCall, Any, None], outcome: Any = None,
+                 error: Exception = None) -> Optional[AgentCall]:
+        """Resume turns with the outcome or the error of the last call and
+        return the next call, or None once the game is finished.
+        """
+        try:
+            if error is not None:
+                return turns.throw(error)
+            return turns.send(outcome)
+        except StopIteration:
+            return None
+
+    def _start(self) -> None:
+        """Reset the bookkeeping of a new game, unless resumed, and show the
+        board.
+        """
+        self.viewer.init_viewer(self.board.clone())
+        if self.resumed:
+            logging.info('Resuming game at step %d', self.step)
+        else:
+            logging.info('Starting new game')
+            self.is_connected = [True] * self.board.player_count
+            self.reasons = [(None, "")] * self.board.player_count
+            self.winning_order = []
+            self.is_notified = [self.ponder] * self.board.player_count
+        # the only scan of all the pawns, then updated as players move or are expelled
+        self.on_goal = list(self.board.players_on_goal())
+        self.connected_count = sum(self.is_connected)
+        self.on_goal_count = sum(self.on_goal)
+
+    def _expel_on_initialize(self, agent: int, error: Exception) -> None:
+        """Flag an agent that failed its initialization because of error as
+        disconnected.
+        """
+        logging.info('Player %s is flagged as disconnected during initialisation', agent)
+        if isinstance(error, AgentDisconnectedError):
+            self._disconnect(agent, f'{CONNECTION_LOST} during Initialisation')
+        else:
+            self._disconnect(agent, 'disconnected during Initialisation')
+
+    def _disconnect(self, player: int, reason: str) -> None:
+        """Flag player as disconnected at the current step for reason."""
+        if self.is_connected[player]:
+            self.is_connected[player] = False
+            self.connected_count -= 1
+        self.reasons[player] = (self.step, reason)
+
+    def _is_running(self) -> bool:
+        """Return True if at least two players can still compete.
+
+        This implies that the board is not finished, i.e., that at least two
+        players are not on their goal.
+        """
+        return self.connected_count - self.on_goal_count > 1 and \
+            self.step < MAX_STEPS_GAME_OVER
+
+    def _next_player(self) -> None:
+        """Pass the turn to the next player, saving a checkpoint if due and
+        no connection was lost since the last one.
+        """
+        self.player = (self.player + 1) % len(self.agents)
+        if self.checkpoint is not None and \
+                self.step - self.checkpoint_step >= self.checkpoint_interval and \
+                not self._lost_connection():
+            self.save_checkpoint()
+
+    def _lost_connection(self) -> bool:
+        """Return True if a player was expelled because its agent could not
+        be reached.
+        """
+        return any(reason.startswith(CONNECTION_LOST) for _, reason in self.reasons)
+
+    def _should_play(self, player: int) -> bool:
+        """Return True if player must be asked for an action."""
+        return self.is_connected[player] and not self.on_goal[player]
+
+    def _begin_step(self) -> None:
+        """Start a new step for the current player."""
+        self.step += 1
+        logging.debug('Asking player %d to play step %d', self.player, self.step)
+        self.viewer.playing(self.step, self.player)
+        if self.clock == CLOCK_MOVE:
+            self.credits[self.player] = self.starting_credits[self.player]
+
+    def _end_step(self, action: Action, t: float) -> None:
+        """Apply the action returned by the current player.
+
+        Raise InvalidActionError if the action is not valid.
+        """
+        start = self.timer()
+        self.board.play_action(action, self.player)
+        if action[0] == MOVE and self.board.is_player_on_goal(self.player):
+            self.on_goal[self.player] = True
+            self.on_goal_count += 1
+        validated = self.timer()
+        credits = self.credits[self.player]
+        if self.clock == CLOCK_FISCHER and credits is not None:
+            self.credits[self.player] = credits + self.increment
+        self.viewer.update(self.step, action, self.player)
+        updated = self.timer()
+        self.trace.add_action(self.player, action, t)
+        self._record_metrics(t, validated - start, updated - validated)
+
+        if self.on_goal[self.player]:
+            self.winning_order.append(self.player)
+
+    def _record_metrics(self, think: float, validate: float, viewer: float) -> None:
+        """Record the timings of the current step."""
+        timings = getattr(self.agents[self.player], 'last_timings', None)
+        if isinstance(timings, CallTimings):
+            metrics = StepMetrics(self.step, self.player,
+                                  timings.serialize + timings.deserialize, timings.connect,
+                                  timings.roundtrip, think, validate, viewer)
+        else:
+            metrics = StepMetrics(self.step, self.player, 0.0, 0.0, think, think, validate, viewer)
+        self.trace.add_metrics(metrics._asdict())
+        if self.metrics_sink is not None:
+            self.metrics_sink(metrics)
+
+    def _agents_to_notify(self) -> List[int]:
+        """Return the agents to notify of the action of the current player."""
+        return [agent for agent in range(self.board.player_count)
+                if agent != self.player and self.is_notified[agent] and self.is_connected[agent]]
+
+    def _stop_notifying(self, agent: int, error: Exception) -> None:
+        logging.info('Agent %d is not notified anymore, reason: %r', agent, error)
+        self.is_notified[agent] = False
+
+    def _expel(self, error: Exception) -> None:
+        """Flag the current player as disconnected because of error."""
+        logging.info('Player %s is flagged as disconnected during play, reason:%s',
+                     self.player, error)
+        if isinstance(error, InvalidActionError):
+            reason = f'Invalid action {error}'
+        elif isinstance(error, TimeCreditExpiredError):
+            reason = f'Timeout {error}'
+        elif isinstance(error, AgentDisconnectedError):
+            reason = f'{CONNECTION_LOST} {error}'
+        else:
+            reason = 'Unknown error'
+        self._disconnect(self.player, reason)
+
+    def _finish(self) -> None:
+        """Rank the players and record the outcome of the game."""
+        winner, ranking, reason = self.rank(self.board, self.is_connected, self.winning_order)
+        self.trace.set_ranking(ranking)
+        self.trace.set_reasons(self.reasons)
+
+        logging.info('Winner: %d', winner)
+        self.trace.set_winner(winner, reason)
+        self.trace.close()
+
+        # I'm under the impression this is only for the gui, probably broken right now
+        self.viewer.finished(self.step, winner, reason)
+        if self.checkpoint is not None and os.path.exists(self.checkpoint):
+            if self._lost_connection():
+                logging.info('Keeping checkpoint of step %d to resume the game',
+                             self.checkpoint_step)
+            else:
+                os.remove(self.checkpoint)
 
+    @classmethod
+    def rank(cls, board: Board, is_connected: List[bool],
+             winning_order: List[int]) -> Tuple[int, List[int], str]:
+        """Return the winner, the ranking of the players and the specific
+        reason of victory of a finished game.
+
+        Arguments:
+        board -- the final board
+        is_connected -- whether every player was still connected at the end
+        winning_order -- the players in the order they reached their goal
+        """
         if sum(is_connected) == 0:
             reason = 'No one could connect.'
         elif sum(is_connected) == 1:
@@ -244,86 +634,104 @@ class Game:
         else:
             reason = ""
 
-        if not winning_order:
-            scores: Tuple[List[Score], List[Score]] = cast(
-                Tuple[List[Score], List[Score]],
-                self.partition(lambda x: cast(bool, is_connected[x[0]]), self.board.get_scores()))
-            disconnected_scores, connected_scores = scores
+        # the scores recompute the shortest paths of every player: once is enough
+        disconnected_scores, connected_scores = cast(
+            Tuple[List[Score], List[Score]],
+            cls.partition(lambda x: cast(bool, is_connected[x[0]]), board.get_scores()))
 
+        if not winning_order:
             if not connected_scores:
                 # whatever, last player wins! ¯\_(ツ)_/¯
-                winner = self.board.player_count - 1
-                self.trace.set_ranking([player for player, _ in disconnected_scores])
+                winner = board.player_count - 1
+                ranking = [player for player, _ in disconnected_scores]
             else:
                 winner_points = connected_scores[0]
                 winner = winner_points[0]
                 logging.info('Score: %d', winner_points[1])
-                self.trace.set_ranking([player for player, _
-                                        in chain(connected_scores, disconnected_scores)])
+                ranking = [player for player, _ in chain(connected_scores, disconnected_scores)]
 
         else:
             winner = winning_order[0]
+            ranking = list(winning_order)
             # Append the last connected player not in the winning_order list
-            connected_pawn = [player for player, _ in self.board.get_scores()
-                              if is_connected[player]]
-            winning_order.extend(player for player in connected_pawn
-                                 if player not in winning_order)
+            ranking.extend(player for player, _ in connected_scores
+                           if player not in winning_order)
 
             # Append disconnected players
-            disconnected_scores, _ = self.partition(
-                lambda x: cast(bool, is_connected[x[0]]), self.board.get_scores())
-            winning_order.extend(player for player, _ in disconnected_scores)
+            ranking.extend(player for player, _ in disconnected_scores)
 
-            self.trace.set_ranking(winning_order)
+        return winner, ranking, reason
 
-        self.trace.set_reasons(reasons)
+    def _call_timeout(self, agent: int) -> Optional[float]:
+        """Return the number of seconds the next call to agent may last, or
+        None if its time is unlimited.
 
-        logging.info('Winner: %d', winner)
-        self.trace.set_winner(winner, reason)
-
-        # I'm under the impression this is only for the gui, probably broken right now
-        self.viewer.finished(self.step, winner, reason)
+        Raise TimeCreditExpiredError if its credit is already expired.
+        """
+        remaining_credits = self.credits[agent]
+        if remaining_credits is None:  # None == unlimited.
+            return None
+        logging.debug('Time left for agent %d: %f', agent, remaining_credits)
+        if remaining_credits < 0:
+            raise TimeCreditExpiredError
+        return self._deadline(remaining_credits) + DEADLINE_SLACK
 
-    def timed_exec(self, fn_name: str, *args: Any, agent: int = None) -> Tuple[Any, float]:
-        """Execute a function with the time limit for the current
-        player.
+    def _timed_out(self, agent: int) -> TimeCreditExpiredError:
+        """Return the error to raise when a call to agent was cut off."""
+        self.credits[agent] = -1.0  # ensure it is counted as expired
+        return TimeCreditExpiredError()
 
-        This returns a tuple (result, t) with the function result and the time taken
-        in seconds. If agent is None, the agent will be computed from
-        self.player.
+    def _call_failed(self, agent: int, error: Exception) -> Exception:
+        """Return the error to raise when a call to agent failed with error,
+        either an xmlrpc.client.Fault or an OSError.
         """
-        if agent is None:
-            agent = self.player % len(self.agents)
+        if isinstance(error, xmlrpc.client.Fault):
+            logging.error('Agent %d was unable to play step %d. Reason: %s', agent, self.step,
+                          error)
+            return InvalidActionError()
+        logging.error('Agent %d could not be reached at step %d. Reason: %s', agent, self.step,
+                      error)
+        return AgentDisconnectedError(error)
+
+    def _charged(self, agent: int, start: float, result: Any) -> Tuple[Any, float]:
+        """Charge agent for the call started at start and return the tuple
+        (result, t) with the time taken, transport overhead excluded.
+        """
+        elapsed = max(0.0, self.timer() - start - self._transport_overhead(agent))
+        logging.info('Step %d: received result %s in %fs', self.step, result, elapsed)
+        self._charge(agent, elapsed)
+        return result, elapsed
 
-        remaining_credits = self.credits[agent]
-        if remaining_credits is not None:  # None == unlimited.
-            logging.debug('Time left for agent %d: %f', agent, remaining_credits)
-            if remaining_credits < 0:
-                raise TimeCreditExpiredError
-            socket.setdefaulttimeout(remaining_credits + 1)
-        start = time.time()
+    def _deadline(self, remaining_credits: float) -> float:
+        """Return the number of seconds an agent with remaining_credits may
+        take before its credit expires.
+        """
+        if self.clock == CLOCK_BRONSTEIN:
+            return remaining_credits + self.increment
+        return remaining_credits
 
-        try:
-            result = getattr(self.agents[agent], fn_name)(*args, self.credits[agent])
-        except socket.timeout:
-            self.credits[agent] = -1.0  # ensure it is counted as expired
-            raise TimeCreditExpiredError
-        except (socket.error, xmlrpc.client.Fault) as e:
-            logging.error('Agent %d was unable to play step %d. Reason: %s', agent, self.step, e)
-            raise InvalidActionError
+    def _transport_overhead(self, agent: int) -> float:
+        """Return the time spent by the server serializing the last call to
+        agent and connecting to it, which is not charged to the agent.
+        """
+        timings = getattr(self.agents[agent], 'last_timings', None)
+        return timings.overhead if isinstance(timings, CallTimings) else 0.0
 
-        elapsed = time.time() - start
-        logging.info('Step %d: received result %s in %fs', self.step, result, elapsed)
+    def _charge(self, agent: int, elapsed: float) -> None:
+        """Deduct elapsed seconds from the time credit of agent.
 
+        Raise TimeCreditExpiredError if the credit is exhausted.
+        """
+        remaining_credits = self.credits[agent]
         if remaining_credits is not None:
+            if self.clock == CLOCK_BRONSTEIN:
+                elapsed = max(0.0, elapsed - self.increment)
             remaining_credits -= elapsed
             self.credits[agent] = remaining_credits
             logging.debug('New time credit for agent %d: %f', agent, remaining_credits)
             if remaining_credits < -0.5:  # small epsilon to be sure
                 raise TimeCreditExpiredError
 
-        return result, elapsed
-
     @staticmethod
     def partition(pred: Callable[..., bool], iterable: Iterable) -> Tuple[List, List]:
         """Use a predicate to partition entries into false entries and
@@ -332,3 +740,66 @@ class Game:
         # partition(is_odd, range(10)) --> 0 2 4 6 8   and  1 3 5 7 9
         t1, t2 = tee(iterable)
         return list(filterfalse(pred, t1)), list(filter(pred, t2))
+
+
+class Game(BaseGame):
+    """Main Quoridor game class, blocking on every agent call."""
+
+    def play(self) -> None:
+        """Play the game, from the start or from where it was resumed."""
+        turns = self._turns()
+        call = self._advance(turns)
+        while call is not None:
+            outcome: Any = None
+            try:
+                if call.method == 'notify':
+                    self._notify(*call.args)
+                else:
+                    outcome = self.timed_exec(call.method, *call.args, agent=call.agent)
+            except Exception as e:
+                call = self._advance(turns, error=e)
+            else:
+                call = self._advance(turns, outcome)
+
+    def _notify(self, action: Action) -> None:
+        """Notify the other pondering agents of the action just played.
+
+        Notifications happen between two timed calls, so they are never
+        counted in a time credit. An agent failing to acknowledge one in
+        NOTIFY_TIMEOUT seconds is not notified anymore.
+        """
+        timeout = socket.getdefaulttimeout()
+        socket.setdefaulttimeout(NOTIFY_TIMEOUT)
+        try:
+            for agent in self._agents_to_notify():
+                try:
+                    self.agents[agent].notify(self.step, self.player, action)
+                except Exception as e:
+                    self._stop_notifying(agent, e)
+        finally:
+            socket.setdefaulttimeout(timeout)
+
+    def timed_exec(self, fn_name: str, *args: Any, agent: int = None) -> Tuple[Any, float]:
+        """Execute a function with the time limit for the current
+        player.
+
+        This returns a tuple (result, t) with the function result and the time taken
+        in seconds, transport overhead excluded. If agent is None, the agent will be
+        computed from self.player.
+        """
+        if agent is None:
+            agent = self.player % len(self.agents)
+
+        timeout = self._call_timeout(agent)
+        if timeout is not None:
+            socket.setdefaulttimeout(timeout)
+        start = self.timer()
+
+        try:
+            result = getattr(self.agents[agent], fn_name)(*args, self.credits[agent])
+        except socket.timeout:
+            raise self._timed_out(agent)
+        except (xmlrpc.client.Fault, socket.error) as e:
+            raise self._call_failed(agent, e) from e
+
+        return self._charged(agent, start, result)
@@ -0,0 +1,107 @@
+"""Geometry and colors of the drawing of a board.
+
+Shared by the Tk viewer (game.gui) and the headless renderer (game.render),
+so that this module must not depend on Tk.
+"""
+from typing import Tuple, Union
+
+XY = Union[int, float]
+Coordinates = Tuple[XY, XY]
+TkObject = Tuple[int, int, str]
+
+
+class BoardGeometry:
+    """Positions in pixels of the elements of a drawn board."""
+    # size of a tile
+    w_tile = 50
+    # width of a wall
+    w_wall = 20
+    # size of a cell (including the walls)
+    w = w_tile + w_wall
+    # diameter of a pawn
+    w_pawn = 4 * w_tile / 5
+    # length of a wall
+    l_wall = 2 * w_tile + w_wall
+    # the x offset before the board begins
+    x_offset = 20
+    # the y offset before the board begins
+    y_offset = 20
+    # the total x offset on the left
+    left_off_x = x_offset + w_wall / 2
+    # the total y offset on the left
+    left_off_y = y_offset + w_wall / 2
+    # the total x offset on the right
+    right_off_x = left_off_x + w_tile * 9 + w_wall * 8
+    # the total y offset on the right
+    right_off_y = left_off_y + w_tile * 9 + w_wall * 8
+
+    pawn_colors = ('#3465A4', '#EF2929', '#008080', '#ffff00')  # pawn player colors
+    pawn_outlin = ('#C2D0E3', '#FABEBE', '#000000', '#000000')
+    tile_color = '#EEEEEC'
+    tile_backg = '#631919'
+    wall_color = '#F1E2BE'
+    wall_outli = ('#3465A4', '#EF2929', '#008080', '#ffff00')
+    wall_backg = '#999999'
+
+    def get_tile_xy(self, i: XY, j: XY) -> Coordinates:
+        y = self.y_offset + (i + .5) * self.w
+        x = self.x_offset + (j + .5) * self.w
+        return x, y
+
+    def get_wall_xy(self, i: XY, j: XY) -> Coordinates:
+        y = self.y_offset + (i + 1) * self.w
+        x = self.x_offset + (j + 1) * self.w
+        return x, y
+
+    def get_pawn_coords(self, i: int, j: int) -> Tuple[XY, XY, XY, XY]:
+        x, y = self.get_tile_xy(i, j)
+        return (x - self.w_pawn / 2, y - self.w_pawn / 2,
+                x + self.w_pawn / 2, y + self.w_pawn / 2)
+
+    def get_h_wall_coords(self, i: int, j: int) -> Tuple[XY, XY, XY, XY]:
+        x, y = self.get_wall_xy(i, j)
+        return (x - self.l_wall / 2, y - self.w_wall / 2 + 2,
+                x + self.l_wall / 2, y + self.w_wall / 2 - 3)
+
+    def get_v_wall_coords(self, i: int, j: int) -> Tuple[XY, XY, XY, XY]:
+        x, y = self.get_wall_xy(i, j)
+        return (x - self.w_wall / 2 + 2, y - self.l_wall / 2,
+                x + self.w_wall / 2 - 3, y + self.l_wall / 2)
+
+    def get_object(self, x: XY, y: XY) -> TkObject:
+        if (x < self.left_off_x) or (
+                y < self.left_off_y) or (
+                x >= self.right_off_x) or (
+                y >= self.right_off_y):
+            return -1, -1, 'border'
+
+        x_rest = (x - self.left_off_x) % self.w
+        y_rest = (y - self.left_off_y) % self.w
+
+        if x_rest < self.w_tile and y_rest < self.w_tile:
+            column = int((x - self.left_off_x) / self.w)
+            row = int((y - self.left_off_y) / self.w)
+            return row, column, 'tile'
+
+        if x_rest > self.w_tile > y_rest:
+            column = int((x - self.left_off_x) / self.w)
+            if (y - self.left_off_y) < (self.w + self.w_tile / 2):
+                row = 0
+            elif (y - self.left_off_y) >= (self.w * 7 + self.w_tile / 2):
+                row = 7
+            else:
+                row = 1 + int((y - (self.left_off_y + self.w + self.w_tile / 2)) / (
+                        self.w_tile + self.w_wall))
+            return row, column, 'bg_v_wall'
+
+        else:
+            row = int((y - self.left_off_y) / self.w)
+            if (x - self.x_offset) < (self.w + self.w_tile / 2):
+                column = 0
+            elif (x - self.x_offset) >= (self.w * 7 + self.w_tile / 2):
+                column = 7
+            else:
+                column = 1 + int((x - (self.left_off_x + self.w + self.w_tile / 2)) / (
+                        self.w_tile + self.w_wall))
+
+            return row, column, 'bg_h_wall'
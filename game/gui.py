@@ -17,19 +17,20 @@ along with this program; if not, see <http://www.gnu.org/licenses/>.
 
 """
 import threading
+import time
 from copy import deepcopy
-from tkinter import Button, Canvas, Event, Frame, Label, Tk, LEFT, RIGHT, DISABLED, NORMAL
+from tkinter import Button, Canvas, Event, Frame, Label, Tk, LEFT, RIGHT, DISABLED, HIDDEN, \
+    NORMAL
 from tkinter.font import Font
-from typing import Tuple, List, Union, Optional, TYPE_CHECKING
+from typing import Callable, Dict, Tuple, List, Optional, Sequence, TYPE_CHECKING
 
 from game.board import Board, Action
 from game.constants import WALL_V, WALL_H, MOVE
-from game.game import Viewer
+from game.game import Viewer, replay_delay
+from game.geometry import BoardGeometry, Coordinates, TkObject, XY
+from game.viewer_queue import FRAME_RATE, QUEUE_CAPACITY, QueuedViewer
 from game.trace import Trace
 
-XY = Union[int, float]
-
-
 if TYPE_CHECKING:
     # One of the tests fails on this import, so we'll isolate it to type checkers.
     from typing import Protocol
@@ -42,58 +43,28 @@ if TYPE_CHECKING:
 else:
     TkEvent = Event
 
-Coordinates = Tuple[XY, XY]
 Wall = Tuple[int, int, bool]
-TkObject = Tuple[int, int, str]
 
 
-class TkViewer(Viewer):
+class TkViewer(Viewer, BoardGeometry):
     """Graphical viewer using Tk."""
-    # size of a tile
-    w_tile = 50
-    # width of a wall
-    w_wall = 20
-    # size of a cell (including the walls)
-    w = w_tile + w_wall
-    # diameter of a pawn
-    w_pawn = 4 * w_tile / 5
-    # length of a wall
-    l_wall = 2 * w_tile + w_wall
-    # the x offset before the board begins
-    x_offset = 20
-    # the y offset before the board begins
-    y_offset = 20
     # the separation between the tiles and the unused walls
     y_separa = 10
     # the width of the scoreboard
     scoreboard_width = 300
     # the y distance between the walls on the scoreboard
-    y_wall_scoreboard_offset = y_offset
+    y_wall_scoreboard_offset = BoardGeometry.y_offset
     # the x distance between the walls on the scoreboard
     x_wall_scoreboard_offset = 25
     # the x offset of the scoreboard
-    x_scoreboard_offset = (scoreboard_width - 5 * w_wall - 4 * x_wall_scoreboard_offset) / 2
+    x_scoreboard_offset = (scoreboard_width - 5 * BoardGeometry.w_wall -
+                           4 * x_wall_scoreboard_offset) / 2
     # the y offset of the scoreboard
-    y_scoreboard_offset = y_offset / 2
+    y_scoreboard_offset = BoardGeometry.y_offset / 2
     # the fontsize used in the scoreboard
     scoreboard_font_size = 14
-    # the total x offset on the left
-    left_off_x = x_offset + w_wall / 2
-    # the total y offset on the left
-    left_off_y = y_offset + w_wall / 2
-    # the total x offset on the right
-    right_off_x = left_off_x + w_tile * 9 + w_wall * 8
-    # the total y offset on the right
-    right_off_y = left_off_y + w_tile * 9 + w_wall * 8
 
     names = ('Blue', 'Red', 'Teal', 'Yellow')  # player names
-    pawn_colors = ('#3465A4', '#EF2929', '#008080', '#ffff00')  # pawn player colors
-    pawn_outlin = ('#C2D0E3', '#FABEBE', '#000000', '#000000')
-    tile_color = '#EEEEEC'
-    tile_backg = '#631919'
-    wall_color = '#F1E2BE'
-    wall_outli = ('#3465A4', '#EF2929', '#008080', '#ffff00')
-    wall_backg = '#999999'
 
     # these defaults are all overwritten during the normal game flow.
     # it was hacked around so that we could type-hint without refactoring.
@@ -103,10 +74,14 @@ class TkViewer(Viewer):
     tile_ids: List[List[int]] = []
     bg_h_wall_ids: List[List[int]] = []
     bg_v_wall_ids: List[List[int]] = []
-    h_wall_ids: List[List[int]] = []
-    v_wall_ids: List[List[int]] = []
     scoreboard_wall_ids: List[List[int]] = []
     pawn_ids: List[int] = []
+    # the retained scene: what is drawn, so that only the differences with a
+    # new board are redrawn
+    h_wall_ids: Dict[Tuple[int, int], int] = {}
+    v_wall_ids: Dict[Tuple[int, int], int] = {}
+    scene_pawns: List[Tuple[int, int]] = []
+    scene_walls: List[int] = []
     scoreboard: Canvas = None  # type: ignore
     wall_titles: List[int] = []
     status: Label = None  # type: ignore
@@ -120,21 +95,12 @@ class TkViewer(Viewer):
     # these are used during replays
     trace: Trace = None  # type: ignore
     speed: float = 0
-    boards: List[Board] = []
+    deadline: float = 0
+    boards: Sequence[Board] = []
 
     ###########################################################################
     # Helper functions
 
-    def get_tile_xy(self, i: XY, j: XY) -> Coordinates:
-        y = self.y_offset + (i + .5) * self.w
-        x = self.x_offset + (j + .5) * self.w
-        return x, y
-
-    def get_wall_xy(self, i: XY, j: XY) -> Coordinates:
-        y = self.y_offset + (i + 1) * self.w
-        x = self.x_offset + (j + 1) * self.w
-        return x, y
-
     def get_wall_scoreboard_xy(self, player: int, wall_num: int) -> Coordinates:
         y = (self.scoreboard_font_size +
              self.y_scoreboard_offset +
@@ -148,44 +114,6 @@ class TkViewer(Viewer):
              self.x_wall_scoreboard_offset)
         return x, y
 
-    def get_object(self, x: XY, y: XY) -> TkObject:
-        if (x < self.left_off_x) or (
-                y < self.left_off_y) or (
-                x >= self.right_off_x) or (
-                y >= self.right_off_y):
-            return -1, -1, 'border'
-
-        x_rest = (x - self.left_off_x) % self.w
-        y_rest = (y - self.left_off_y) % self.w
-
-        if x_rest < self.w_tile and y_rest < self.w_tile:
-            column = int((x - self.left_off_x) / self.w)
-            row = int((y - self.left_off_y) / self.w)
-            return row, column, 'tile'
-
-        if x_rest > self.w_tile > y_rest:
-            column = int((x - self.left_off_x) / self.w)
-            if (y - self.left_off_y) < (self.w + self.w_tile / 2):
-                row = 0
-            elif (y - self.left_off_y) >= (self.w * 7 + self.w_tile / 2):
-                row = 7
-            else:
-                row = 1 + int((y - (self.left_off_y + self.w + self.w_tile / 2)) / (
-                        self.w_tile + self.w_wall))
-            return row, column, 'bg_v_wall'
-
-        else:
-            row = int((y - self.left_off_y) / self.w)
-            if (x - self.x_offset) < (self.w + self.w_tile / 2):
-                column = 0
-            elif (x - self.x_offset) >= (self.w * 7 + self.w_tile / 2):
-                column = 7
-            else:
-                column = 1 + int((x - (self.left_off_x + self.w + self.w_tile / 2)) / (
-                        self.w_tile + self.w_wall))
-
-            return row, column, 'bg_h_wall'
-
     ###########################################################################
     # UI construction
 
@@ -202,11 +130,25 @@ class TkViewer(Viewer):
         self.is_playing: bool = False
         self.step: int = 0
         self.after_id = None
+        self.queue: Optional[QueuedViewer] = None
+        self.frame_rate: float = FRAME_RATE
 
     def init_viewer(self, board: Board) -> None:
         super().init_viewer(board)
         self.barrier.set()
 
+    def queued(self, capacity: int = QUEUE_CAPACITY,
+               frame_rate: float = FRAME_RATE) -> QueuedViewer:
+        """Return a viewer to give to the game (and to use as human agent)
+        instead of this one, so that the game never waits for the GUI.
+
+        Its events are drained by the Tk event loop frame_rate times per
+        second.
+        """
+        self.queue = QueuedViewer(self, capacity)
+        self.frame_rate = frame_rate
+        return self.queue
+
     def run(self) -> None:
         """Launch the GUI."""
         if self.running:
@@ -235,10 +177,10 @@ class TkViewer(Viewer):
         wall_ids = [[0] * (self.board.cols - 1) for _ in range(self.board.rows - 1)]
         self.bg_h_wall_ids = wall_ids
         self.bg_v_wall_ids = deepcopy(wall_ids)
-        self.h_wall_ids = deepcopy(wall_ids)
-        self.v_wall_ids = deepcopy(wall_ids)
-        self.scoreboard_wall_ids = [[0 for _ in range(self.board.starting_wall_count)]
-                                    for _ in range(len(self.board.pawns))]
+        self.h_wall_ids = {}
+        self.v_wall_ids = {}
+        # a player never has more walls than at the beginning
+        self.scoreboard_wall_ids = [[0] * walls for walls in self.board.player_walls]
         self.pawn_ids = [0 for _ in range(len(self.board.pawns))]
 
         for i in range(self.board.rows):
@@ -298,6 +240,8 @@ class TkViewer(Viewer):
 
         # Draw board
         self.draw_board(self.board)
+        if self.queue is not None:
+            self._drain_queue()
 
         # Launch event loop
         try:
@@ -344,10 +288,21 @@ class TkViewer(Viewer):
         self.set_substatus("")
 
     def update(self, step: int, action: Action, player: int) -> None:
-        self.board.play_action(action, player)
+        # the game has already validated the action
+        self.board.apply_action(action, player)
         if self.root is not None:
             self.root.after_idle(self.redraw_board, self.board)
 
+    def show(self, step: int, board: Board) -> None:
+        # This method may only be called from the gui thread.
+        super().show(step, board)
+        self.redraw_board(board)
+
+    def _drain_queue(self) -> None:
+        # This method may only be called from the gui thread.
+        self.queue.drain()  # type: ignore
+        self.root.after(int(1000 / self.frame_rate), self._drain_queue)
+
     def draw_board(self, board: Board) -> None:
         # creating the background
         self.canvas.create_rectangle(
@@ -398,15 +353,12 @@ class TkViewer(Viewer):
 
         # creating the wall slots (on the scoreboard)
         for player in range(self.board.player_count):
-            i, j = self.board.pawns[player]
-            x, y = self.get_tile_xy(i, j)
             self.pawn_ids[player] = self.canvas.create_oval(
-                x - self.w_pawn / 2, y - self.w_pawn / 2,
-                x + self.w_pawn / 2, y + self.w_pawn / 2,
+                *self.get_pawn_coords(*self.board.pawns[player]),
                 fill=self.pawn_colors[player],
                 outline=self.pawn_outlin[player],
                 width=2, tags=['pawns'])
-            for wall_num in range(self.board.player_walls[player]):
+            for wall_num in range(len(self.scoreboard_wall_ids[player])):
                 x, y = self.get_wall_scoreboard_xy(player, wall_num)
                 self.scoreboard.create_rectangle(
                     x - self.w_wall / 2, y - self.l_wall / 2,
@@ -419,72 +371,66 @@ class TkViewer(Viewer):
                     width=2,
                     tags=['scoreboard_walls'])
 
-        for i, j in self.board.horiz_walls:
-            x, y = self.get_wall_xy(i, j)
-            self.h_wall_ids[i][j] = self.canvas.create_rectangle(
-                x - self.l_wall / 2, y - self.w_wall / 2 + 2,
-                x + self.l_wall / 2, y + self.w_wall / 2 - 3,
-                fill=self.wall_color, width=2,
-                tags=['h_walls'])
-
-        for i, j in self.board.verti_walls:
-            x, y = self.get_wall_xy(i, j)
-            self.v_wall_ids[i][j] = self.canvas.create_rectangle(
-                x - self.w_wall / 2 + 2, y - self.l_wall / 2,
-                x + self.w_wall / 2 - 3, y + self.l_wall / 2,
-                fill=self.wall_color, width=2,
-                tags=['v_walls'])
+        self.scene_pawns = [(i, j) for i, j in self.board.pawns]
+        self.scene_walls = [len(walls) for walls in self.scoreboard_wall_ids]
+        self.h_wall_ids.clear()
+        self.v_wall_ids.clear()
+        self.redraw_board(self.board)
+
+    def create_h_wall(self, i: int, j: int) -> int:
+        return self.canvas.create_rectangle(
+            *self.get_h_wall_coords(i, j),
+            fill=self.wall_color, width=2,
+            tags=['h_walls'])
+
+    def create_v_wall(self, i: int, j: int) -> int:
+        return self.canvas.create_rectangle(
+            *self.get_v_wall_coords(i, j),
+            fill=self.wall_color, width=2,
+            tags=['v_walls'])
 
     def redraw_board(self, board: Board) -> None:
-        """Draw a board with all unselected tiles."""
-        self.canvas.delete('pawns')
-        self.canvas.delete('h_walls')
-        self.canvas.delete('v_walls')
-        self.scoreboard.delete('scoreboard_walls')
+        """Show a board with all unselected tiles.
 
-        for i in range(board.rows):
-            for j in range(board.cols):
-                # ensure coherent unselected appearance
-                self.mark_object((i, j, 'tile'))
+        Only the differences with the scene currently drawn are applied:
+        pawns that moved, walls added or removed and wall counters changed.
+        """
+        if self.selection is not None:
+            # ensure coherent unselected appearance
+            self.mark_object(self.selection)
+            self.selection = None  # type: ignore
 
-        for player in range(self.board.player_count):
-            i, j = self.board.pawns[player]
-            x, y = self.get_tile_xy(i, j)
-            self.pawn_ids[player] = self.canvas.create_oval(
-                x - self.w_pawn / 2, y - self.w_pawn / 2,
-                x + self.w_pawn / 2, y + self.w_pawn / 2,
-                fill=self.pawn_colors[player],
-                outline=self.pawn_outlin[player],
-                width=2, tags=['pawns'])
-            for wall_num in range(self.board.player_walls[player]):
-                x, y = self.get_wall_scoreboard_xy(player, wall_num)
-                self.scoreboard_wall_ids[player][wall_num] = self.scoreboard.create_rectangle(
-                    x - self.w_wall / 2 + 1, y - self.l_wall / 2 + 1,
-                    x + self.w_wall / 2, y + self.l_wall / 2,
-                    fill=self.wall_color, outline=self.wall_outli[player],
-                    width=2,
-                    tags=['scoreboard_walls'])
+        for player, (i, j) in enumerate(board.pawns):
+            if self.scene_pawns[player] != (i, j):
+                self.canvas.coords(self.pawn_ids[player], *self.get_pawn_coords(i, j))
+                self.scene_pawns[player] = (i, j)
 
-        for i in range(board.rows - 1):
-            for j in range(board.cols - 1):
-                self.mark_object((i, j, 'bg_h_wall'))
-                self.mark_object((i, j, 'bg_v_wall'))
+        for player, walls in enumerate(board.player_walls):
+            self.show_scoreboard_walls(player, walls)
 
-        for i, j in self.board.horiz_walls:
-            x, y = self.get_wall_xy(i, j)
-            self.canvas.create_rectangle(
-                x - self.l_wall / 2, y - self.w_wall / 2 + 2,
-                x + self.l_wall / 2, y + self.w_wall / 2 - 3,
-                fill=self.wall_color, width=2,
-                tags=['h_walls'])
-
-        for i, j in self.board.verti_walls:
-            x, y = self.get_wall_xy(i, j)
-            self.canvas.create_rectangle(
-                x - self.w_wall / 2 + 2, y - self.l_wall / 2,
-                x + self.w_wall / 2 - 3, y + self.l_wall / 2,
-                fill=self.wall_color, width=2,
-                tags=['v_walls'])
+        self._redraw_walls(board.horiz_walls, self.h_wall_ids, self.create_h_wall)
+        self._redraw_walls(board.verti_walls, self.v_wall_ids, self.create_v_wall)
+
+    def _redraw_walls(self, walls: Sequence[Tuple[int, int]], ids: Dict[Tuple[int, int], int],
+                      create: Callable[[int, int], int]) -> None:
+        """Create the canvas items of the walls not drawn yet in ids, and
+        delete those of the walls not in walls anymore.
+        """
+        placed = {(i, j) for i, j in walls}
+        for wall in ids.keys() - placed:
+            self.canvas.delete(ids.pop(wall))
+        for wall in placed - ids.keys():
+            ids[wall] = create(*wall)
+
+    def show_scoreboard_walls(self, player: int, walls: int) -> None:
+        """Show the first walls wall slots of player on the scoreboard and hide
+        the others.
+        """
+        shown = self.scene_walls[player]
+        for wall_num in range(min(walls, shown), max(walls, shown)):
+            self.scoreboard.itemconfigure(self.scoreboard_wall_ids[player][wall_num],
+                                          state=NORMAL if wall_num < walls else HIDDEN)
+        self.scene_walls[player] = walls
 
     def mark_object(self, selection: Tuple[int, int, str], style: str = 'unselected') -> None:
         """Mark tile as unselected, hover or moving."""
@@ -523,8 +469,7 @@ class TkViewer(Viewer):
 
     def put_wall(self, player: int) -> None:
         """Deduct a wall from player."""
-        self.scoreboard.delete(
-            self.scoreboard_wall_ids[player][self.board.player_walls[player] - 1])
+        self.show_scoreboard_walls(player, self.board.player_walls[player] - 1)
 
     def finished(self, steps: int, winner: int, reason: str = "") -> None:
         if self.root is None:
@@ -624,29 +569,27 @@ class TkViewer(Viewer):
     ###########################################################################
     # Replay UI
 
-    def replay(self, trace: Trace, speed: float = 1.0, show_end: bool = False) -> None:
+    def replay(self, trace: Trace, speed: float = 1.0, show_end: bool = False,
+               start: int = 0) -> None:
         """Replay a game given its saved trace.
 
         Attributes:
         trace -- trace of the game
-        speed -- speed scale of the replay
+        speed -- speed scale of the replay (see Viewer.replay)
         show_end -- start with the final state instead of the initial state
+        start -- the step shown first, if not show_end
         """
         self.trace = trace
         self.speed = speed
-        # generate all boards to access them backwards
-        self.boards = [trace.get_initial_board()]
-        for player, action, t in trace.actions:
-            b = self.boards[-1].clone()
-            b.play_action(action, player)
-            self.boards.append(b)
+        # boards are materialized on demand to access them backwards
+        self.boards = trace.snapshots()
         if self.root is not None:
-            self.root.after_idle(self._replay_gui, show_end)
+            self.root.after_idle(self._replay_gui, show_end, start)
         self._board = self.boards[0]
         self.barrier.set()
         self.run()
 
-    def _replay_gui(self, show_end: bool) -> None:
+    def _replay_gui(self, show_end: bool, start: int = 0) -> None:
         """Initialize replay UI."""
         self.b_prev = Button(self.buttons, text='<', command=self._replay_prev)
         self.b_play = Button(self.buttons, text='Play', command=self._replay_play)
@@ -665,7 +608,7 @@ class TkViewer(Viewer):
             # keep the last played action on screen
             self._replay_goto(len(self.boards) - 1)
         else:
-            self._replay_goto(0)
+            self._replay_goto(max(0, min(start, len(self.boards) - 1)))
 
     def _replay_goto(self, step: int) -> None:
         """Update UI to show one step."""
@@ -682,11 +625,10 @@ class TkViewer(Viewer):
             self._playing(step, player)
 
         if self.is_playing:
-            if self.speed < 0:
-                step_time = -self.trace.actions[step][2] / self.speed
-            else:
-                step_time = self.speed
-            self.after_id = self.root.after(int(step_time * 1000), self._replay_goto, step + 1)
+            self.deadline += replay_delay(self.speed, self.trace.actions[step][2])
+            # at least 1 ms so that Tk gets idle time to draw, even with speed 0
+            delay = max(1, int((self.deadline - time.perf_counter()) * 1000))
+            self.after_id = self.root.after(delay, self._replay_advance, step + 1)
         else:
             if not step:
                 self.b_prev['state'] = DISABLED
@@ -698,6 +640,19 @@ class TkViewer(Viewer):
             else:
                 self.b_next['state'] = NORMAL
 
+    def _replay_advance(self, step: int) -> None:
+        """Show the next step of a playing replay, skipping the steps that
+        are already late when the drawing falls behind.
+        """
+        now = time.perf_counter()
+        while self.speed and step < len(self.boards) - 1:
+            delay = replay_delay(self.speed, self.trace.actions[step][2])
+            if self.deadline + delay > now:
+                break
+            self.deadline += delay
+            step += 1
+        self._replay_goto(step)
+
     def _replay_next(self, event: TkEvent = None) -> None:
         if not self.is_playing and self.step < len(self.boards) - 1:
             self._replay_goto(self.step + 1)
@@ -725,6 +680,7 @@ class TkViewer(Viewer):
             self.b_prev['state'] = DISABLED
             self.b_next['state'] = DISABLED
             self.b_play['text'] = 'Pause'
+            self.deadline = time.perf_counter()
             if self.step < len(self.boards) - 1:
                 self._replay_goto(self.step)
             else:
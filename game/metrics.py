@@ -0,0 +1,91 @@
+"""Per-step latency instrumentation of games.
+
+Every step played by Game produces a StepMetrics, recorded in the trace and
+sent to the optional metrics sink of the game. timing_report summarizes them
+per agent to tell slow bots apart from a slow engine or transport.
+"""
+import math
+from typing import Callable, Dict, List, NamedTuple, Sequence
+
+from game.trace import Trace
+
+
+class StepMetrics(NamedTuple):
+    """Timings in seconds of one step of a game.
+
+    Attributes:
+    step -- the step number
+    player -- the player that has played
+    serialize -- time spent by the server marshalling the request and the
+        response (0 for in-process agents)
+    connect -- time spent connecting to the agent
+    roundtrip -- time between sending the request and receiving the
+        response, network transfer included
+    think -- time charged to the agent
+    validate -- time spent by the board validating and applying the action
+    viewer -- time spent updating the viewer
+    """
+    step: int
+    player: int
+    serialize: float
+    connect: float
+    roundtrip: float
+    think: float
+    validate: float
+    viewer: float
+
+
+MetricsSink = Callable[[StepMetrics], None]
+
+TIMINGS = ('serialize', 'connect', 'roundtrip', 'think', 'validate', 'viewer')
+PERCENTILES = (50, 90, 99, 100)
+
+
+def percentile(values: Sequence[float], p: float) -> float:
+    """Return the p-th percentile of values (nearest rank)."""
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def step_metrics(trace: Trace) -> List[StepMetrics]:
+    """Return the metrics recorded in a trace."""
+    return [StepMetrics(**metrics) for metrics in getattr(trace, 'metrics', [])]
+
+
+def mean_think_times(trace: Trace) -> List[float]:
+    """Return the mean time in seconds taken by every player to play its
+    actions, 0 for a player without action.
+    """
+    totals = [0.0] * len(trace.initial_board.pawns)
+    counts = [0] * len(totals)
+    for player, _, t in trace.actions:
+        totals[player] += t
+        counts[player] += 1
+    return [total / count if count else 0.0 for total, count in zip(totals, counts)]
+
+
+def timing_report(trace: Trace) -> str:
+    """Return a table of the timing percentiles of every agent, in
+    milliseconds.
+    """
+    by_player: Dict[int, List[StepMetrics]] = {}
+    for metrics in step_metrics(trace):
+        by_player.setdefault(metrics.player, []).append(metrics)
+    if not by_player:
+        return 'No timing recorded.'
+
+    header = f'{"agent":<16}{"timing (ms)":<12}' + ''.join(
+        f'{"max" if p == 100 else f"p{p}":>10}' for p in PERCENTILES)
+    lines = [header, '-' * len(header)]
+    for player in sorted(by_player):
+        steps = by_player[player]
+        name = trace.player_names[player] if player < len(trace.player_names) else f'P{player}'
+        lines.append(f'{name[:15]:<16}{"steps":<12}{len(steps):>10}')
+        for timing in TIMINGS:
+            values = [getattr(metrics, timing) for metrics in steps]
+            lines.append(f'{"":<16}{timing:<12}' + ''.join(
+                f'{percentile(values, p) * 1000:>10.2f}' for p in PERCENTILES))
+    return '\n'.join(lines)
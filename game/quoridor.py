@@ -19,8 +19,6 @@ from abc import abstractmethod
 from argparse import ArgumentParser, Namespace
 from typing import Callable, List, Optional
 
-from xmlrpc.server import SimpleXMLRPCServer
-
 from game.board import Board, Action
 
 
@@ -56,9 +54,27 @@ class Agent:
 
         """
 
+    def notify(self, step: int, player: int, action: Action) -> None:
+        """An action has just been played by another player.
+
+        Only called when the game is played with pondering enabled, so that
+        the agent can keep thinking during the turns of its opponents. This
+        is not counted in the time credit but must return quickly: the agent
+        is not notified anymore once a call fails or times out.
+
+        Arguments:
+        step -- the step number of the action
+        player -- the player that has played
+        action -- the action played
+
+        """
+
 
 def serve_agent(agent: Agent, address: str, port: int) -> None:
     """Serve agent on specified bind address and port number."""
+    # imported here: the game server imports this module for Agent only
+    from xmlrpc.server import SimpleXMLRPCServer
+
     server = SimpleXMLRPCServer((address, port), allow_none=True)
     server.register_instance(agent)
     print('Listening on ', address, ':', port, sep="")
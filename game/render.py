@@ -0,0 +1,305 @@
+"""Headless rendering of game traces to SVG or PNG images.
+
+Boards are drawn with the geometry and colors of the Tk viewer (see
+game.geometry) without Tk nor any display, and as fast as possible: one
+image per step of a trace for highlight clips, or only the final board for
+thumbnails. PNG images are rasterized and encoded in pure Python.
+
+Usage:
+    python -m game.render frames/ traces/ --format png -j 8
+    python -m game.render thumbnails/ traces/ --final --scale 0.25
+"""
+import concurrent.futures
+import logging
+import math
+import os
+import struct
+import zlib
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from game.board import Board
+from game.geometry import BoardGeometry, XY
+from game.trace import CannotLoadTrace, Trace, TRACE_EXTENSIONS, find_traces, read_trace_file, \
+    split_compression
+
+FORMATS = ('svg', 'png')
+OUTLINE = '#000000'
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+class Shape(NamedTuple):
+    """Rectangle or ellipse (kind 'rect' or 'oval') inscribed in the box
+    coords, outlined with a line of width pixels.
+    """
+    kind: str
+    coords: Tuple[XY, XY, XY, XY]
+    fill: str
+    outline: str = OUTLINE
+    width: float = 0
+
+
+def board_shapes(board: Board, geometry: BoardGeometry = BoardGeometry()) -> List[Shape]:
+    """Return the shapes drawing a board, from bottom to top."""
+    g = geometry
+    shapes = [Shape('rect', (g.x_offset, g.y_offset,
+                             g.x_offset + g.w * board.cols, g.y_offset + g.w * board.rows),
+                    g.wall_backg)]
+    for i in range(board.rows):
+        for j in range(board.cols):
+            x, y = g.get_tile_xy(i, j)
+            shapes.append(Shape('rect', (x - g.w_tile / 2, y - g.w_tile / 2,
+                                         x + g.w_tile / 2, y + g.w_tile / 2),
+                                g.tile_backg, g.tile_color, 2))
+    for player, (i, j) in enumerate(board.pawns):
+        shapes.append(Shape('oval', g.get_pawn_coords(i, j), g.pawn_colors[player],
+                            g.pawn_outlin[player], 2))
+    for i, j in board.horiz_walls:
+        shapes.append(Shape('rect', g.get_h_wall_coords(i, j), g.wall_color, OUTLINE, 2))
+    for i, j in board.verti_walls:
+        shapes.append(Shape('rect', g.get_v_wall_coords(i, j), g.wall_color, OUTLINE, 2))
+    return shapes
+
+
+def image_size(board: Board, geometry: BoardGeometry = BoardGeometry()) -> Tuple[int, int]:
+    """Return the width and height in pixels of the drawing of a board."""
+    return (2 * geometry.x_offset + geometry.w * board.cols,
+            2 * geometry.y_offset + geometry.w * board.rows)
+
+
+def to_svg(shapes: Iterable[Shape], width: int, height: int, scale: float = 1.0,
+           title: str = '') -> str:
+    """Return an SVG document drawing shapes in a width x height box,
+    displayed scaled by scale.
+    """
+    lines = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{round(width * scale)}"'
+             f' height="{round(height * scale)}" viewBox="0 0 {width} {height}">']
+    if title:
+        lines.append(f'<title>{title}</title>')
+    lines.append(f'<rect width="{width}" height="{height}" fill="#FFFFFF"/>')
+    for shape in shapes:
+        x0, y0, x1, y1 = shape.coords
+        stroke = f' stroke="{shape.outline}" stroke-width="{shape.width:g}"' if shape.width else ''
+        if shape.kind == 'rect':
+            lines.append(f'<rect x="{x0:g}" y="{y0:g}" width="{x1 - x0:g}" height="{y1 - y0:g}"'
+                         f' fill="{shape.fill}"{stroke}/>')
+        else:
+            lines.append(f'<ellipse cx="{(x0 + x1) / 2:g}" cy="{(y0 + y1) / 2:g}"'
+                         f' rx="{(x1 - x0) / 2:g}" ry="{(y1 - y0) / 2:g}"'
+                         f' fill="{shape.fill}"{stroke}/>')
+    lines.append('</svg>')
+    return '\n'.join(lines) + '\n'
+
+
+def _rgb(color: str) -> bytes:
+    return bytes.fromhex(color.lstrip('#'))
+
+
+class Raster:
+    """RGB image drawn with filled shapes."""
+
+    def __init__(self, width: int, height: int, background: str = '#FFFFFF') -> None:
+        self.width = width
+        self.height = height
+        self.pixels = bytearray(_rgb(background) * (width * height))
+
+    def fill_rect(self, x0: float, y0: float, x1: float, y1: float, color: str) -> None:
+        left, right = max(0, round(x0)), min(self.width, round(x1))
+        if left >= right:
+            return
+        span = _rgb(color) * (right - left)
+        stride = 3 * self.width
+        for row in range(max(0, round(y0)), min(self.height, round(y1))):
+            self.pixels[row * stride + 3 * left:row * stride + 3 * right] = span
+
+    def fill_oval(self, x0: float, y0: float, x1: float, y1: float, color: str) -> None:
+        cx, cy, rx, ry = (x0 + x1) / 2, (y0 + y1) / 2, (x1 - x0) / 2, (y1 - y0) / 2
+        if rx <= 0 or ry <= 0:
+            return
+        rgb = _rgb(color)
+        stride = 3 * self.width
+        for row in range(max(0, math.floor(y0)), min(self.height, math.ceil(y1))):
+            dy = (row + 0.5 - cy) / ry
+            if abs(dy) >= 1:
+                continue
+            half = rx * math.sqrt(1 - dy * dy)
+            left, right = max(0, round(cx - half)), min(self.width, round(cx + half))
+            if left < right:
+                self.pixels[row * stride + 3 * left:row * stride + 3 * right] = \
+                    rgb * (right - left)
+
+    def draw(self, shape: Shape, scale: float = 1.0) -> None:
+        """Draw a shape, its coordinates multiplied by scale."""
+        fill = self.fill_rect if shape.kind == 'rect' else self.fill_oval
+        x0, y0, x1, y1 = (c * scale for c in shape.coords)
+        inset = shape.width * scale
+        if inset:
+            # the outline is drawn as the shape, then covered by its inside
+            fill(x0, y0, x1, y1, shape.outline)
+        fill(x0 + inset, y0 + inset, x1 - inset, y1 - inset, shape.fill)
+
+    def to_png(self) -> bytes:
+        """Return the image encoded as PNG."""
+        stride = 3 * self.width
+        data = b''.join(b'\x00' + bytes(self.pixels[row * stride:(row + 1) * stride])
+                        for row in range(self.height))
+        return PNG_SIGNATURE + b''.join((
+            _png_chunk(b'IHDR', struct.pack('>IIBBBBB', self.width, self.height, 8, 2, 0, 0, 0)),
+            _png_chunk(b'IDAT', zlib.compress(data, 6)),
+            _png_chunk(b'IEND', b''),
+        ))
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', len(data)) + kind + data + \
+        struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+
+def render_board(board: Board, image_format: str = 'svg', scale: float = 1.0,
+                 title: str = '') -> bytes:
+    """Return the image of a board.
+
+    Arguments:
+    board -- the board
+    image_format -- 'svg' or 'png'
+    scale -- size of the image relative to the Tk viewer
+    title -- title of an SVG image
+    """
+    width, height = image_size(board)
+    shapes = board_shapes(board)
+    if image_format == 'svg':
+        return to_svg(shapes, width, height, scale, title).encode('utf-8')
+    raster = Raster(round(width * scale), round(height * scale))
+    for shape in shapes:
+        raster.draw(shape, scale)
+    return raster.to_png()
+
+
+def trace_boards(trace: Trace) -> Iterator[Tuple[int, Board]]:
+    """Yield the step number and the board after every step of a trace,
+    starting with the initial board at step 0. The board yielded is updated
+    in place.
+    """
+    board = trace.get_initial_board()
+    yield 0, board
+    for step, (player, action, _) in enumerate(trace.actions, 1):
+        board.apply_action(action, player)
+        yield step, board
+
+
+def trace_name(path: str, root: Optional[str] = None) -> str:
+    """Return the name of a trace file without its extensions, relative to
+    the directory root if given (e.g. 'a/game' for root/a/game.json).
+    """
+    name = os.path.relpath(path, root) if root is not None else os.path.basename(path)
+    name = split_compression(name)[0]
+    for extension in TRACE_EXTENSIONS:
+        if name.endswith(extension):
+            return name[:-len(extension)]
+    return name
+
+
+def render_trace(trace: Trace, directory: str, image_format: str = 'svg',
+                 scale: float = 1.0) -> int:
+    """Write the image of every step of a trace to frame_<step>.<format>
+    files in directory, and return their number.
+    """
+    os.makedirs(directory, exist_ok=True)
+    count = 0
+    for step, board in trace_boards(trace):
+        with open(os.path.join(directory, f'frame_{step:04d}.{image_format}'), 'wb') as f:
+            f.write(render_board(board, image_format, scale, f'Step {step}'))
+        count += 1
+    return count
+
+
+def render_file(path: str, output: str, image_format: str = 'svg', scale: float = 1.0,
+                final: bool = False, root: Optional[str] = None) -> int:
+    """Render the trace at path and return the number of images written.
+
+    Arguments:
+    path -- the trace file
+    output -- the directory of the images: those of every step are written
+        in a subdirectory named after the trace, the final one as
+        <trace name>.<format>
+    image_format -- 'svg' or 'png'
+    scale -- size of the images relative to the Tk viewer
+    final -- only render the final board
+    root -- the directory relative to which the trace is named, so that
+        traces of different subdirectories do not share their images
+    """
+    trace = read_trace_file(path)
+    name = os.path.join(output, trace_name(path, root))
+    if not final:
+        return render_trace(trace, name, image_format, scale)
+    step = len(trace.actions)
+    os.makedirs(os.path.dirname(name), exist_ok=True)
+    with open(f'{name}.{image_format}', 'wb') as f:
+        f.write(render_board(trace.snapshots()[step], image_format, scale, f'Step {step}'))
+    return 1
+
+
+def _render_file(path: str, root: Optional[str], output: str, image_format: str, scale: float,
+                 final: bool) -> int:
+    try:
+        return render_file(path, output, image_format, scale, final, root)
+    except (OSError, CannotLoadTrace) as e:
+        logging.warning("Unable to render trace '%s'. Reason: %s", path, e)
+        return 0
+
+
+def render_files(paths: Iterable[str], output: str, image_format: str = 'svg',
+                 scale: float = 1.0, final: bool = False, workers: int = 1) -> List[int]:
+    """Render the traces of paths and return the number of images written
+    for every trace, 0 for those that cannot be loaded.
+
+    The images of a trace found in a directory of paths are named after
+    its path relative to that directory (see render_file).
+
+    Arguments:
+    paths -- trace files or directories of traces
+    output -- the directory of the images
+    image_format -- 'svg' or 'png'
+    scale -- size of the images relative to the Tk viewer
+    final -- only render the final board
+    workers -- number of processes rendering the traces
+    """
+    traces = [(trace, path if os.path.isdir(path) else None)
+              for path in paths for trace in find_traces([path])]
+    options = (output, image_format, scale, final)
+    if workers <= 1 or len(traces) <= 1:
+        return [_render_file(path, root, *options) for path, root in traces]
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(_render_file, *zip(*traces),
+                                 *([option] * len(traces) for option in options)))
+
+
+def main() -> None:
+    import argparse
+
+    def posfloatarg(string: str) -> float:
+        value = float(string)
+        if value <= 0:
+            raise argparse.ArgumentTypeError("%s is not strictly positive" % string)
+        return value
+
+    parser = argparse.ArgumentParser(prog='python -m game.render',
+                                     description='Render game traces to images.')
+    parser.add_argument('output', help='directory of the images')
+    parser.add_argument('paths', nargs='+', metavar='PATH', help='trace file or directory')
+    parser.add_argument('-f', '--format', choices=FORMATS, default='svg',
+                        help='image format (default: %(default)s)')
+    parser.add_argument('-s', '--scale', type=posfloatarg, default=1.0,
+                        help='image size relative to the GUI (default: %(default)s)')
+    parser.add_argument('--final', action='store_true', default=False,
+                        help='only render the final board of every trace')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1,
+                        help='number of processes (default: %(default)s)')
+    args = parser.parse_args()
+
+    counts = render_files(args.paths, args.output, args.format, args.scale, args.final,
+                          args.workers)
+    print(f'{sum(counts)} images of {len(counts)} traces written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
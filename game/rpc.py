@@ -0,0 +1,231 @@
+"""XML-RPC transports used by the game to talk to remote agents.
+
+Both proxies record the timings of their last call (see CallTimings) so that
+the game can credit the transport overhead back to the agents.
+
+asyncio is only imported by AsyncServerProxy, which the blocking games never
+use.
+"""
+import http.client
+import time
+import urllib.parse
+import xmlrpc.client
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import asyncio
+
+
+class CallTimings(NamedTuple):
+    """Timings in seconds of a remote call, measured by the game server.
+
+    roundtrip is the time between sending the request and receiving the
+    whole response: it includes the network transfer and the agent think
+    time.
+    """
+    serialize: float
+    connect: float
+    roundtrip: float
+    deserialize: float
+
+    @property
+    def overhead(self) -> float:
+        """Time spent by the server on the transport, outside of the
+        exchange with the agent.
+        """
+        return self.serialize + self.connect + self.deserialize
+
+
+def split_uri(uri: str) -> Tuple[str, int, str]:
+    """Return the host, port and handler of an http XML-RPC URI."""
+    parts = urllib.parse.urlsplit(uri)
+    if parts.scheme != 'http':
+        raise ValueError(f'unsupported XML-RPC scheme: {parts.scheme!r}')
+    handler = parts.path or '/'
+    if parts.query:
+        handler += '?' + parts.query
+    return parts.hostname or 'localhost', parts.port or 80, handler
+
+
+class TimedServerProxy:
+    """Blocking XML-RPC proxy for a remote agent recording CallTimings.
+
+    It behaves like xmlrpc.client.ServerProxy(uri, allow_none=True,
+    use_builtin_types=True), decoding results like AsyncServerProxy; the
+    timings of the last call are available in last_timings. Connections
+    honour the default socket timeout, like xmlrpc.client.
+    """
+
+    def __init__(self, uri: str) -> None:
+        self.uri = uri
+        self.host, self.port, self.handler = split_uri(uri)
+        self.last_timings: Optional[CallTimings] = None
+
+    def __getattr__(self, name: str) -> Callable[..., Any]:
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def method(*params: Any) -> Any:
+            return self.call(name, *params)
+
+        return method
+
+    def __repr__(self) -> str:
+        return f'<TimedServerProxy for {self.uri}>'
+
+    def call(self, method: str, *params: Any) -> Any:
+        """Call method on the remote agent and return its result.
+
+        Raise xmlrpc.client.Fault if the remote method failed,
+        xmlrpc.client.ProtocolError on an HTTP error and OSError if the
+        agent cannot be reached.
+        """
+        start = time.perf_counter()
+        request = xmlrpc.client.dumps(params, method, allow_none=True).encode('utf-8')
+        serialized = time.perf_counter()
+
+        connection = http.client.HTTPConnection(self.host, self.port)
+        try:
+            connection.connect()
+            connected = time.perf_counter()
+            connection.request('POST', self.handler, request, {
+                'Content-Type': 'text/xml', 'User-Agent': 'quoridor-timed'})
+            response = connection.getresponse()
+            data = response.read()
+        finally:
+            connection.close()
+        received = time.perf_counter()
+
+        if response.status != 200:
+            raise xmlrpc.client.ProtocolError(
+                self.uri, response.status, response.reason, dict(response.getheaders()))
+        try:
+            (result,), _ = xmlrpc.client.loads(data, use_builtin_types=True)
+        finally:
+            self.last_timings = CallTimings(serialized - start, connected - serialized,
+                                            received - connected, time.perf_counter() - received)
+        return result
+
+
+class AsyncServerProxy:
+    """Asynchronous XML-RPC proxy for a remote agent.
+
+    Remote methods are exposed as coroutine functions, e.g.
+    ``await proxy.play(board, player, step, time_left)``. The underlying
+    connection is kept open as long as the server allows it (HTTP/1.1
+    keep-alive) and calls on the same proxy are serialized, so that a single
+    proxy may be shared by several games running on the same event loop.
+    """
+
+    def __init__(self, uri: str) -> None:
+        self.uri = uri
+        self.host, self.port, self.handler = split_uri(uri)
+        self.last_timings: Optional[CallTimings] = None
+        self._reader: Optional['asyncio.StreamReader'] = None
+        self._writer: Optional['asyncio.StreamWriter'] = None
+        self._lock: Optional['asyncio.Lock'] = None
+        self._connect_time = 0.0
+
+    def __getattr__(self, name: str) -> Callable[..., Awaitable[Any]]:
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        async def method(*params: Any) -> Any:
+            return await self.call(name, *params)
+
+        return method
+
+    def __repr__(self) -> str:
+        return f'<AsyncServerProxy for {self.uri}>'
+
+    async def call(self, method: str, *params: Any) -> Any:
+        """Call method on the remote agent and return its result.
+
+        Raise xmlrpc.client.Fault if the remote method failed,
+        xmlrpc.client.ProtocolError on an HTTP error and OSError if the
+        agent cannot be reached.
+        """
+        if self._lock is None:
+            import asyncio
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            start = time.perf_counter()
+            request = xmlrpc.client.dumps(params, method, allow_none=True).encode('utf-8')
+            self._connect_time = 0.0
+            serialized = time.perf_counter()
+            try:
+                response = await self._post(request)
+            except BaseException:
+                # the connection is in an unknown state (e.g. cancelled by a timeout)
+                self.close()
+                raise
+            received = time.perf_counter()
+            try:
+                (result,), _ = xmlrpc.client.loads(response, use_builtin_types=True)
+            finally:
+                self.last_timings = CallTimings(
+                    serialized - start, self._connect_time,
+                    received - serialized - self._connect_time, time.perf_counter() - received)
+        return result
+
+    def close(self) -> None:
+        """Close the connection to the agent, if any."""
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = None
+        self._writer = None
+
+    async def _post(self, body: bytes) -> bytes:
+        """Send an XML-RPC request and return the body of the response."""
+        reused = self._writer is not None
+        if self._reader is None or self._writer is None:
+            import asyncio
+            start = time.perf_counter()
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            self._connect_time += time.perf_counter() - start
+
+        self._writer.write(
+            (f'POST {self.handler} HTTP/1.1\r\n'
+             f'Host: {self.host}:{self.port}\r\n'
+             'User-Agent: quoridor-async\r\n'
+             'Content-Type: text/xml\r\n'
+             f'Content-Length: {len(body)}\r\n'
+             '\r\n').encode('ascii') + body)
+        await self._writer.drain()
+
+        status_line = await self._reader.readline()
+        if not status_line and reused:
+            # the server closed the kept-alive connection in the meantime
+            self.close()
+            return await self._post(body)
+
+        version, status, reason, headers = await self._read_head(status_line)
+        if 'content-length' in headers:
+            data = await self._reader.readexactly(int(headers['content-length']))
+        else:
+            data = await self._reader.read()
+
+        if version != 'HTTP/1.1' or headers.get('connection', '').lower() == 'close':
+            self.close()
+        if status != 200:
+            raise xmlrpc.client.ProtocolError(self.uri, status, reason, headers)
+        return data
+
+    async def _read_head(self, status_line: bytes) -> Tuple[str, int, str, Dict[str, str]]:
+        """Parse the status line and the headers of an HTTP response."""
+        assert self._reader is not None
+        parts = status_line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+        if len(parts) < 2 or not parts[1].isdigit():
+            raise xmlrpc.client.ProtocolError(
+                self.uri, 0, f'malformed status line {status_line!r}', {})
+        version, status = parts[0], parts[1]
+        reason = parts[2] if len(parts) > 2 else ''
+
+        headers: Dict[str, str] = {}
+        while True:
+            line = (await self._reader.readline()).decode('latin-1').rstrip('\r\n')
+            if not line:
+                break
+            key, _, value = line.partition(':')
+            headers[key.strip().lower()] = value.strip()
+        return version, int(status), reason, headers
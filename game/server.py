@@ -0,0 +1,450 @@
+"""Long-running match server hosting many simultaneous Quoridor games.
+
+Matches are submitted through a small local HTTP API and played by a
+bounded pool of asyncio workers (see game.async_game.AsyncGame), so that a
+single process hosts all the games of an event. Agent connections are kept
+in a pool and reused from one match to the next; an agent plays a single
+match at a time, the matches of a busy agent waiting for it.
+
+HTTP API:
+    POST /matches       submit a match, e.g. {"agents": ["http://bot1:8000",
+                        "http://bot2:8000"], "names": ["bot1", "bot2"],
+                        "time": 10.0, "walls": [10, 10], "ponder": false,
+                        "clock": "fischer", "increment": 0.5};
+                        answers {"id": ID}
+    GET  /matches/ID    status and, once finished, result of a match
+    GET  /results       JSON Lines stream of the results of the matches, sent
+                        as soon as they finish
+
+Usage:
+    python -m game.server --port 8080 --workers 16 --traces traces/
+"""
+import asyncio
+import json
+import logging
+import os
+import queue
+import threading
+import uuid
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from game.async_game import AsyncGame
+from game.board import Board
+from game.constants import CLOCK_MODES, CLOCK_MOVE
+from game.metrics import mean_think_times
+from game.rpc import AsyncServerProxy, split_uri
+from game.trace import Trace, get_results
+
+PENDING = 'pending'
+RUNNING = 'running'
+FINISHED = 'finished'
+FAILED = 'failed'
+
+
+class InvalidMatchError(Exception):
+    """Raised when a match request is malformed."""
+
+
+class MatchRequest:
+    """A match to be played by the server.
+
+    Attributes:
+    agents -- URIs of the 2 or 4 agents
+    names -- names of the players, in corresponding order
+    time -- time credit in seconds of every player, or None if untimed
+    walls -- walls every player starts with, or None for the default
+    ponder -- notify the agents of every action (see Agent.notify)
+    clock -- time control, one of game.constants.CLOCK_MODES
+    increment -- increment or delay in seconds of the clock
+    """
+
+    def __init__(self,
+                 agents: List[str],
+                 names: Optional[List[str]] = None,
+                 time: Optional[float] = None,
+                 walls: Optional[List[int]] = None,
+                 ponder: bool = False,
+                 clock: str = CLOCK_MOVE,
+                 increment: float = 0.0) -> None:
+        if len(agents) not in (2, 4):
+            raise InvalidMatchError('a match needs 2 or 4 agents')
+        if names and len(names) != len(agents):
+            raise InvalidMatchError('wrong player names count')
+        if walls and len(walls) != len(agents):
+            raise InvalidMatchError('wrong starting walls count')
+        if time is not None and time <= 0:
+            raise InvalidMatchError('time credit must be strictly positive')
+        if clock not in CLOCK_MODES:
+            raise InvalidMatchError(f'unknown clock mode: {clock!r}')
+        for uri in agents:
+            try:
+                split_uri(uri)
+            except ValueError as e:
+                raise InvalidMatchError(f'invalid agent URI {uri!r}: {e}')
+        self.agents = agents
+        self.names = names or []
+        self.time = time
+        self.walls = walls
+        self.ponder = ponder
+        self.clock = clock
+        self.increment = increment
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'MatchRequest':
+        """Build a request from its JSON representation."""
+        try:
+            return cls([str(agent) for agent in data['agents']],
+                       [str(name) for name in data.get('names') or []],
+                       None if data.get('time') is None else float(data['time']),
+                       None if data.get('walls') is None else [int(w) for w in data['walls']],
+                       bool(data.get('ponder', False)),
+                       str(data.get('clock', CLOCK_MOVE)),
+                       float(data.get('increment', 0.0)))
+        except (KeyError, TypeError, ValueError) as e:
+            raise InvalidMatchError(f'malformed match request: {e}')
+
+
+class AgentPool:
+    """Pool of idle agent connections, indexed by URI.
+
+    Bots usually serve their calls one at a time (e.g. SimpleXMLRPCServer)
+    and keep the state set by initialize, so that separate connections are
+    not enough to play concurrent matches against the same bot: a call would
+    wait behind the call of another match, and be charged for it. An agent is
+    thus leased to a single match at a time (see lease).
+    """
+
+    def __init__(self) -> None:
+        self._idle: Dict[str, List[AsyncServerProxy]] = defaultdict(list)
+        self._busy: Dict[str, asyncio.Lock] = {}
+
+    @asynccontextmanager
+    async def lease(self, uris: List[str]) -> AsyncIterator[List[AsyncServerProxy]]:
+        """Wait until no other match uses the agents at uris, then yield
+        connections to them, in the same order, for the whole match.
+
+        An agent appearing twice (self-play) gets two connections. The URIs
+        are locked in sorted order, so that two leases cannot deadlock.
+        """
+        locked: List[asyncio.Lock] = []
+        try:
+            for uri in sorted(set(uris)):
+                lock = self._busy.setdefault(uri, asyncio.Lock())
+                await lock.acquire()
+                locked.append(lock)
+            proxies = [self.acquire(uri) for uri in uris]
+            try:
+                yield proxies
+            finally:
+                for proxy in proxies:
+                    self.release(proxy)
+        finally:
+            for lock in locked:
+                lock.release()
+
+    def acquire(self, uri: str) -> AsyncServerProxy:
+        """Return a connection to uri, reusing an idle one if possible."""
+        idle = self._idle[uri]
+        return idle.pop() if idle else AsyncServerProxy(uri)
+
+    def release(self, proxy: AsyncServerProxy) -> None:
+        """Give back a connection acquired with acquire."""
+        self._idle[proxy.uri].append(proxy)
+
+    def close(self) -> None:
+        """Close every idle connection."""
+        for proxies in self._idle.values():
+            for proxy in proxies:
+                proxy.close()
+        self._idle.clear()
+
+
+class MatchServer:
+    """Schedule matches on a bounded pool of workers.
+
+    The server runs its own event loop in a background thread; submit and
+    the other public methods may be called from any thread.
+    """
+
+    def __init__(self,
+                 workers: int = 8,
+                 max_pending: int = 1000,
+                 trace_dir: str = None,
+                 results_file: str = None) -> None:
+        """Create a stopped server.
+
+        Arguments:
+        workers -- number of matches played simultaneously
+        max_pending -- number of matches that can wait for a worker
+        trace_dir -- directory where the trace of every match is written, or
+            None to keep no trace
+        results_file -- JSON Lines file to which the results are appended, or
+            None
+        """
+        self.workers = workers
+        self.max_pending = max_pending
+        self.trace_dir = trace_dir
+        self.results_file = results_file
+        self.matches: Dict[str, Dict[str, Any]] = {}
+        self.pool = AgentPool()
+        self._lock = threading.Lock()
+        self._subscribers: List[queue.Queue] = []
+        self._loop = asyncio.new_event_loop()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._thread: Optional[threading.Thread] = None
+        self._started = threading.Event()
+
+    def start(self) -> None:
+        """Start the event loop and the workers in a background thread."""
+        self._thread = threading.Thread(target=self._run_loop, name='match-server', daemon=True)
+        self._thread.start()
+        self._started.wait()
+
+    def stop(self) -> None:
+        """Stop the workers, close the streams and the agent connections."""
+        if self._thread is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._thread = None
+        self._loop.close()
+        self.pool.close()
+        with self._lock:
+            for subscriber in self._subscribers:
+                subscriber.put(None)
+            self._subscribers.clear()
+
+    def submit(self, request: MatchRequest) -> str:
+        """Queue a match and return its id.
+
+        Raise queue.Full if too many matches are already pending.
+        """
+        match_id = uuid.uuid4().hex
+        with self._lock:
+            self.matches[match_id] = {'id': match_id, 'status': PENDING}
+        future = asyncio.run_coroutine_threadsafe(self._enqueue(match_id, request), self._loop)
+        try:
+            future.result()
+        except asyncio.QueueFull:
+            with self._lock:
+                del self.matches[match_id]
+            raise queue.Full
+        return match_id
+
+    def status(self, match_id: str) -> Optional[Dict[str, Any]]:
+        """Return the status of a match, or None if it is unknown."""
+        with self._lock:
+            match = self.matches.get(match_id)
+            return dict(match) if match is not None else None
+
+    def subscribe(self) -> queue.Queue:
+        """Return a queue receiving the result of every match finishing
+        from now on, then None when the server stops.
+        """
+        subscriber: queue.Queue = queue.Queue()
+        with self._lock:
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue) -> None:
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue(self.max_pending)
+        self._workers = [self._loop.create_task(self._worker()) for _ in range(self.workers)]
+        self._loop.call_soon(self._started.set)
+        self._loop.run_forever()
+
+    async def _shutdown(self) -> None:
+        """Cancel the workers and the matches they are playing."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+    async def _enqueue(self, match_id: str, request: MatchRequest) -> None:
+        assert self._queue is not None
+        self._queue.put_nowait((match_id, request))
+
+    async def _worker(self) -> None:
+        assert self._queue is not None
+        while True:
+            match_id, request = await self._queue.get()
+            try:
+                result = await self._play(match_id, request)
+            except Exception as e:
+                logging.exception('Match %s failed', match_id)
+                result = {'id': match_id, 'status': FAILED, 'error': str(e)}
+            # the results file is appended to out of the event loop
+            await self._loop.run_in_executor(None, self._publish, result)
+
+    async def _play(self, match_id: str, request: MatchRequest) -> Dict[str, Any]:
+        """Play a match, once its agents are free, and return its result."""
+        count = len(request.agents)
+        async with self.pool.lease(request.agents) as proxies:
+            with self._lock:
+                self.matches[match_id]['status'] = RUNNING
+            board = Board(player_count=count, starting_walls=request.walls)
+            game = AsyncGame(proxies, board, None, [request.time] * count, None, request.names,
+                             request.ponder, request.clock, request.increment)
+            await game.play()
+
+        result = self._result(match_id, request, game.trace)
+        if self.trace_dir is not None:
+            path = os.path.join(self.trace_dir, f'{match_id}.json')
+            await self._loop.run_in_executor(None, self._write_trace, game.trace, path)
+            result['trace'] = path
+        return result
+
+    @staticmethod
+    def _result(match_id: str, request: MatchRequest, trace: Trace) -> Dict[str, Any]:
+        return {
+            'id': match_id,
+            'status': FINISHED,
+            'agents': request.agents,
+            'names': request.names,
+            'winner': trace.winner,
+            'reason': trace.reason,
+            'steps': len(trace.actions),
+            'ranking': [result.__dict__ for result in get_results(trace)],
+            'reasons': trace.reasons,
+            'think': mean_think_times(trace),
+        }
+
+    @staticmethod
+    def _write_trace(trace: Trace, path: str) -> None:
+        with open(path, 'w') as f:
+            trace.write(f)
+
+    def _publish(self, result: Dict[str, Any]) -> None:
+        """Record the result of a match and stream it out."""
+        line = json.dumps(result)
+        with self._lock:
+            self.matches[result['id']] = result
+            if self.results_file is not None:
+                with open(self.results_file, 'a') as f:
+                    f.write(line + '\n')
+            for subscriber in self._subscribers:
+                subscriber.put(result)
+
+
+class MatchRequestHandler(BaseHTTPRequestHandler):
+    """HTTP front-end of a MatchServer."""
+
+    server: 'MatchHTTPServer'
+
+    def do_POST(self) -> None:
+        if self.path.rstrip('/') != '/matches':
+            self._send_json(404, {'error': 'not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = MatchRequest.from_dict(json.loads(self.rfile.read(length)))
+            match_id = self.server.matches.submit(request)
+        except (ValueError, InvalidMatchError) as e:
+            self._send_json(400, {'error': str(e)})
+        except queue.Full:
+            self._send_json(503, {'error': 'too many pending matches'})
+        else:
+            self._send_json(202, {'id': match_id})
+
+    def do_GET(self) -> None:
+        if self.path.startswith('/matches/'):
+            status = self.server.matches.status(self.path[len('/matches/'):])
+            if status is None:
+                self._send_json(404, {'error': 'unknown match'})
+            else:
+                self._send_json(200, status)
+        elif self.path.rstrip('/') == '/results':
+            self._stream_results()
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logging.debug('%s - %s', self.address_string(), format % args)
+
+    def _send_json(self, code: int, data: Dict[str, Any]) -> None:
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream_results(self) -> None:
+        subscriber = self.server.matches.subscribe()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.end_headers()
+            while True:
+                result = subscriber.get()
+                if result is None:
+                    break
+                self.wfile.write(json.dumps(result).encode('utf-8') + b'\n')
+                self.wfile.flush()
+        except OSError:
+            pass  # the client went away
+        finally:
+            self.server.matches.unsubscribe(subscriber)
+            self.close_connection = True
+
+
+class MatchHTTPServer(ThreadingHTTPServer):
+    """HTTP server exposing a MatchServer."""
+
+    daemon_threads = True
+
+    def __init__(self, address: str, port: int, matches: MatchServer) -> None:
+        super().__init__((address, port), MatchRequestHandler)
+        self.matches = matches
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m game.server',
+                                     description='Host many simultaneous Quoridor matches.')
+    parser.add_argument('-b', '--bind', dest='address', default='localhost',
+                        help='bind to address ADDRESS (default: %(default)s)')
+    parser.add_argument('-p', '--port', type=int, default=8080,
+                        help='set port number (default: %(default)s)')
+    parser.add_argument('-j', '--workers', type=int, default=8,
+                        help='number of simultaneous matches (default: %(default)s)')
+    parser.add_argument('--max-pending', type=int, default=1000,
+                        help='number of queued matches (default: %(default)s)')
+    parser.add_argument('--traces', metavar='DIR',
+                        help='write the trace of every match in DIR')
+    parser.add_argument('--results', metavar='FILE',
+                        help='append the result of every match to FILE (JSON Lines)')
+    parser.add_argument('-v', '--verbose', action='store_true', default=False,
+                        help='be verbose')
+    args = parser.parse_args()
+
+    logging.basicConfig(format="%(asctime)s -- %(levelname)s: %(message)s",
+                        level=logging.DEBUG if args.verbose else logging.WARNING)
+    if args.traces is not None:
+        os.makedirs(args.traces, exist_ok=True)
+
+    matches = MatchServer(args.workers, args.max_pending, args.traces, args.results)
+    matches.start()
+    http = MatchHTTPServer(args.address, args.port, matches)
+    print('Listening on ', args.address, ':', args.port, sep="")
+    try:
+        http.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        http.server_close()
+        matches.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""Deterministic simulation of games between in-process agents.
+
+Every source of nondeterminism of a game is fixed by a master seed: every
+agent is built with its own random generator seeded from it, the random
+module is seeded the same way for the agents using it directly, and the game
+measures time with a VirtualClock, which only advances by the think time
+charged for every call to an agent. The traces of a simulation are thus
+bit-identical from run to run, so that changes of the engine or of a bot
+can be benchmarked and compared on the same games.
+
+Usage:
+    python -m game.simulation --seed 42 --games 100 [--output DIR]
+"""
+import hashlib
+import io
+import random
+from typing import Any, Callable, Iterator, List, Optional, Sequence
+
+from game.board import Board, Action
+from game.constants import MOVE, WALL_H, WALL_V
+from game.game import Game
+from game.quoridor import Agent
+from game.trace import Trace
+
+# virtual seconds charged for every call to an agent
+THINK_TIME = 0.01
+
+AgentFactory = Callable[[random.Random], Agent]
+
+
+def derive_seed(seed: int, *keys: Any) -> int:
+    """Return a 64-bit seed derived from seed and keys, the same in every
+    process (unlike hash, which is salted).
+    """
+    digest = hashlib.sha256(repr((seed,) + keys).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'little')
+
+
+class VirtualClock:
+    """Clock only advanced explicitly, to be given as the timer of Game."""
+
+    def __init__(self, start: float = 0.0) -> None:
+        self.time = start
+
+    def __call__(self) -> float:
+        return self.time
+
+    def advance(self, seconds: float) -> None:
+        self.time += seconds
+
+
+class VirtualTimeAgent(Agent):
+    """In-process agent whose calls take think_time seconds of a virtual
+    clock, whatever their real duration.
+    """
+
+    def __init__(self, agent: Agent, clock: VirtualClock, think_time: float = THINK_TIME) -> None:
+        self.agent = agent
+        self.clock = clock
+        self.think_time = think_time
+
+    def initialize(self, percepts: Board, players: List[int], time_left: float) -> None:
+        self.agent.initialize(percepts, players, time_left)
+        self.clock.advance(self.think_time)
+
+    def play(self, percepts: Board, player: int, step: int, time_left: float) -> Optional[Action]:
+        action = self.agent.play(percepts, player, step, time_left)
+        self.clock.advance(self.think_time)
+        return action
+
+    def notify(self, step: int, player: int, action: Action) -> None:
+        self.agent.notify(step, player, action)
+
+
+class RandomAgent(Agent):
+    """Agent placing a random wall with probability wall_probability and
+    otherwise moving along its shortest path, or randomly once in a while.
+    """
+
+    def __init__(self, rng: random.Random, wall_probability: float = 0.3) -> None:
+        self.rng = rng
+        self.wall_probability = wall_probability
+
+    def play(self, percepts: Board, player: int, step: int, time_left: float) -> Optional[Action]:
+        if percepts.player_walls[player] > 0 and self.rng.random() < self.wall_probability:
+            for _ in range(10):
+                action = (self.rng.choice((WALL_H, WALL_V)),
+                          self.rng.randrange(Board.size - 1), self.rng.randrange(Board.size - 1))
+                if percepts.is_action_valid(action, player):
+                    return action
+        if self.rng.random() < 0.2:
+            return self.rng.choice(percepts.get_legal_pawn_moves(player))
+        i, j = percepts.get_shortest_path(player)[0]
+        return MOVE, i, j
+
+
+def simulate_game(factories: Sequence[AgentFactory], seed: int, game: int = 0,
+                  board: Board = None, time_credits: List[Optional[float]] = None,
+                  player_names: List[str] = None, think_time: float = THINK_TIME,
+                  **options: Any) -> Trace:
+    """Play a game between in-process agents and return its trace, always
+    the same for the same arguments.
+
+    Arguments:
+    factories -- functions building the agent of every player from its
+        random generator
+    seed -- the master seed
+    game -- the number of the game in a simulation, from which the seeds of
+        the game are derived
+    board -- the initial board, by default a new board for the number of
+        agents
+    time_credits -- time credits of the players, in virtual seconds
+    player_names -- names of the players
+    think_time -- virtual seconds charged for every call to an agent
+    options -- other arguments of Game (ponder, clock, increment)
+    """
+    clock = VirtualClock()
+    agents = [VirtualTimeAgent(factory(random.Random(derive_seed(seed, game, player))), clock,
+                               think_time)
+              for player, factory in enumerate(factories)]
+    if board is None:
+        board = Board(player_count=len(agents))
+    state = random.getstate()
+    random.seed(derive_seed(seed, game, 'random'))
+    try:
+        simulation = Game(agents, board, None, time_credits or [None] * len(agents), None,
+                          player_names, timer=clock, **options)
+        simulation.play()
+    finally:
+        random.setstate(state)
+    return simulation.trace
+
+
+def simulate(factories: Sequence[AgentFactory], seed: int, games: int,
+             **options: Any) -> Iterator[Trace]:
+    """Yield the traces of games simulated with simulate_game, numbered from
+    0 to games - 1.
+    """
+    for game in range(games):
+        yield simulate_game(factories, seed, game, **options)
+
+
+def trace_digest(trace: Trace) -> str:
+    """Return the SHA-256 of the JSON serialization of a trace, times and
+    metrics included, as an hexadecimal string.
+    """
+    f = io.StringIO()
+    trace.write(f)
+    return hashlib.sha256(f.getvalue().encode('utf-8')).hexdigest()
+
+
+def main() -> None:
+    import argparse
+    import os
+    import time
+
+    from game.trace import write_trace_file
+
+    parser = argparse.ArgumentParser(prog='python -m game.simulation',
+                                     description='Simulate games between seeded random agents.')
+    parser.add_argument('--seed', type=int, default=0, help='master seed (default: %(default)s)')
+    parser.add_argument('--games', type=int, default=100,
+                        help='number of games (default: %(default)s)')
+    parser.add_argument('--players', type=int, choices=(2, 4), default=2,
+                        help='number of players (default: %(default)s)')
+    parser.add_argument('--wall-probability', type=float, default=0.3,
+                        help='probability of placing a wall (default: %(default)s)')
+    parser.add_argument('-o', '--output', metavar='DIR', help='write the traces in DIR')
+    args = parser.parse_args()
+
+    def factory(rng: random.Random) -> Agent:
+        return RandomAgent(rng, args.wall_probability)
+
+    if args.output is not None:
+        os.makedirs(args.output, exist_ok=True)
+    digest = hashlib.sha256()
+    actions = 0
+    start = time.perf_counter()
+    for game, trace in enumerate(simulate([factory] * args.players, args.seed, args.games)):
+        digest.update(trace_digest(trace).encode('ascii'))
+        actions += len(trace.actions)
+        if args.output is not None:
+            write_trace_file(trace, os.path.join(args.output, f'game{game:05}.json'))
+    elapsed = time.perf_counter() - start
+    print(f'{args.games} games, {actions} actions in {elapsed:.3f} s'
+          f' ({actions / elapsed:.0f} actions/s)')
+    print(f'digest {digest.hexdigest()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+"""Live streaming of running games to web spectators.
+
+A StreamingViewer given to Game publishes every event of the game to a
+GameChannel, which fans it out to all the spectators of the game through
+Server-Sent Events served by a StreamServer (stdlib http.server). Events are
+compact per-step deltas, serialized once whatever the number of spectators:
+
+    state     {"step", "board", "player_names"} the whole board, sent first
+              to a new spectator and to one that fell behind
+    playing   {"step", "player"}
+    action    {"step", "player", "action": [kind, i, j]}
+    finished  {"steps", "winner", "reason"}, the last event
+
+Every spectator has a bounded queue: the game never waits for a slow
+client, whose pending events are replaced by a state event when its queue
+is full.
+
+HTTP API:
+    GET /games              the games being streamed, as JSON
+    GET /games/ID/events    the event stream of a game
+
+Usage:
+    python __main__.py --stream 8081 ...
+"""
+import json
+import logging
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from game.board import Board, Action
+from game.game import Viewer
+from game.trace import board_to_dict
+
+SUBSCRIBER_CAPACITY = 256
+# seconds between two comments keeping an idle event stream open
+KEEPALIVE_INTERVAL = 15.0
+
+Message = Optional[bytes]
+
+
+def _message(kind: str, data: Dict[str, Any]) -> bytes:
+    return f'event: {kind}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'.encode('utf-8')
+
+
+class GameChannel:
+    """Fan-out of the events of a game to its spectators."""
+
+    def __init__(self, game_id: str, capacity: int = SUBSCRIBER_CAPACITY) -> None:
+        """
+        Arguments:
+        game_id -- the identifier of the game in the URLs of the server
+        capacity -- maximum number of events pending for a spectator
+        """
+        self.game_id = game_id
+        self.capacity = max(capacity, 1)
+        self.step = 0
+        self.player_names: List[str] = []
+        self.is_finished = False
+        self._board: Optional[Board] = None
+        self._finished: Message = None
+        self._subscribers: List['queue.Queue[Message]'] = []
+        self._lock = threading.Lock()
+
+    def start(self, board: Board, player_names: List[str] = None) -> None:
+        """Start streaming a game from its initial board."""
+        with self._lock:
+            self._board = board.clone()
+            self.step = 0
+            self.player_names = list(player_names or [])
+            self.is_finished = False
+            self._finished = None
+            self._publish(self._state())
+
+    def playing(self, step: int, player: int) -> None:
+        with self._lock:
+            self._publish(_message('playing', {'step': step, 'player': player}))
+
+    def action(self, step: int, action: Action, player: int) -> None:
+        with self._lock:
+            self._board.apply_action(action, player)  # type: ignore
+            self.step = step
+            self._publish(_message('action', {'step': step, 'player': player,
+                                              'action': list(action)}))
+
+    def show(self, step: int, board: Board) -> None:
+        """Send the whole board after step step."""
+        with self._lock:
+            self._board = board.clone()
+            self.step = step
+            self._publish(self._state())
+
+    def finish(self, steps: int, winner: int, reason: str = "") -> None:
+        """Send the outcome of the game and end the event streams."""
+        with self._lock:
+            self.is_finished = True
+            self._finished = _message('finished', {'steps': steps, 'winner': winner,
+                                                   'reason': reason})
+            self._publish(self._finished)
+            self._publish(None)
+
+    def subscribe(self) -> 'queue.Queue[Message]':
+        """Return the queue of the events of a new spectator, starting with
+        the current state of the game. None ends the stream.
+        """
+        # room is kept for the finished event and the end of the stream
+        subscriber: 'queue.Queue[Message]' = queue.Queue(self.capacity + 2)
+        with self._lock:
+            if self._board is not None:
+                subscriber.put_nowait(self._state())
+            if self.is_finished:
+                subscriber.put_nowait(self._finished)
+                subscriber.put_nowait(None)
+            else:
+                self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: 'queue.Queue[Message]') -> None:
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def _state(self) -> bytes:
+        # called with the lock held, once started: the board is set
+        return _message('state', {'step': self.step,
+                                  'board': board_to_dict(self._board),  # type: ignore
+                                  'player_names': self.player_names})
+
+    def _publish(self, message: Message) -> None:
+        # called with the lock held
+        for subscriber in self._subscribers:
+            if message is not None and message is not self._finished and \
+                    subscriber.qsize() >= self.capacity:
+                # the state includes the actions, but not the end of the game
+                self._resync(subscriber)
+            else:
+                subscriber.put_nowait(message)
+        if message is None:
+            self._subscribers.clear()
+
+    def _resync(self, subscriber: 'queue.Queue[Message]') -> None:
+        """Replace the pending events of a spectator that fell behind by the
+        current state.
+        """
+        try:
+            while True:
+                subscriber.get_nowait()
+        except queue.Empty:
+            pass
+        subscriber.put_nowait(self._state())
+
+
+class StreamingViewer(Viewer):
+    """Viewer publishing a game to the spectators of a GameChannel."""
+
+    def __init__(self, channel: GameChannel, player_names: List[str] = None) -> None:
+        super().__init__()
+        self.channel = channel
+        self.player_names = player_names or []
+
+    def init_viewer(self, board: Board) -> None:
+        super().init_viewer(board)
+        self.channel.start(board, self.player_names)
+
+    def playing(self, step: int, player: int) -> None:
+        self.channel.playing(step, player)
+
+    def update(self, step: int, action: Action, player: int) -> None:
+        self.channel.action(step, action, player)
+
+    def show(self, step: int, board: Board) -> None:
+        super().show(step, board)
+        self.channel.show(step, board)
+
+    def finished(self, steps: int, winner: int, reason: str = "") -> None:
+        self.channel.finish(steps, winner, reason)
+
+    def play(self, percepts: Board, player: int, step: int, time_left: float) -> Action:
+        """Spectators cannot play: a human player needs another viewer (see
+        game.game.TeeViewer).
+        """
+        raise NotImplementedError('a streaming viewer cannot play for a human player')
+
+
+class StreamRequestHandler(BaseHTTPRequestHandler):
+    """HTTP front-end of a StreamServer."""
+
+    server: 'StreamServer'
+
+    def do_GET(self) -> None:
+        path = self.path.split('?', 1)[0].rstrip('/')
+        if path == '/games':
+            self._send_json(200, [{'id': channel.game_id, 'step': channel.step,
+                                   'finished': channel.is_finished}
+                                  for channel in list(self.server.channels.values())])
+        elif path.startswith('/games/') and path.endswith('/events'):
+            channel = self.server.channels.get(path[len('/games/'):-len('/events')])
+            if channel is None:
+                self._send_json(404, {'error': 'unknown game'})
+            else:
+                self._stream(channel)
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logging.debug('%s - %s', self.address_string(), format % args)
+
+    def _send_json(self, code: int, data: Any) -> None:
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, channel: GameChannel) -> None:
+        subscriber = channel.subscribe()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            while True:
+                try:
+                    message = subscriber.get(timeout=KEEPALIVE_INTERVAL)
+                except queue.Empty:
+                    message = b':\n\n'
+                if message is None:
+                    break
+                self.wfile.write(message)
+                self.wfile.flush()
+        except OSError:
+            pass  # the client went away
+        finally:
+            channel.unsubscribe(subscriber)
+            self.close_connection = True
+
+
+class StreamServer(ThreadingHTTPServer):
+    """HTTP server streaming games to spectators, in a thread of its own."""
+
+    daemon_threads = True
+
+    def __init__(self, address: str, port: int) -> None:
+        super().__init__((address, port), StreamRequestHandler)
+        self.channels: Dict[str, GameChannel] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def channel(self, game_id: str) -> GameChannel:
+        """Return the channel of a game, created if needed."""
+        return self.channels.setdefault(game_id, GameChannel(game_id))
+
+    def start(self) -> None:
+        """Serve the spectators in a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
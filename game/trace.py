@@ -1,8 +1,26 @@
-from typing import List, Optional, Tuple, IO
-
-import jsonpickle
+import importlib
+import io
+import json
+import logging
+import os
+import struct
+import sys
+import time
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, \
+    Sequence, Tuple, IO, TYPE_CHECKING, overload
 
 from game.board import Board, Action
+from game.constants import ACTION_TYPES
+
+if TYPE_CHECKING:
+    import numpy as np
+
+STREAM_FORMAT = 'quoridor-trace'
+STREAM_VERSION = 1
+REFERENCE_FORMAT = 'quoridor-trace-ref'
+SNAPSHOT_INTERVAL = 16
+# seconds without a new line after which a followed game is considered dead
+FOLLOW_TIMEOUT = 60.0
 
 
 class Trace:
@@ -18,6 +36,8 @@ class Trace:
         seconds.
     winner -- winner of the game
     reason -- specific reason for victory or "" if standard
+    metrics -- list of the timings of every step, as dictionaries (see
+        game.metrics.StepMetrics)
     """
 
     def __init__(self,
@@ -40,6 +60,7 @@ class Trace:
         self.player_names = player_names or []
         self.players_ranking: List[int] = []
         self.reasons: List[Tuple[Optional[int], str]] = []
+        self.metrics: List[Dict[str, float]] = []
 
     def add_action(self, player: int, action: Action, t: float) -> None:
         """Add an action to the trace.
@@ -53,6 +74,10 @@ class Trace:
         """
         self.actions.append((player, action, t))
 
+    def add_metrics(self, metrics: Mapping[str, float]) -> None:
+        """Add the timings of a step to the trace."""
+        self.metrics.append(dict(metrics))
+
     def set_winner(self, winner: int, reason: str) -> None:
         """Set the winner.
 
@@ -73,18 +98,939 @@ class Trace:
         """Return a Board instance representing the initial board."""
         return Board(self.initial_board, len(self.initial_board.pawns))
 
+    def snapshots(self, interval: int = SNAPSHOT_INTERVAL) -> 'BoardSnapshots':
+        """Return the boards of every step of the game (see BoardSnapshots)."""
+        return BoardSnapshots(self, interval)
+
+    def close(self) -> None:
+        """Mark the trace as complete, once the outcome has been set."""
+
     def write(self, f: IO) -> None:
-        """Write the trace to a file."""
-        f.write(jsonpickle.encode(self))
+        """Write the trace to a file, piece by piece (see encode_trace)."""
+        for chunk in encode_trace(self):
+            f.write(chunk)
+
+
+class BoardSnapshots(Sequence[Board]):
+
+    """Boards of a replayed game, indexed by step (0 for the initial board).
+
+    A keyframe is kept every interval steps, computed on first need, so that
+    any board is materialized with less than interval actions applied. The
+    actions of a trace have been validated when the game was played and are
+    applied without being checked again. Every board returned is a copy.
+    """
+
+    def __init__(self, trace: Trace, interval: int = SNAPSHOT_INTERVAL) -> None:
+        """Initialize the snapshots.
+
+        Arguments:
+        trace -- the trace of the game
+        interval -- the number of steps between two keyframes
+        """
+        if interval < 1:
+            raise ValueError('the interval between keyframes must be positive')
+        self.trace = trace
+        self.interval = interval
+        self.keyframes: List[Board] = [trace.get_initial_board()]
+        self._last: Tuple[int, Board] = (0, self.keyframes[0])
+
+    def __len__(self) -> int:
+        return len(self.trace.actions) + 1
+
+    @overload
+    def __getitem__(self, step: int) -> Board:
+        ...
+
+    @overload
+    def __getitem__(self, step: slice) -> List[Board]:
+        ...
+
+    def __getitem__(self, step: Any) -> Any:
+        if isinstance(step, slice):
+            return [self[i] for i in range(*step.indices(len(self)))]
+        if step < 0:
+            step += len(self)
+        if not 0 <= step < len(self):
+            raise IndexError('step out of range')
+
+        keyframe = step // self.interval
+        while len(self.keyframes) <= keyframe:
+            start = (len(self.keyframes) - 1) * self.interval
+            self.keyframes.append(self._advance(self.keyframes[-1], start, start + self.interval))
+
+        # walking forward, e.g. playing the replay, costs one action per step
+        last_step, last_board = self._last
+        if keyframe * self.interval <= last_step <= step:
+            board = self._advance(last_board, last_step, step)
+        else:
+            board = self._advance(self.keyframes[keyframe], keyframe * self.interval, step)
+        self._last = (step, board)
+        return board.clone()
+
+    def _advance(self, board: Board, step: int, target: int) -> Board:
+        """Return a copy of the board of step advanced to step target."""
+        board = board.clone()
+        for player, action, _ in self.trace.actions[step:target]:
+            board.apply_action(action, player)
+        return board
+
+
+def board_to_dict(board: Board) -> Dict[str, Any]:
+    """Return a representation of board made of plain JSON types."""
+    return {
+        'player_count': board.player_count,
+        'pawns': [list(pawn) for pawn in board.pawns],
+        'goals': [list(goal) for goal in board.goals],
+        'starting_wall_count': board.starting_wall_count,
+        'player_walls': list(board.player_walls),
+        'horiz_walls': [list(wall) for wall in board.horiz_walls],
+        'verti_walls': [list(wall) for wall in board.verti_walls],
+    }
+
+
+def board_from_dict(data: Mapping[str, Any]) -> Board:
+    """Return the board represented by data (see board_to_dict)."""
+    board = Board(player_count=data['player_count'])
+    board.pawns = [(i, j) for i, j in data['pawns']]
+    board.goals = [(i, j) for i, j in data['goals']]
+    board.starting_wall_count = data['starting_wall_count']
+    board.player_walls = list(data['player_walls'])
+    board.horiz_walls = [(i, j) for i, j in data['horiz_walls']]
+    board.verti_walls = [(i, j) for i, j in data['verti_walls']]
+    return board
+
+
+def _dumps(data: Any) -> str:
+    return json.dumps(data, separators=(',', ':'))
+
+
+class StreamingTrace(Trace):
+
+    """Trace written to a file as the game progresses.
+
+    The file is in the JSON Lines format: a header with the initial board,
+    the time limits and the names of the players, then one line per action
+    (and per step timings), then a footer with the outcome of the game
+    written by close(). Every line is flushed, so that the file can be
+    followed while the game is played (see follow_trace) and a crashed game
+    still leaves the actions played so far.
+    """
+
+    def __init__(self,
+                 board: Board,
+                 time_limits: List[Optional[float]],
+                 player_names: List[str] = None,
+                 f: IO = None) -> None:
+        """Initialize the trace and write its header.
+
+        Arguments:
+        board -- the initial board
+        time_limits -- a sequence of 2 elements containing the time limits in
+            seconds for each agent, or None for a time-unlimited agent
+        player_names -- names of the players on the board, in corresponding order
+        f -- the text file the trace is written to
+        """
+        super().__init__(board, time_limits, player_names)
+        if f is None:
+            raise ValueError('a streaming trace needs a file')
+        self.file: IO = f
+        self._write_line({
+            'format': STREAM_FORMAT,
+            'version': STREAM_VERSION,
+            'initial_board': board_to_dict(self.initial_board),
+            'time_limits': self.time_limits,
+            'player_names': self.player_names,
+        })
+
+    def add_action(self, player: int, action: Action, t: float) -> None:
+        super().add_action(player, action, t)
+        self._write_line({'player': player, 'action': list(action), 't': t})
+
+    def add_metrics(self, metrics: Mapping[str, float]) -> None:
+        super().add_metrics(metrics)
+        self._write_line({'metrics': dict(metrics)})
+
+    def close(self) -> None:
+        """Write the footer of the trace."""
+        self._write_line({
+            'winner': self.winner,
+            'reason': self.reason,
+            'players_ranking': self.players_ranking,
+            'reasons': self.reasons,
+        })
+
+    def _write_line(self, data: Mapping[str, Any]) -> None:
+        self.file.write(_dumps(data) + '\n')
+        self.file.flush()
+
+
+class LazyLines(Sequence[Any]):
+    """Read-only sequence of the lines of a streamed trace, every line being
+    decoded on access only.
+    """
+
+    def __init__(self, lines: List[str], decode: Callable[[Dict[str, Any]], Any]) -> None:
+        self.lines = lines
+        self.decode = decode
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    @overload
+    def __getitem__(self, index: int) -> Any:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[Any]:
+        ...
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, slice):
+            return [self.decode(json.loads(line)) for line in self.lines[index]]
+        return self.decode(json.loads(self.lines[index]))
+
+
+class Result:
+    """Final rank of a team, as written in the results file."""
+
+    def __init__(self, team_name: str, rank: int) -> None:
+        self.team_name = team_name
+        self.rank = rank
+
+
+UNRANKED = 100
+
+
+def get_results(trace: Trace) -> List[Result]:
+    """Return the rank of every team of a finished game.
+
+    Players missing from the ranking get rank UNRANKED. If the players have
+    no name, the winner is the only result.
+    """
+    if not trace.player_names:
+        return [Result(str(trace.winner), trace.winner)]
+
+    results = [Result(trace.player_names[player], rank)
+               for rank, player in enumerate(trace.players_ranking)]
+    results.extend(Result(name, UNRANKED) for player, name in enumerate(trace.player_names)
+                   if player not in trace.players_ranking)
+    return results
 
 
 class CannotLoadTrace(Exception):
-    """Occurs when the trace cannot be un-pickled."""
+    """Occurs when the trace cannot be loaded."""
+
+
+TRACE_OBJECT = 'game.trace.Trace'
+BOARD_OBJECT = 'game.board.Board'
+TRACE_FIELDS = ('time_limits', 'initial_board', 'actions', 'winner', 'reason', 'player_names',
+                'players_ranking', 'reasons', 'metrics')
+BOARD_FIELDS = ('player_count', 'pawns', 'goals', 'starting_wall_count', 'player_walls',
+                'horiz_walls', 'verti_walls')
+
+
+def _flatten(value: Any) -> Any:
+    """Return value in the JSON representation of jsonpickle."""
+    if isinstance(value, tuple):
+        return {'py/tuple': [_flatten(item) for item in value]}
+    if isinstance(value, list):
+        return [_flatten(item) for item in value]
+    if isinstance(value, Board):
+        board = {'py/object': BOARD_OBJECT}
+        board.update((field, _flatten(getattr(value, field))) for field in BOARD_FIELDS)
+        return board
+    return value
+
+
+def encode_trace(trace: Trace) -> Iterator[str]:
+    """Encode a trace in the format of jsonpickle.encode, yielding one
+    action or step timings at a time so that the whole text is never held
+    in memory.
+    """
+    yield '{"py/object": ' + json.dumps(TRACE_OBJECT)
+    for field in TRACE_FIELDS:
+        yield f', {json.dumps(field)}: '
+        value = getattr(trace, field)
+        if field in ('actions', 'metrics'):
+            separator = '['
+            for item in value:
+                yield separator + json.dumps(_flatten(tuple(item) if field == 'actions' else item))
+                separator = ', '
+            yield ']' if separator == ', ' else '[]'
+        else:
+            yield json.dumps(_flatten(value))
+    yield '}'
+
+
+def _tuple_hook(data: Dict[str, Any]) -> Any:
+    if len(data) == 1 and 'py/tuple' in data:
+        return tuple(data['py/tuple'])
+    return data
+
+
+def _resolve_references(value: Any, objects: List[Any]) -> Any:
+    """Return value with its tuples restored and its {"py/id": N}
+    references, written by jsonpickle for an object appearing twice,
+    replaced by the object they designate.
+
+    As in jsonpickle, N is the index of the object among the lists and
+    dicts of the document, tuples excepted, in the order they start.
+    """
+    if isinstance(value, list):
+        objects.append(value)
+        value[:] = [_resolve_references(item, objects) for item in value]
+    elif isinstance(value, dict):
+        if len(value) == 1 and 'py/tuple' in value:
+            items = _check(value['py/tuple'], list, 'py/tuple')
+            return tuple(_resolve_references(item, objects) for item in items)
+        if len(value) == 1 and 'py/id' in value:
+            index = value['py/id']
+            if not isinstance(index, int) or isinstance(index, bool) or \
+                    not 0 <= index < len(objects):
+                raise CannotLoadTrace(f'invalid reference: {index!r}')
+            return objects[index]
+        objects.append(value)
+        for key, item in value.items():
+            value[key] = _resolve_references(item, objects)
+    return value
+
+
+def _check(value: Any, types: Any, field: str) -> Any:
+    # bool is an int but never a valid number of the schema
+    if not isinstance(value, types) or isinstance(value, bool):
+        raise CannotLoadTrace(f'invalid {field}: {value!r}')
+    return value
+
+
+def _optional(value: Any, types: Any, field: str) -> Any:
+    return value if value is None else _check(value, types, field)
+
+
+def _positions(values: Any, field: str, optional: bool = False) -> List[Any]:
+    check = _optional if optional else _check
+    positions = []
+    for position in _check(values, list, field):
+        if not isinstance(position, (tuple, list)) or len(position) != 2:
+            raise CannotLoadTrace(f'invalid {field}: {position!r}')
+        positions.append((check(position[0], int, field), check(position[1], int, field)))
+    return positions
+
+
+def _decode_board(data: Any) -> Board:
+    if not isinstance(data, dict) or data.get('py/object') != BOARD_OBJECT:
+        raise CannotLoadTrace('invalid initial_board')
+    board = Board(player_count=_check(data['player_count'], int, 'player_count'))
+    board.pawns = _positions(data['pawns'], 'pawns')
+    board.goals = _positions(data['goals'], 'goals', optional=True)
+    board.starting_wall_count = _check(data.get('starting_wall_count', board.starting_wall_count),
+                                       int, 'starting_wall_count')
+    board.player_walls = [_check(walls, int, 'player_walls')
+                          for walls in _check(data['player_walls'], list, 'player_walls')]
+    board.horiz_walls = _positions(data['horiz_walls'], 'horiz_walls')
+    board.verti_walls = _positions(data['verti_walls'], 'verti_walls')
+    if not len(board.pawns) == len(board.goals) == len(board.player_walls) == board.player_count:
+        raise CannotLoadTrace('inconsistent player count')
+    return board
+
+
+def _decode_actions(values: Any) -> List[Tuple[int, Action, float]]:
+    actions = []
+    for value in _check(values, list, 'actions'):
+        try:
+            player, (kind, i, j), t = value
+        except (TypeError, ValueError):
+            raise CannotLoadTrace(f'invalid action: {value!r}')
+        if kind not in ACTION_TYPES or not isinstance(i, int) or not isinstance(j, int):
+            raise CannotLoadTrace(f'invalid action: {value!r}')
+        actions.append((_check(player, int, 'player'), (kind, i, j), _check(t, (int, float), 'time')))
+    return actions
+
+
+def decode_trace(text: str) -> Trace:
+    """Build a trace from the text written by Trace.write.
+
+    Unlike jsonpickle.decode, only the Trace and Board objects of the trace
+    schema are built, so that untrusted files can be loaded safely. Raise
+    CannotLoadTrace if text does not follow the schema.
+    """
+    try:
+        if '"py/id"' in text:
+            data = _resolve_references(json.loads(text), [])
+        else:
+            data = json.loads(text, object_hook=_tuple_hook)
+    except ValueError as e:
+        raise CannotLoadTrace(e) from e
+    if not isinstance(data, dict) or data.get('py/object') != TRACE_OBJECT:
+        raise CannotLoadTrace('not a trace')
+
+    try:
+        trace = Trace.__new__(Trace)
+        trace.initial_board = _decode_board(data['initial_board'])
+        trace.time_limits = [_optional(limit, (int, float), 'time_limits')
+                             for limit in _check(data['time_limits'], list, 'time_limits')]
+        trace.actions = _decode_actions(data['actions'])
+        trace.winner = _check(data.get('winner', 0), int, 'winner')
+        trace.reason = _check(data.get('reason', ''), str, 'reason')
+        trace.player_names = [_check(name, str, 'player_names')
+                              for name in _check(data.get('player_names', []), list, 'player_names')]
+        trace.players_ranking = [_check(player, int, 'players_ranking') for player
+                                 in _check(data.get('players_ranking', []), list, 'players_ranking')]
+        trace.reasons = []
+        for reason in _check(data.get('reasons', []), list, 'reasons'):
+            if not isinstance(reason, tuple) or len(reason) != 2:
+                raise CannotLoadTrace(f'invalid reasons: {reason!r}')
+            trace.reasons.append((_optional(reason[0], int, 'reasons'), _check(reason[1], str, 'reasons')))
+        trace.metrics = [_check(metrics, dict, 'metrics')
+                         for metrics in _check(data.get('metrics', []), list, 'metrics')]
+    except KeyError as e:
+        raise CannotLoadTrace(f'missing field {e}') from e
+    return trace
+
+
+def _decode_action(data: Dict[str, Any]) -> Tuple[int, Action, float]:
+    kind, i, j = data['action']
+    return data['player'], (kind, i, j), data['t']
+
+
+def _decode_metrics(data: Dict[str, Any]) -> Dict[str, float]:
+    return data['metrics']
+
+
+def _is_stream_header(line: str) -> bool:
+    return line.startswith('{"format":"' + STREAM_FORMAT + '"')
+
+
+def _trace_from_header(header: Dict[str, Any]) -> Trace:
+    if header.get('version') != STREAM_VERSION:
+        raise CannotLoadTrace(f'unsupported trace version {header.get("version")!r}')
+    return Trace(board_from_dict(header['initial_board']), header['time_limits'],
+                 header['player_names'])
+
+
+def _set_outcome(trace: Trace, footer: Dict[str, Any]) -> None:
+    trace.set_winner(footer['winner'], footer['reason'])
+    trace.set_ranking(footer['players_ranking'])
+    trace.set_reasons([(step, reason) for step, reason in footer['reasons']])
+
+
+def _load_stream(header: str, f: IO) -> Trace:
+    """Load a streamed trace whose header line has already been read.
+
+    The file is read in a single pass, but actions and timings are only
+    decoded when accessed (see LazyLines). The outcome of a game that did not
+    finish is left unset. Raise CannotLoadTrace if the last line is cut, as
+    every line is written whole.
+    """
+    trace = _trace_from_header(json.loads(header))
+    actions: List[str] = []
+    metrics: List[str] = []
+    for line in f:
+        if not line.endswith('\n'):
+            raise CannotLoadTrace('truncated line')
+        if line.startswith('{"player"'):
+            actions.append(line)
+        elif line.startswith('{"metrics"'):
+            metrics.append(line)
+        elif line.startswith('{"winner"'):
+            _set_outcome(trace, json.loads(line))
+    trace.actions = LazyLines(actions, _decode_action)  # type: ignore
+    trace.metrics = LazyLines(metrics, _decode_metrics)  # type: ignore
+    return trace
 
 
 def load_trace(f: IO) -> Trace:
-    """Load a trace from a file."""
-    trace = jsonpickle.decode(f.read())
-    if isinstance(trace, Trace):
-        return trace
-    raise CannotLoadTrace
+    """Load a trace from a file, either written by Trace.write or by a
+    StreamingTrace.
+    """
+    return _load_text(f.readline(), f)
+
+
+def _load_text(first: str, f: IO) -> Trace:
+    if _is_reference(first):
+        raise CannotLoadTrace('trace reference, to be loaded with read_trace_file')
+    if _is_stream_header(first):
+        try:
+            return _load_stream(first, f)
+        except (ValueError, KeyError, TypeError) as e:
+            raise CannotLoadTrace(e) from e
+    return decode_trace(first + f.read())
+
+
+def follow_trace(f: IO,
+                 poll_interval: float = 0.2,
+                 idle_timeout: Optional[float] = FOLLOW_TIMEOUT,
+                 ) -> Tuple[Trace, Iterator[Tuple[int, Action, float]]]:
+    """Follow a streamed trace while it is being written.
+
+    Return the trace, with the initial board and the names of the players,
+    and an iterator over the actions as they are played. Every action
+    yielded is also added to the trace; the iteration stops once the footer
+    has been read and the outcome of the game set in the trace, or once the
+    file has not grown for idle_timeout seconds (e.g. the game was killed),
+    the outcome being left unset.
+
+    Raise CannotLoadTrace if the file is not a streamed trace or its header
+    is not written in time.
+
+    Arguments:
+    f -- the text file the trace is written to
+    poll_interval -- the time in seconds to wait for a new line
+    idle_timeout -- the time in seconds without new data after which the
+        game is considered dead, or None to wait forever
+    """
+    def read_line() -> Optional[str]:
+        line = ''
+        idle_since = time.monotonic()
+        while not line.endswith('\n'):
+            chunk = f.readline()
+            if chunk:
+                line += chunk
+                idle_since = time.monotonic()
+            elif idle_timeout is not None and time.monotonic() - idle_since >= idle_timeout:
+                return None
+            else:
+                time.sleep(poll_interval)
+        return line
+
+    header = read_line()
+    if header is None:
+        raise CannotLoadTrace('no trace written')
+    if not _is_stream_header(header):
+        raise CannotLoadTrace('not a streamed trace')
+    trace = _trace_from_header(json.loads(header))
+
+    def actions() -> Iterator[Tuple[int, Action, float]]:
+        while True:
+            line = read_line()
+            if line is None:
+                logging.warning('No new line in the followed trace for %s s, giving up',
+                                idle_timeout)
+                return
+            data = json.loads(line)
+            if 'action' in data:
+                player, action, t = _decode_action(data)
+                trace.add_action(player, action, t)
+                yield player, action, t
+            elif 'metrics' in data:
+                trace.add_metrics(data['metrics'])
+            elif 'winner' in data:
+                _set_outcome(trace, data)
+                return
+
+    return trace, actions()
+
+
+# Binary format: a fixed header giving the number of records and the offset
+# of every section, the initial board, then fixed-width records so that step N
+# is at actions_offset + N * ACTION_RECORD.size.
+BINARY_MAGIC = b'QTRC'
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct('<4sHHIIIIII')
+ACTION_RECORD = struct.Struct('<BBBBd')  # player, kind, i, j, time
+# the same layout, as the fields of a NumPy dtype (NumPy is only imported by
+# the tools analysing traces, see action_array)
+ACTION_DTYPE_FIELDS = [('player', '<u1'), ('kind', '<u1'), ('i', '<u1'), ('j', '<u1'),
+                       ('think', '<f8')]
+METRICS_RECORD = struct.Struct('<IB6d')  # step, player, timings
+NO_POSITION = 255
+
+
+class RecordSequence(Sequence[Any]):
+    """Read-only sequence decoding fixed-width records of a buffer on access."""
+
+    def __init__(self, buffer: bytes, offset: int, length: int, record: struct.Struct,
+                 decode: Callable[[Tuple[Any, ...]], Any]) -> None:
+        self.buffer = buffer
+        self.offset = offset
+        # not count, which would hide Sequence.count
+        self.length = length
+        self.record = record
+        self.decode = decode
+
+    def __len__(self) -> int:
+        return self.length
+
+    @overload
+    def __getitem__(self, index: int) -> Any:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[Any]:
+        ...
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.length))]
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError('record index out of range')
+        return self.decode(self.record.unpack_from(self.buffer, self.offset + index * self.record.size))
+
+
+def _pack_position(position: Tuple[Optional[int], Optional[int]]) -> Tuple[int, int]:
+    return tuple(NO_POSITION if x is None else x for x in position)  # type: ignore
+
+
+def _unpack_position(i: int, j: int) -> Tuple[Optional[int], Optional[int]]:
+    return (None if i == NO_POSITION else i), (None if j == NO_POSITION else j)
+
+
+def pack_board(board: Board) -> bytes:
+    """Return the compact binary representation of board."""
+    data = [board.player_count, board.starting_wall_count]
+    for player in range(board.player_count):
+        data.extend(_pack_position(board.pawns[player]))
+        data.extend(_pack_position(board.goals[player]))
+        data.append(board.player_walls[player])
+    for walls in (board.horiz_walls, board.verti_walls):
+        data.append(len(walls))
+        for wall in walls:
+            data.extend(wall)
+    return bytes(data)
+
+
+def unpack_board(data: bytes) -> Board:
+    """Return the board packed in data by pack_board."""
+    board = Board(player_count=data[0])
+    board.starting_wall_count = data[1]
+    position = 2
+    for player in range(board.player_count):
+        pawn_i, pawn_j, goal_i, goal_j, walls = data[position:position + 5]
+        board.pawns[player] = (pawn_i, pawn_j)
+        board.goals[player] = _unpack_position(goal_i, goal_j)
+        board.player_walls[player] = walls
+        position += 5
+    for walls in (board.horiz_walls, board.verti_walls):
+        count = data[position]
+        walls.extend((data[position + 1 + 2 * k], data[position + 2 + 2 * k]) for k in range(count))
+        position += 1 + 2 * count
+    return board
+
+
+def pack_meta(trace: Trace) -> bytes:
+    """Return the time limits, names and outcome of a trace as JSON."""
+    return _dumps({
+        'time_limits': trace.time_limits,
+        'player_names': trace.player_names,
+        'winner': trace.winner,
+        'reason': trace.reason,
+        'players_ranking': trace.players_ranking,
+        'reasons': trace.reasons,
+    }).encode('utf-8')
+
+
+def unpack_trace(board: bytes, meta: bytes) -> Trace:
+    """Return a trace, without actions, from its packed initial board and
+    the data returned by pack_meta.
+    """
+    try:
+        data = json.loads(meta.decode('utf-8'))
+        trace = Trace(unpack_board(board), data['time_limits'], data['player_names'])
+        _set_outcome(trace, data)
+    except (ValueError, KeyError, TypeError, IndexError) as e:
+        raise CannotLoadTrace(e) from e
+    return trace
+
+
+def write_binary(trace: Trace, f: BinaryIO) -> None:
+    """Write a trace to a binary file, in the compact format read by
+    load_binary.
+    """
+    from game.metrics import TIMINGS
+
+    board = pack_board(trace.initial_board)
+    meta = pack_meta(trace)
+    board_offset = BINARY_HEADER.size
+    actions_offset = board_offset + len(board)
+    metrics_offset = actions_offset + len(trace.actions) * ACTION_RECORD.size
+    meta_offset = metrics_offset + len(trace.metrics) * METRICS_RECORD.size
+
+    f.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, 0, len(trace.actions),
+                               len(trace.metrics), board_offset, actions_offset,
+                               metrics_offset, meta_offset))
+    f.write(board)
+    for player, (kind, i, j), t in trace.actions:
+        f.write(ACTION_RECORD.pack(player, ACTION_TYPES.index(kind), i, j, t))
+    for metrics in trace.metrics:
+        f.write(METRICS_RECORD.pack(int(metrics['step']), int(metrics['player']),
+                                    *(metrics[timing] for timing in TIMINGS)))
+    f.write(meta)
+
+
+def action_array(actions: Sequence[Tuple[int, Action, float]]) -> 'np.ndarray':
+    """Return the actions of a trace as a NumPy array of dtype
+    ACTION_DTYPE_FIELDS, mapped on the buffer of a binary trace without
+    being copied.
+    """
+    import numpy as np
+    dtype = np.dtype(ACTION_DTYPE_FIELDS)
+    if isinstance(actions, RecordSequence) and actions.record == ACTION_RECORD:
+        return np.frombuffer(actions.buffer, dtype, actions.length, actions.offset)
+    return np.array([(player, ACTION_TYPES.index(kind), i, j, t)
+                     for player, (kind, i, j), t in actions], dtype=dtype)
+
+
+def decode_action_record(record: Tuple[int, int, int, int, float]) -> Tuple[int, Action, float]:
+    """Return the (player, action, time) tuple of an unpacked ACTION_RECORD."""
+    player, kind, i, j, t = record
+    return player, (ACTION_TYPES[kind], i, j), t
+
+
+def _decode_metrics_record(record: Tuple[Any, ...]) -> Dict[str, float]:
+    from game.metrics import TIMINGS
+
+    metrics = {'step': record[0], 'player': record[1]}
+    metrics.update(zip(TIMINGS, record[2:]))
+    return metrics
+
+
+def is_binary_trace(data: bytes) -> bool:
+    """Return True if data starts like a binary trace."""
+    return data[:len(BINARY_MAGIC)] == BINARY_MAGIC
+
+
+def load_binary(f: BinaryIO) -> Trace:
+    """Load a trace written by write_binary.
+
+    Actions and timings are decoded on access only, any step being reached
+    without decoding the previous ones.
+    """
+    buffer = f.read()
+    if not is_binary_trace(buffer) or len(buffer) < BINARY_HEADER.size:
+        raise CannotLoadTrace('not a binary trace')
+    _, version, _, action_count, metrics_count, board_offset, actions_offset, metrics_offset, \
+        meta_offset = BINARY_HEADER.unpack_from(buffer)
+    if version != BINARY_VERSION:
+        raise CannotLoadTrace(f'unsupported binary trace version {version}')
+    trace = unpack_trace(buffer[board_offset:actions_offset], buffer[meta_offset:])
+    trace.actions = RecordSequence(buffer, actions_offset, action_count,  # type: ignore
+                                   ACTION_RECORD, decode_action_record)
+    trace.metrics = RecordSequence(buffer, metrics_offset, metrics_count,  # type: ignore
+                                   METRICS_RECORD, _decode_metrics_record)
+    return trace
+
+
+def write_stream(trace: Trace, f: IO) -> None:
+    """Write a trace to a text file in the JSON Lines format of
+    StreamingTrace.
+    """
+    stream = StreamingTrace(trace.initial_board, trace.time_limits, trace.player_names, f)
+    metrics = iter(trace.metrics)
+    for player, action, t in trace.actions:
+        stream.add_action(player, action, t)
+        step_metrics = next(metrics, None)
+        if step_metrics is not None:
+            stream.add_metrics(step_metrics)
+    stream.set_winner(trace.winner, trace.reason)
+    stream.set_ranking(trace.players_ranking)
+    stream.set_reasons(trace.reasons)
+    stream.close()
+
+
+BINARY_EXTENSION = '.qtrace'
+STREAM_EXTENSION = '.jsonl'
+TRACE_EXTENSIONS = ('.json', STREAM_EXTENSION, BINARY_EXTENSION)
+
+
+# stdlib compressions, chosen by extension when writing and by magic number
+# when reading; their modules are only imported when used
+COMPRESSIONS: Dict[str, Tuple[bytes, str]] = {
+    '.gz': (b'\x1f\x8b', 'gzip'),
+    '.bz2': (b'BZh', 'bz2'),
+    '.xz': (b'\xfd7zXZ\x00', 'lzma'),
+}
+
+
+def split_compression(path: str) -> Tuple[str, Optional[str]]:
+    """Return path without its compression extension, and that extension
+    (None if path is not compressed).
+    """
+    for extension in COMPRESSIONS:
+        if path.endswith(extension):
+            return path[:-len(extension)], extension
+    return path, None
+
+
+def open_trace(path: str, mode: str = 'r', compression: str = None) -> IO:
+    """Open a trace file, compressed or not.
+
+    When writing, the compression is given by the extension of path (.gz,
+    .bz2 or .xz) unless compression is given. When reading, it is detected
+    from the content of the file.
+
+    Arguments:
+    path -- the path of the file
+    mode -- 'r', 'w', 'rb' or 'wb'
+    compression -- a key of COMPRESSIONS or None
+    """
+    text = 'b' not in mode
+    if mode.startswith('r'):
+        with open(path, 'rb') as f:
+            compression = _detect_compression(f.read(6))
+    elif compression is None:
+        compression = split_compression(path)[1]
+    if compression is None:
+        return open(path, mode, encoding='utf-8') if text else open(path, mode)
+    opener: Callable[..., IO] = importlib.import_module(COMPRESSIONS[compression][1]).open
+    return opener(path, mode[0] + 't', encoding='utf-8') if text else opener(path, mode[0] + 'b')
+
+
+# errors of truncated or corrupt files, besides those of the decompression
+# modules which are only imported when used
+DECODING_ERRORS: Tuple[type, ...] = (EOFError, OSError, ValueError, struct.error)
+
+
+def _decoding_errors() -> Tuple[type, ...]:
+    """Return the errors raised when reading a truncated or corrupt file."""
+    errors = DECODING_ERRORS
+    if 'zlib' in sys.modules:
+        errors += (sys.modules['zlib'].error,)
+    if 'lzma' in sys.modules:
+        errors += (sys.modules['lzma'].LZMAError,)
+    return errors
+
+
+def _detect_compression(head: bytes) -> Optional[str]:
+    """Return the key of COMPRESSIONS of a file starting with head, or None
+    if it is not compressed.
+    """
+    return next((extension for extension, (magic, _) in COMPRESSIONS.items()
+                 if head.startswith(magic)), None)
+
+
+def read_trace_file(path: str) -> Trace:
+    """Load the trace written in the file at path, whatever its format and
+    compression.
+    """
+    with open(path, 'rb') as f:
+        return read_trace(f, path)
+
+
+def read_trace(f: BinaryIO, path: str = '') -> Trace:
+    """Load the trace written in a buffered binary file, e.g.
+    sys.stdin.buffer, whatever its format and compression. Raise
+    CannotLoadTrace if it is not a trace, or is truncated or corrupt.
+
+    Arguments:
+    f -- the file, positioned at the start of the trace
+    path -- the path of the file, relative to which the target of a trace
+        reference is resolved
+    """
+    try:
+        return _read_trace(f, path)
+    except CannotLoadTrace:
+        raise
+    except _decoding_errors() as e:
+        raise CannotLoadTrace(f'{type(e).__name__}: {e}') from e
+
+
+def _read_trace(f: BinaryIO, path: str) -> Trace:
+    compression = _detect_compression(f.peek(6))  # type: ignore
+    if compression is not None:
+        f = importlib.import_module(COMPRESSIONS[compression][1]).open(f, 'rb')
+    if is_binary_trace(f.peek(len(BINARY_MAGIC))):  # type: ignore
+        return load_binary(f)
+    text = io.TextIOWrapper(f, encoding='utf-8')
+    first = text.readline()
+    if _is_reference(first):
+        return _load_reference(first, path)
+    return _load_text(first, text)
+
+
+def write_trace_file(trace: Trace, path: str, compression: str = None) -> None:
+    """Write a trace to the file at path, in the format given by the
+    extension of path: binary (.qtrace), JSON Lines (.jsonl) or jsonpickle
+    (any other), compressed if this extension is followed by .gz, .bz2 or
+    .xz.
+
+    Arguments:
+    trace -- the trace to write
+    path -- the path of the file
+    compression -- a key of COMPRESSIONS to compress whatever the extension
+    """
+    base, _ = split_compression(path)
+    if base.endswith(BINARY_EXTENSION):
+        with open_trace(path, 'wb', compression) as f:
+            write_binary(trace, f)  # type: ignore
+    elif base.endswith(STREAM_EXTENSION):
+        with open_trace(path, 'w', compression) as f:
+            write_stream(trace, f)
+    else:
+        with open_trace(path, 'w', compression) as f:
+            trace.write(f)
+
+
+def _is_reference(line: str) -> bool:
+    return line.startswith('{"format":"' + REFERENCE_FORMAT + '"')
+
+
+def _load_reference(line: str, path: str) -> Trace:
+    try:
+        data = json.loads(line)
+        target = os.path.join(os.path.dirname(path), data['target'])
+        if is_reference_file(target):
+            raise CannotLoadTrace(f"reference to another reference '{target}'")
+        trace = read_trace_file(target)
+        trace.time_limits = data['time_limits']
+        _set_outcome(trace, data)
+    except (ValueError, KeyError, TypeError) as e:
+        raise CannotLoadTrace(e) from e
+    return trace
+
+
+def is_reference_file(path: str) -> bool:
+    """Return whether the file at path is a trace reference written by
+    write_reference.
+    """
+    with open(path, 'rb') as f:
+        return _is_reference(f.read(len(REFERENCE_FORMAT) + 12).decode('utf-8', 'replace'))
+
+
+def write_reference(trace: Trace, target: str, path: str, content_hash: str = '') -> None:
+    """Write at path a reference to the file target holding the same game
+    as trace (see game.dedup).
+
+    The reference is a single JSON line, never compressed whatever the
+    extension of path, keeping the time limits and outcome of trace. It is
+    resolved by read_trace_file, the actions and their times being those of
+    target. The file is replaced atomically.
+
+    Arguments:
+    trace -- the trace referencing target
+    target -- path of the file of the original trace
+    path -- path of the reference
+    content_hash -- the hash of the game, as given by game.dedup.trace_hash
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    line = _dumps({
+        'format': REFERENCE_FORMAT,
+        'version': STREAM_VERSION,
+        'target': os.path.relpath(os.path.abspath(target), directory),
+        'hash': content_hash,
+        'time_limits': trace.time_limits,
+        'winner': trace.winner,
+        'reason': trace.reason,
+        'players_ranking': trace.players_ranking,
+        'reasons': trace.reasons,
+    })
+    temporary = path + '.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        f.write(line + '\n')
+    os.replace(temporary, path)
+
+
+def find_traces(paths: Iterable[str]) -> Iterator[str]:
+    """Yield the trace files of paths, looking into directories recursively
+    for files with a trace extension, compressed or not.
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for root, directories, files in os.walk(path):
+            directories.sort()
+            for name in sorted(files):
+                if split_compression(name)[0].endswith(TRACE_EXTENSIONS):
+                    yield os.path.join(root, name)
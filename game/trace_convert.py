@@ -0,0 +1,26 @@
+"""Convert game traces between formats.
+
+The format of the converted trace is given by the extension of its file:
+binary (.qtrace), JSON Lines (.jsonl) or jsonpickle (any other). The
+source trace may be in any format.
+
+Usage:
+    python -m game.trace_convert game.json game.qtrace
+"""
+import argparse
+
+from game.trace import read_trace_file, write_trace_file
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog='python -m game.trace_convert',
+                                     description='Convert game traces between formats.')
+    parser.add_argument('source', help='the trace to convert, in any format')
+    parser.add_argument('destination', help='the converted trace, in the format given by the'
+                                            ' extension of DESTINATION')
+    args = parser.parse_args()
+    write_trace_file(read_trace_file(args.source), args.destination)
+
+
+if __name__ == '__main__':
+    main()
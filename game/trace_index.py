@@ -0,0 +1,327 @@
+"""Index of an archive of game traces in a SQLite database.
+
+Traces are read with game.trace.read_trace_file, whatever their format,
+and stored in these tables:
+    games      one row per trace: path, winner, reason, number of steps
+    players    name, rank and expulsion reason of every player of a game
+    actions    every action of a game, with its time
+    timings    the per-step timings of a game (see game.metrics.StepMetrics)
+
+Ingestion is incremental: a trace whose size and modification time did not
+change since it was indexed is skipped. Traces are decoded by a pool of
+processes while the database is written by the calling one.
+
+Usage:
+    python -m game.trace_index archive.db ingest traces/ -j 8
+    python -m game.trace_index archive.db query "SELECT ..."
+    python -m game.trace_index archive.db pairings
+"""
+import concurrent.futures
+import logging
+import os
+import sqlite3
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from game.metrics import TIMINGS
+from game.trace import CannotLoadTrace, Trace, find_traces, read_trace_file, UNRANKED
+
+SCHEMA_VERSION = 1
+
+SCHEMA = f'''
+CREATE TABLE games (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    player_count INTEGER NOT NULL,
+    winner INTEGER NOT NULL,
+    winner_name TEXT,
+    reason TEXT NOT NULL,
+    steps INTEGER NOT NULL
+);
+CREATE TABLE players (
+    game_id INTEGER NOT NULL REFERENCES games(id) ON DELETE CASCADE,
+    player INTEGER NOT NULL,
+    name TEXT,
+    rank INTEGER NOT NULL,
+    time_limit REAL,
+    reason_step INTEGER,
+    reason TEXT NOT NULL,
+    PRIMARY KEY (game_id, player)
+);
+CREATE TABLE actions (
+    game_id INTEGER NOT NULL REFERENCES games(id) ON DELETE CASCADE,
+    step INTEGER NOT NULL,
+    player INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    i INTEGER NOT NULL,
+    j INTEGER NOT NULL,
+    time REAL NOT NULL,
+    PRIMARY KEY (game_id, step)
+);
+CREATE TABLE timings (
+    game_id INTEGER NOT NULL REFERENCES games(id) ON DELETE CASCADE,
+    step INTEGER NOT NULL,
+    player INTEGER NOT NULL,
+    {', '.join(f'{timing} REAL NOT NULL' for timing in TIMINGS)},
+    PRIMARY KEY (game_id, step)
+);
+CREATE INDEX players_name ON players (name, rank);
+CREATE INDEX games_winner_name ON games (winner_name);
+'''
+
+# average game length of every pair of teams, whatever their order
+PAIRINGS = '''
+SELECT min(a.name, b.name) AS team1, max(a.name, b.name) AS team2,
+       count(*) AS games, avg(g.steps) AS steps
+FROM games g
+JOIN players a ON a.game_id = g.id AND a.player = 0
+JOIN players b ON b.game_id = g.id AND b.player = 1
+GROUP BY team1, team2
+ORDER BY team1, team2
+'''
+
+LOSSES = '''
+SELECT g.path, p.rank, p.reason_step, p.reason
+FROM players p JOIN games g ON g.id = p.game_id
+WHERE p.name = ? AND p.rank > 0 AND p.reason LIKE ? ESCAPE '\\'
+ORDER BY g.path
+'''
+
+
+class IndexedTrace(NamedTuple):
+    """Rows of a trace, as inserted in the index."""
+    game: Tuple[Any, ...]
+    players: List[Tuple[Any, ...]]
+    actions: List[Tuple[Any, ...]]
+    timings: List[Tuple[Any, ...]]
+
+
+def read_rows(path: str) -> IndexedTrace:
+    """Read the trace at path and return its rows (without game id).
+
+    Raise CannotLoadTrace if the trace cannot be loaded or is inconsistent,
+    e.g. with fewer reasons than players.
+    """
+    stat = os.stat(path)
+    trace = read_trace_file(path)
+    try:
+        return _trace_rows(path, stat, trace)
+    except (IndexError, KeyError, TypeError) as e:
+        raise CannotLoadTrace(f'inconsistent trace: {e!r}') from e
+
+
+def _trace_rows(path: str, stat: os.stat_result, trace: Trace) -> IndexedTrace:
+    player_count = len(trace.initial_board.pawns)
+    ranks = {player: rank for rank, player in enumerate(trace.players_ranking)}
+    names = trace.player_names
+    reasons: Sequence[Tuple[Optional[int], str]] = trace.reasons or [(None, '')] * player_count
+    winner_name = names[trace.winner] if trace.winner < len(names) else None
+
+    game = (path, stat.st_mtime, stat.st_size, player_count, trace.winner, winner_name,
+            trace.reason, len(trace.actions))
+    players = [(player, names[player] if player < len(names) else None,
+                ranks.get(player, UNRANKED),
+                trace.time_limits[player] if player < len(trace.time_limits) else None,
+                reasons[player][0], reasons[player][1])
+               for player in range(player_count)]
+    actions = [(step, player, kind, i, j, t)
+               for step, (player, (kind, i, j), t) in enumerate(trace.actions, 1)]
+    timings = [(int(metrics['step']), int(metrics['player']),
+                *(metrics[timing] for timing in TIMINGS)) for metrics in trace.metrics]
+    return IndexedTrace(game, players, actions, timings)
+
+
+class TraceIndex:
+    """SQLite index of game traces."""
+
+    def __init__(self, database: str) -> None:
+        """Open the index, creating it if needed.
+
+        An index created for another version of the schema is rebuilt from
+        scratch (its traces have to be ingested again).
+
+        Arguments:
+        database -- path of the SQLite database
+        """
+        self.connection = sqlite3.connect(database)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version != SCHEMA_VERSION:
+            if version:
+                logging.warning('Rebuilding trace index of schema version %d', version)
+            with self.connection:
+                for table in ('timings', 'actions', 'players', 'games'):
+                    self.connection.execute(f'DROP TABLE IF EXISTS {table}')
+                self.connection.executescript(SCHEMA)
+                self.connection.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> 'TraceIndex':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def ingest(self, paths: Iterable[str], workers: int = 1) -> Dict[str, int]:
+        """Index the traces in paths (files or directories) that are new
+        or changed since their last ingestion.
+
+        Return the number of traces 'added', 'updated', 'unchanged' and
+        'failed' to load.
+
+        Arguments:
+        paths -- trace files or directories of traces
+        workers -- number of processes decoding the traces
+        """
+        known = {path: (mtime, size) for path, mtime, size
+                 in self.connection.execute('SELECT path, mtime, size FROM games')}
+        counts = {'added': 0, 'updated': 0, 'unchanged': 0, 'failed': 0}
+        pending = []
+        for path in find_traces(paths):
+            path = os.path.abspath(path)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # e.g. a dangling link: read_rows fails alike and the trace is counted as failed
+                pending.append(path)
+                continue
+            if known.get(path) == (stat.st_mtime, stat.st_size):
+                counts['unchanged'] += 1
+            else:
+                pending.append(path)
+
+        if workers > 1 and len(pending) > 1:
+            with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+                futures = [executor.submit(read_rows, path) for path in pending]
+                self._insert_all(((path, self._result(path, future))
+                                  for path, future in zip(pending, futures)), known, counts)
+        else:
+            self._insert_all(((path, self._read(path)) for path in pending), known, counts)
+        return counts
+
+    @staticmethod
+    def _read(path: str) -> Optional[IndexedTrace]:
+        try:
+            return read_rows(path)
+        except (OSError, CannotLoadTrace) as e:
+            logging.warning("Unable to index trace '%s'. Reason: %s", path, e)
+            return None
+
+    @staticmethod
+    def _result(path: str,
+                future: 'concurrent.futures.Future[IndexedTrace]') -> Optional[IndexedTrace]:
+        try:
+            return future.result()
+        except (OSError, CannotLoadTrace) as e:
+            logging.warning("Unable to index trace '%s'. Reason: %s", path, e)
+            return None
+
+    def _insert_all(self, rows: Iterable[Tuple[str, Optional[IndexedTrace]]],
+                    known: Dict[str, Tuple[float, int]], counts: Dict[str, int]) -> None:
+        with self.connection:
+            for path, indexed in rows:
+                if indexed is None:
+                    counts['failed'] += 1
+                    continue
+                if path in known:
+                    self.connection.execute('DELETE FROM games WHERE path = ?', (path,))
+                    counts['updated'] += 1
+                else:
+                    counts['added'] += 1
+                self._insert(indexed)
+
+    def _insert(self, indexed: IndexedTrace) -> None:
+        cursor = self.connection.execute(
+            'INSERT INTO games (path, mtime, size, player_count, winner, winner_name, reason,'
+            ' steps) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', indexed.game)
+        game_id = cursor.lastrowid
+        self.connection.executemany(
+            'INSERT INTO players VALUES (?, ?, ?, ?, ?, ?, ?)',
+            ((game_id, *row) for row in indexed.players))
+        self.connection.executemany(
+            'INSERT INTO actions VALUES (?, ?, ?, ?, ?, ?, ?)',
+            ((game_id, *row) for row in indexed.actions))
+        self.connection.executemany(
+            f'INSERT INTO timings VALUES ({", ".join("?" * (len(TIMINGS) + 3))})',
+            ((game_id, *row) for row in indexed.timings))
+
+    def remove_missing(self) -> int:
+        """Remove the traces whose file does not exist anymore and return
+        their number.
+        """
+        missing = [(path,) for path, in self.connection.execute('SELECT path FROM games')
+                   if not os.path.exists(path)]
+        with self.connection:
+            self.connection.executemany('DELETE FROM games WHERE path = ?', missing)
+        return len(missing)
+
+    def query(self, sql: str, parameters: Sequence[Any] = ()) -> List[Tuple[Any, ...]]:
+        """Run an SQL query on the index and return its rows."""
+        return self.connection.execute(sql, parameters).fetchall()
+
+    def pairings(self) -> List[Tuple[str, str, int, float]]:
+        """Return the number of games and their average length for every
+        pair of teams of 2-player games.
+        """
+        return self.query(PAIRINGS)
+
+    def losses(self, team: str, reason: str = '') -> List[Tuple[str, int, Optional[int], str]]:
+        """Return the path, rank, step and reason of the games lost by team.
+
+        Arguments:
+        team -- the name of the team
+        reason -- keep only the losses whose reason starts with it, e.g.
+            'Timeout' for the games lost on time
+        """
+        pattern = reason.replace('\\', '\\\\').replace('%', r'\%').replace('_', r'\_')
+        return self.query(LOSSES, (team, pattern + '%'))
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m game.trace_index',
+                                     description='Index game traces in a SQLite database.')
+    parser.add_argument('database', help='the SQLite database of the index')
+    commands = parser.add_subparsers(dest='command')
+    ingest = commands.add_parser('ingest', help='index new and changed traces')
+    ingest.add_argument('paths', nargs='+', metavar='PATH', help='trace file or directory')
+    ingest.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1,
+                        help='number of decoding processes (default: %(default)s)')
+    ingest.add_argument('--prune', action='store_true', default=False,
+                        help='remove the traces whose file has been deleted')
+    query = commands.add_parser('query', help='run an SQL query')
+    query.add_argument('sql')
+    query.add_argument('parameters', nargs='*')
+    commands.add_parser('pairings', help='average game length per pair of teams')
+    losses = commands.add_parser('losses', help='games lost by a team')
+    losses.add_argument('team')
+    losses.add_argument('--reason', default='', help='reason prefix, e.g. Timeout')
+    args = parser.parse_args()
+    if args.command is None:
+        parser.error('a command is required')
+
+    logging.basicConfig(format="%(asctime)s -- %(levelname)s: %(message)s")
+    with TraceIndex(args.database) as index:
+        if args.command == 'ingest':
+            counts = index.ingest(args.paths, args.workers)
+            if args.prune:
+                counts['removed'] = index.remove_missing()
+            print(', '.join(f'{count} {name}' for name, count in counts.items()))
+        else:
+            if args.command == 'query':
+                rows = index.query(args.sql, args.parameters)
+            elif args.command == 'pairings':
+                rows = index.pairings()
+            else:
+                rows = index.losses(args.team, args.reason)
+            for row in rows:
+                print('\t'.join('' if value is None else str(value) for value in row))
+
+
+if __name__ == '__main__':
+    main()
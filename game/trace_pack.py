@@ -0,0 +1,203 @@
+"""Archive packing many game traces in a single memory-mapped file.
+
+The actions of all the games are stored contiguously as fixed-width
+records (the ACTION_RECORD of the binary traces of game.trace), followed by
+the initial board, names and outcome of every game and by a table giving,
+for every game, its first action and the location of its data. A
+TracePack maps the file in memory: actions are exposed as NumPy views
+without being copied, and games as Trace objects built on demand.
+
+Timings of the steps are not packed.
+
+Usage:
+    python -m game.trace_pack pack archive.qpack traces/
+    python -m game.trace_pack info archive.qpack
+"""
+import logging
+import mmap
+import os
+import struct
+from typing import Any, BinaryIO, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from game.trace import ACTION_DTYPE_FIELDS, ACTION_RECORD, CannotLoadTrace, RecordSequence, \
+    Trace, action_array, decode_action_record, find_traces, pack_board, pack_meta, \
+    read_trace_file, unpack_trace
+
+PACK_MAGIC = b'QPAK'
+PACK_VERSION = 1
+PACK_HEADER = struct.Struct('<4sHHIQQQ')  # magic, version, 0, games, actions, offsets
+GAME_RECORD = struct.Struct('<QIQII')  # first action, actions, data offset, board and meta sizes
+GAME_DTYPE = np.dtype([('first_action', '<u8'), ('action_count', '<u4'), ('data_offset', '<u8'),
+                       ('board_size', '<u4'), ('meta_size', '<u4')])
+assert GAME_DTYPE.itemsize == GAME_RECORD.size
+ACTION_DTYPE = np.dtype(ACTION_DTYPE_FIELDS)
+
+
+def write_pack(traces: Iterable[Trace], f: BinaryIO) -> int:
+    """Pack traces into a file open for binary writing and return the
+    number of games packed.
+
+    Actions are written as the traces are read, so that only one trace is
+    in memory at a time.
+    """
+    f.write(bytes(PACK_HEADER.size))
+    games: List[Tuple[int, int, bytes, bytes]] = []
+    action_count = 0
+    for trace in traces:
+        actions = action_array(trace.actions)
+        f.write(actions.tobytes())
+        games.append((action_count, len(actions), pack_board(trace.initial_board),
+                      pack_meta(trace)))
+        action_count += len(actions)
+
+    data_offset = f.tell()
+    table = []
+    for first_action, count, board, meta in games:
+        table.append(GAME_RECORD.pack(first_action, count, f.tell(), len(board), len(meta)))
+        f.write(board)
+        f.write(meta)
+    table_offset = f.tell()
+    f.write(b''.join(table))
+
+    f.seek(0)
+    f.write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, 0, len(games), action_count,
+                             PACK_HEADER.size, table_offset))
+    f.seek(0, 2)
+    assert data_offset == PACK_HEADER.size + action_count * ACTION_RECORD.size
+    return len(games)
+
+
+class TracePack:
+
+    """Read-only, memory-mapped archive written by write_pack.
+
+    Attributes:
+    actions -- the actions of all the games, as a NumPy array of
+        ACTION_DTYPE mapped on the file
+    games -- the table of the games, as a NumPy array of GAME_DTYPE mapped
+        on the file
+    """
+
+    def __init__(self, path: str) -> None:
+        """Map the archive at path in memory."""
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < PACK_HEADER.size:
+                # an empty file cannot even be mapped
+                raise CannotLoadTrace('not a trace pack')
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(PACK_MAGIC)] != PACK_MAGIC:
+            self.close()
+            raise CannotLoadTrace('not a trace pack')
+        _, version, _, game_count, action_count, actions_offset, table_offset = \
+            PACK_HEADER.unpack_from(self._mmap)
+        if version != PACK_VERSION:
+            self.close()
+            raise CannotLoadTrace(f'unsupported trace pack version {version}')
+        self._actions_offset = actions_offset
+        try:
+            self.actions = np.frombuffer(self._mmap, ACTION_DTYPE, action_count, actions_offset)
+            self.games = np.frombuffer(self._mmap, GAME_DTYPE, game_count, table_offset)
+        except ValueError as e:
+            self.close()
+            raise CannotLoadTrace(f'truncated trace pack: {e}') from e
+
+    def close(self) -> None:
+        """Unmap the archive. Views and traces obtained from it must not be
+        used anymore.
+        """
+        self.actions = self.games = None  # type: ignore
+        try:
+            self._mmap.close()
+        except BufferError:
+            # views are still exported, the mapping is released with them
+            pass
+
+    def __enter__(self) -> 'TracePack':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.games)
+
+    def __getitem__(self, game: int) -> Trace:
+        return self.trace(game)
+
+    def __iter__(self) -> Iterator[Trace]:
+        return (self.trace(game) for game in range(len(self)))
+
+    def game_actions(self, game: int) -> np.ndarray:
+        """Return the actions of a game, as a view of actions."""
+        first_action, action_count = self.games[game][['first_action', 'action_count']].item()
+        return self.actions[first_action:first_action + action_count]
+
+    def trace(self, game: int) -> Trace:
+        """Return the trace of a game, e.g. for Viewer.replay.
+
+        Its actions are decoded from the mapped file on access.
+        """
+        first_action, action_count, data_offset, board_size, meta_size = self.games[game].item()
+        meta_offset = data_offset + board_size
+        trace = unpack_trace(self._mmap[data_offset:meta_offset],
+                             self._mmap[meta_offset:meta_offset + meta_size])
+        trace.actions = RecordSequence(  # type: ignore
+            self._mmap, self._actions_offset + first_action * ACTION_RECORD.size, action_count,
+            ACTION_RECORD, decode_action_record)
+        return trace
+
+
+def _read_traces(paths: Iterable[str]) -> Iterator[Trace]:
+    """Yield the traces of paths, skipping those that cannot be loaded."""
+    for path in find_traces(paths):
+        try:
+            yield read_trace_file(path)
+        except (OSError, CannotLoadTrace) as e:
+            logging.warning("Unable to pack trace '%s'. Reason: %s", path, e)
+
+
+def pack_files(paths: Iterable[str], archive: str) -> int:
+    """Pack the traces of paths (files or directories) in the archive file
+    and return the number of games packed.
+
+    The archive is written in a temporary file that replaces it at the end,
+    so that a failure never leaves a broken archive behind.
+    """
+    temporary = archive + '.tmp'
+    try:
+        with open(temporary, 'wb') as f:
+            count = write_pack(_read_traces(paths), f)
+        os.replace(temporary, archive)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return count
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m game.trace_pack',
+                                     description='Pack game traces in a memory-mapped archive.')
+    commands = parser.add_subparsers(dest='command')
+    pack = commands.add_parser('pack', help='pack traces in an archive')
+    pack.add_argument('archive')
+    pack.add_argument('paths', nargs='+', metavar='PATH', help='trace file or directory')
+    info = commands.add_parser('info', help='describe an archive')
+    info.add_argument('archive')
+    args = parser.parse_args()
+
+    if args.command == 'pack':
+        print(f'{pack_files(args.paths, args.archive)} games packed')
+    elif args.command == 'info':
+        with TracePack(args.archive) as archive:
+            print(f'{len(archive)} games, {len(archive.actions)} actions')
+    else:
+        parser.error('a command is required')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Re-simulation of archived traces against the current game engine.
+
+Every action of a trace is played again with Board.play_action, then the
+outcome is recomputed with Game.rank and compared with the one recorded.
+Use it to re-validate an archive whenever the engine changes.
+
+Usage:
+    python -m game.verify traces/ -j 8
+"""
+import concurrent.futures
+import os
+import sys
+from typing import Iterable, Iterator, List, NamedTuple, Tuple
+
+from game.exceptions import InvalidActionError
+from game.game import Game
+from game.trace import CannotLoadTrace, Trace, find_traces, read_trace_file
+
+
+class Verification(NamedTuple):
+    """Result of the verification of a trace.
+
+    Attributes:
+    path -- path of the trace
+    steps -- number of actions replayed
+    scores -- the final scores recomputed, as given by Board.get_scores
+    mismatches -- description of every inconsistency found
+    """
+    path: str
+    steps: int
+    scores: List[Tuple[int, int]]
+    mismatches: List[str]
+
+    @property
+    def ok(self) -> bool:
+        return not self.mismatches
+
+
+def verify_trace(trace: Trace, path: str = '') -> Verification:
+    """Replay a trace and check the legality of its actions and its
+    outcome.
+    """
+    board = trace.get_initial_board()
+    player_count = board.player_count
+    reasons = trace.reasons or [(None, '')] * player_count
+    is_connected = [step is None for step, _ in reasons]
+    winning_order: List[int] = []
+    mismatches: List[str] = []
+
+    steps = 0
+    for player, action, _ in trace.actions:
+        steps += 1
+        if not 0 <= player < player_count:
+            mismatches.append(f'action {steps}: unknown player {player}')
+            break
+        if board.is_player_on_goal(player):
+            mismatches.append(f'action {steps}: player {player} plays after reaching its goal')
+        try:
+            board.play_action(action, player)
+        except InvalidActionError:
+            mismatches.append(f'action {steps}: illegal action {action} of player {player}')
+            break
+        if board.is_player_on_goal(player) and player not in winning_order:
+            winning_order.append(player)
+
+    if not mismatches:
+        winner, ranking, reason = Game.rank(board, is_connected, winning_order)
+        if trace.winner != winner:
+            mismatches.append(f'winner {trace.winner} instead of {winner}')
+        if trace.players_ranking and list(trace.players_ranking) != ranking:
+            mismatches.append(f'ranking {list(trace.players_ranking)} instead of {ranking}')
+        if trace.reason != reason:
+            mismatches.append(f'reason {trace.reason!r} instead of {reason!r}')
+    return Verification(path, steps, board.get_scores(), mismatches)
+
+
+def verify_file(path: str) -> Verification:
+    """Load and verify the trace at path."""
+    try:
+        trace = read_trace_file(path)
+    except (OSError, CannotLoadTrace) as e:
+        return Verification(path, 0, [], [f'cannot load trace: {e}'])
+    return verify_trace(trace, path)
+
+
+def verify_files(paths: Iterable[str], workers: int = 1) -> Iterator[Verification]:
+    """Verify the traces at paths with a pool of workers processes and
+    yield their verifications, in order.
+    """
+    if workers <= 1:
+        yield from map(verify_file, paths)
+        return
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        yield from executor.map(verify_file, paths, chunksize=16)
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m game.verify',
+                                     description='Replay traces and check their consistency.')
+    parser.add_argument('paths', nargs='+', metavar='PATH', help='trace file or directory')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1,
+                        help='number of processes (default: %(default)s)')
+    parser.add_argument('-q', '--quiet', action='store_true', default=False,
+                        help='do not report the progress')
+    parser.add_argument('--scores', action='store_true', default=False,
+                        help='print the final scores of every trace')
+    args = parser.parse_args()
+
+    paths = list(find_traces(args.paths))
+    failed = 0
+    show_progress = not args.quiet and sys.stderr.isatty()
+    for done, verification in enumerate(verify_files(paths, args.workers), 1):
+        if not verification.ok:
+            failed += 1
+            for mismatch in verification.mismatches:
+                print(f'{verification.path}: {mismatch}')
+        elif args.scores:
+            scores = ' '.join(f'P{player}={score}' for player, score in verification.scores)
+            print(f'{verification.path}: {scores}')
+        if show_progress:
+            print(f'\r{done}/{len(paths)} traces, {failed} inconsistent', end='', file=sys.stderr)
+    if show_progress:
+        print(file=sys.stderr)
+    print(f'{len(paths)} traces verified, {failed} inconsistent')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
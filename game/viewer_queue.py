@@ -0,0 +1,141 @@
+"""Non-blocking queue of viewer events between a game and its viewer.
+
+Game calls its viewer synchronously, so that a slow viewer (e.g. a GUI
+pacing its rendering) slows the game down. A QueuedViewer given to Game
+instead only records the events, which the rendering thread forwards to the
+real viewer with QueuedViewer.drain, typically once per displayed frame.
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, List, Optional, Tuple
+
+from game.board import Board, Action
+from game.game import Viewer
+
+QUEUE_CAPACITY = 64
+FRAME_RATE = 30
+# seconds a human player waits for the pending events to be shown
+PLAY_SYNC_TIMEOUT = 1.0
+
+Event = Tuple[Any, ...]
+
+
+class QueuedViewer(Viewer):
+    """Viewer forwarding the events of a game to another viewer through a
+    bounded, coalescing queue.
+
+    The game thread calls the Viewer methods, which never block: they apply
+    the action to the board of the queue and record the event. drain, called
+    by the rendering thread, forwards the pending events to the target
+    viewer. Several updates pending at once are collapsed into a single
+    Viewer.show of the latest board, and so are the pending events as soon
+    as there are more than capacity of them.
+    """
+
+    def __init__(self, target: Viewer, capacity: int = QUEUE_CAPACITY) -> None:
+        """
+        Arguments:
+        target -- the viewer rendering the game
+        capacity -- maximum number of pending events
+        """
+        super().__init__()
+        self.target = target
+        self.capacity = capacity
+        self.is_finished = False
+        self._events: Deque[Event] = deque()
+        self._draining = False
+        self._condition = threading.Condition()
+
+    def init_viewer(self, board: Board) -> None:
+        # forwarded at once: viewers like TkViewer wait for it to start
+        with self._condition:
+            super().init_viewer(board)
+            self._events.clear()
+            self.is_finished = False
+        self.target.init_viewer(board.clone())
+
+    def playing(self, step: int, player: int) -> None:
+        self._put(('playing', step, player))
+
+    def update(self, step: int, action: Action, player: int) -> None:
+        with self._condition:
+            self.board.apply_action(action, player)
+            self._put(('update', step, action, player))
+
+    def finished(self, steps: int, winner: int, reason: str = "") -> None:
+        self._put(('finished', steps, winner, reason))
+
+    def play(self, percepts: Board, player: int, step: int, time_left: float) -> Optional[Action]:
+        """Let the target viewer play for a human player, once it shows the
+        current board.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: not self._events and not self._draining,
+                                     PLAY_SYNC_TIMEOUT)
+        return self.target.play(percepts, player, step, time_left)
+
+    def _put(self, event: Event) -> None:
+        with self._condition:
+            self._events.append(event)
+            if len(self._events) > self.capacity:
+                self._collapse()
+
+    def _collapse(self) -> None:
+        """Replace the pending events by a show of the latest board, followed
+        by the playing and finished events that came after the last update.
+        """
+        # called with the lock held
+        events = list(self._events)
+        updates = [index for index, event in enumerate(events)
+                   if event[0] in ('update', 'show')]
+        last = updates[-1] if updates else -1
+        collapsed: List[Event] = [('show', events[last][1])] if updates else []
+        playing = [event for event in events[last + 1:] if event[0] == 'playing']
+        collapsed.extend(playing[-1:])
+        collapsed.extend(event for event in events if event[0] == 'finished')
+        self._events.clear()
+        self._events.extend(collapsed)
+
+    def drain(self) -> int:
+        """Forward the pending events to the target viewer and return their
+        number, once collapsed.
+
+        To be called by the thread rendering the target viewer.
+        """
+        with self._condition:
+            if sum(event[0] in ('update', 'show') for event in self._events) > 1:
+                self._collapse()
+            events = list(self._events)
+            self._events.clear()
+            board = self.board.clone() if any(event[0] == 'show' for event in events) else None
+            self._draining = True
+        try:
+            for event in events:
+                kind = event[0]
+                if kind == 'playing':
+                    self.target.playing(*event[1:])
+                elif kind == 'update':
+                    self.target.update(*event[1:])
+                elif kind == 'show':
+                    self.target.show(event[1], board)  # type: ignore
+                else:
+                    self.is_finished = True
+                    self.target.finished(*event[1:])
+        finally:
+            with self._condition:
+                self._draining = False
+                self._condition.notify_all()
+        return len(events)
+
+    def run(self, frame_rate: float = FRAME_RATE) -> None:
+        """Drain the queue frame_rate times per second until the game is
+        finished.
+
+        For viewers without their own event loop, e.g. in a thread of its
+        own for a ConsoleViewer.
+        """
+        while not self.is_finished:
+            start = time.perf_counter()
+            self.drain()
+            time.sleep(max(0.0, 1 / frame_rate - (time.perf_counter() - start)))
@@ -98,6 +98,22 @@ class Agent:
         """
         pass
 
+    def notify(self, step, player, action):
+        """An action has just been played by another player.
+
+        Only called when the game server runs with pondering enabled: the
+        agent may keep thinking in the background during the turns of its
+        opponents. This call is not counted in the time credit but must
+        return quickly.
+
+        Arguments:
+        step -- the step number of the action
+        player -- the player that has played
+        action -- the action played
+
+        """
+        pass
+
 
 def serve_agent(agent, address, port):
     """Serve agent on specified bind address and port number."""
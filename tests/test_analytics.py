@@ -0,0 +1,84 @@
+import io
+import unittest
+
+import numpy as np
+import xmlrunner
+
+from game.analytics import Corpus, NO_DISTANCE
+from game.constants import MOVE, WALL_H, WALL_V
+from game.quoridor import Board
+from game.trace import Trace, write_binary, load_binary
+
+PLAYER_1 = 0
+PLAYER_2 = 1
+
+
+def make_trace(names, actions, winner):
+    trace = Trace(Board(), [None, None], names)
+    for player, action, t in actions:
+        trace.add_action(player, action, t)
+    trace.set_winner(winner, "")
+    return trace
+
+
+class TestCorpus(unittest.TestCase):
+
+    def setUp(self):
+        self.traces = [
+            make_trace(['alpha', 'beta'], [(PLAYER_1, (MOVE, 1, 4), 0.1),
+                                           (PLAYER_2, (WALL_H, 5, 3), 0.2),
+                                           (PLAYER_1, (MOVE, 2, 4), 0.3)], PLAYER_1),
+            make_trace(['beta', 'gamma'], [(PLAYER_1, (WALL_V, 0, 0), 0.4),
+                                           (PLAYER_2, (MOVE, 7, 4), 0.5)], PLAYER_2),
+        ]
+        self.corpus = Corpus.from_traces(self.traces)
+
+    def test_columns(self):
+        self.assertEqual(len(self.corpus), 5)
+        self.assertEqual(self.corpus.agents, ['alpha', 'beta', 'gamma'])
+        np.testing.assert_array_equal(self.corpus.game, [0, 0, 0, 1, 1])
+        np.testing.assert_array_equal(self.corpus.step, [1, 2, 3, 1, 2])
+        np.testing.assert_array_equal(self.corpus.agent, [0, 1, 0, 1, 2])
+        np.testing.assert_array_equal(self.corpus.i, [1, 5, 2, 0, 7])
+        np.testing.assert_allclose(self.corpus.think, [0.1, 0.2, 0.3, 0.4, 0.5])
+        np.testing.assert_array_equal(self.corpus.distance, [7, 9, 7, 8, 7])
+        np.testing.assert_array_equal(self.corpus.lengths, [3, 2])
+        np.testing.assert_array_equal(self.corpus.winners, [0, 2])
+
+    def test_binary_traces_should_give_same_columns(self):
+        traces = []
+        for trace in self.traces:
+            file = io.BytesIO()
+            write_binary(trace, file)
+            file.seek(0)
+            traces.append(load_binary(file))
+        corpus = Corpus.from_traces(traces, distances=False)
+        np.testing.assert_array_equal(corpus.kind, self.corpus.kind)
+        np.testing.assert_array_equal(corpus.j, self.corpus.j)
+        np.testing.assert_array_equal(corpus.think, self.corpus.think)
+        self.assertTrue((corpus.distance == NO_DISTANCE).all())
+
+    def test_statistics(self):
+        percentiles = self.corpus.think_percentiles((50, 100))
+        np.testing.assert_allclose(percentiles['alpha'], [0.2, 0.3])
+        np.testing.assert_allclose(percentiles['beta'], [0.3, 0.4])
+        np.testing.assert_allclose(self.corpus.wall_usage_per_step(), [0, 0.5, 0.5, 0])
+        self.assertEqual(self.corpus.first_moves(), {(MOVE, 1, 4): 1, (WALL_V, 0, 0): 1})
+        self.assertEqual(self.corpus.win_rates(), {'alpha': 1.0, 'beta': 0.0, 'gamma': 1.0})
+        counts, _ = self.corpus.length_histogram(bins=2)
+        np.testing.assert_array_equal(counts, [1, 1])
+        np.testing.assert_allclose(self.corpus.mean_distance_per_step(PLAYER_1)[1:],
+                                   [7.5, np.nan, 7])
+
+    def test_empty_corpus(self):
+        corpus = Corpus.from_traces([])
+        self.assertEqual(len(corpus), 0)
+        self.assertEqual(corpus.think_percentiles(), {})
+
+
+if __name__ == '__main__':
+    unittest.main(
+        testRunner=xmlrunner.XMLTestRunner(output='test-reports'),
+        # these make sure that some options that are not applicable
+        # remain hidden from the help menu.
+        failfast=False, buffer=False, catchbreak=False)
@@ -0,0 +1,165 @@
+import asyncio
+import threading
+import unittest
+from unittest.mock import MagicMock
+from xmlrpc.server import SimpleXMLRPCServer
+
+import xmlrunner
+
+from game.async_game import AsyncGame
+from game.constants import MOVE
+from game.game import Game
+from game.quoridor import Board, Agent
+from game.rpc import AsyncServerProxy
+
+PLAYER_1 = 0
+PLAYER_2 = 1
+
+
+class BeeLineAgent(Agent):
+    """Coroutine agent always moving along its shortest path."""
+
+    async def play(self, percepts, player, step, time_left):
+        i, j = percepts.get_shortest_path(player)[0]
+        return MOVE, i, j
+
+
+class SleepyAgent(Agent):
+    """Coroutine agent that never answers in time."""
+
+    async def play(self, percepts, player, step, time_left):
+        await asyncio.sleep(10)
+
+
+class SlowAgent(BeeLineAgent):
+    """Coroutine agent answering a bit after its time credit expired."""
+
+    async def play(self, percepts, player, step, time_left):
+        await asyncio.sleep(time_left + 0.1)
+        return await super().play(percepts, player, step, time_left)
+
+
+class ScriptedAgent(Agent):
+    """Blocking agent returning a fixed list of actions."""
+
+    def __init__(self, actions):
+        self.actions = list(actions)
+
+    def play(self, percepts, player, step, time_left):
+        return self.actions.pop(0)
+
+
+class TestAsyncGame(unittest.TestCase):
+
+    def test_play_should_make_closest_player_win(self):
+        board = Board()
+        board.move_pawn((6, 4), PLAYER_1)
+        game = AsyncGame([BeeLineAgent(), BeeLineAgent()], board)
+        asyncio.run(game.play())
+        self.assertEqual(game.trace.winner, PLAYER_1)
+        self.assertEqual(game.trace.players_ranking, [PLAYER_1, PLAYER_2])
+        self.assertEqual(len(game.trace.actions), 3)
+
+    def test_play_should_run_blocking_agents_in_executor(self):
+        board = Board()
+        board.move_pawn((7, 3), PLAYER_1)
+        game = AsyncGame([ScriptedAgent([(MOVE, 8, 3)]), ScriptedAgent([])], board)
+        asyncio.run(game.play())
+        self.assertEqual(game.trace.winner, PLAYER_1)
+
+    def test_play_should_expel_player_exceeding_its_credit(self):
+        game = AsyncGame([SleepyAgent(), BeeLineAgent()], Board(), time_credits=[0.05, 1.0])
+        asyncio.run(game.play())
+        self.assertEqual(game.trace.winner, PLAYER_2)
+        self.assertEqual(game.trace.reason, "Opponent's have been expelled.")
+        self.assertTrue(game.trace.reasons[PLAYER_1][1].startswith('Timeout'))
+
+    def test_play_should_leave_the_same_slack_as_the_blocking_engine(self):
+        board = Board()
+        board.move_pawn((7, 3), PLAYER_1)
+        game = AsyncGame([SlowAgent(), BeeLineAgent()], board, time_credits=[0.05, 1.0])
+        asyncio.run(game.play())
+        # late by less than the tolerance of Game._charge, so not expelled
+        self.assertEqual(game.trace.winner, PLAYER_1)
+        self.assertEqual(game.trace.reasons[PLAYER_1], (None, ''))
+
+    def test_games_should_run_concurrently(self):
+        games = [AsyncGame([SleepyAgent(), BeeLineAgent()], Board(), time_credits=[0.2, 1.0])
+                 for _ in range(20)]
+
+        async def play_all():
+            await asyncio.gather(*(game.play() for game in games))
+
+        loop = asyncio.new_event_loop()
+        try:
+            start = loop.time()
+            loop.run_until_complete(play_all())
+            elapsed = loop.time() - start
+        finally:
+            loop.close()
+        self.assertLess(elapsed, 2.0)
+        self.assertTrue(all(game.trace.winner == PLAYER_2 for game in games))
+
+    def test_play_should_notify_pondering_agents(self):
+        board = Board()
+        board.move_pawn((7, 3), PLAYER_1)
+        pondering = BeeLineAgent()
+        pondering.notify = MagicMock()
+        game = AsyncGame([ScriptedAgent([(MOVE, 8, 3)]), pondering], board, ponder=True)
+        asyncio.run(game.play())
+        pondering.notify.assert_called_once_with(1, PLAYER_1, (MOVE, 8, 3))
+
+    def test_play_should_play_the_same_turns_as_the_blocking_engine(self):
+        def agents():
+            return [ScriptedAgent([(MOVE, 1, 4), (MOVE, 2, 4)]),
+                    ScriptedAgent([(MOVE, 7, 4), 'not an action'])]
+
+        blocking = Game(agents(), Board())
+        blocking.play()
+        game = AsyncGame(agents(), Board())
+        asyncio.run(game.play())
+        self.assertNotIsInstance(game, Game)
+        self.assertEqual([action[:2] for action in game.trace.actions],
+                         [action[:2] for action in blocking.trace.actions])
+        self.assertEqual(game.trace.reasons, blocking.trace.reasons)
+        self.assertEqual(game.trace.winner, blocking.trace.winner)
+
+
+class TestAsyncServerProxy(unittest.TestCase):
+
+    def setUp(self):
+        self.server = SimpleXMLRPCServer(('localhost', 0), allow_none=True, logRequests=False)
+        self.server.register_instance(ScriptedAgent([[MOVE, 8, 3]]))
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.uri = f'http://localhost:{self.server.server_address[1]}'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def test_play_against_remote_agent(self):
+        board = Board()
+        board.move_pawn((7, 3), PLAYER_1)
+        game = AsyncGame([AsyncServerProxy(self.uri), BeeLineAgent()], board)
+        asyncio.run(game.play())
+        self.assertEqual(game.trace.winner, PLAYER_1)
+        self.assertEqual(game.trace.actions[0][1], [MOVE, 8, 3])
+
+    def test_remote_error_should_expel_player(self):
+        game = AsyncGame([AsyncServerProxy(self.uri + '/missing'), BeeLineAgent()], Board())
+        asyncio.run(game.play())
+        self.assertEqual(game.trace.winner, PLAYER_2)
+
+    def test_unsupported_scheme_should_be_rejected(self):
+        with self.assertRaises(ValueError):
+            AsyncServerProxy('https://localhost:8000')
+
+
+if __name__ == '__main__':
+    unittest.main(
+        testRunner=xmlrunner.XMLTestRunner(output='test-reports'),
+        # these make sure that some options that are not applicable
+        # remain hidden from the help menu.
+        failfast=False, buffer=False, catchbreak=False)
@@ -0,0 +1,122 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import xmlrunner
+
+from game.batch import leaderboard, read_manifest, report, run_batch, Standing
+from game.server import FAILED, FINISHED, InvalidMatchError
+from tests.test_server import ForwardAgent, serve
+
+
+class TestReadManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_csv(self):
+        path = self.write('manifest.csv', 'agent1,agent2,name1,name2,time,walls,repeat,ponder\n'
+                                          'http://a:1,http://b:2,a,b,2.5,5,3,yes\n'
+                                          'http://a:1,http://c:3,,,,,,\n'
+                                          'http://a:1,http://a:1,,,,,,\n')
+        requests = read_manifest(path)
+        self.assertEqual(len(requests), 5)
+        self.assertEqual(requests[0].agents, ['http://a:1', 'http://b:2'])
+        self.assertEqual(requests[0].names, ['a', 'b'])
+        self.assertEqual(requests[0].time, 2.5)
+        self.assertEqual(requests[0].walls, [5, 5])
+        self.assertTrue(requests[0].ponder)
+        self.assertEqual(requests[3].names, ['http://a:1', 'http://c:3'])
+        self.assertIsNone(requests[3].time)
+        self.assertIsNone(requests[3].walls)
+        self.assertEqual(requests[4].names, ['http://a:1 #1', 'http://a:1 #2'])
+
+    def test_json(self):
+        path = self.write('manifest.json', json.dumps([
+            {'agents': ['http://a:1', 'http://b:2', 'http://c:3', 'http://d:4'],
+             'walls': [5, 5, 5, 5], 'clock': 'fischer', 'increment': 0.5, 'repeat': 2}]))
+        requests = read_manifest(path)
+        self.assertEqual(len(requests), 2)
+        self.assertEqual(requests[1].clock, 'fischer')
+        self.assertEqual(requests[1].walls, [5, 5, 5, 5])
+
+    def test_should_reject_malformed_match(self):
+        path = self.write('manifest.json', json.dumps([{'agents': ['http://a:1']}]))
+        with self.assertRaises(InvalidMatchError):
+            read_manifest(path)
+
+
+class TestLeaderboard(unittest.TestCase):
+
+    def test_should_aggregate_finished_matches(self):
+        results = [
+            {'status': FINISHED, 'names': ['a', 'b'], 'think': [0.1, 0.3],
+             'ranking': [{'team_name': 'b', 'rank': 0}, {'team_name': 'a', 'rank': 1}]},
+            {'status': FINISHED, 'names': ['a', 'b'], 'think': [0.3, 0.1],
+             'ranking': [{'team_name': 'b', 'rank': 0}, {'team_name': 'a', 'rank': 100}]},
+            {'status': FAILED, 'error': 'unreachable'},
+        ]
+        self.assertEqual(leaderboard(results), [Standing('b', 2, 2, 0.0, 0.2),
+                                                Standing('a', 2, 0, 1.0, 0.2)])
+        self.assertIn('3 matches, 1 failed', report(results))
+
+
+class TestRunBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.agents = [serve(ForwardAgent()) for _ in range(2)]
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        for server, _ in self.agents:
+            server.shutdown()
+            server.server_close()
+        shutil.rmtree(self.directory)
+
+    def test_should_play_and_stream_every_match(self):
+        manifest = os.path.join(self.directory, 'manifest.json')
+        with open(manifest, 'w') as f:
+            json.dump([{'agents': [uri for _, uri in self.agents], 'names': ['first', 'second'],
+                        'time': 10.0, 'repeat': 3}], f)
+        results_file = os.path.join(self.directory, 'results.jsonl')
+        results = run_batch(read_manifest(manifest), 2, results_file)
+
+        self.assertEqual([result['status'] for result in results], [FINISHED] * 3)
+        with open(results_file) as f:
+            streamed = [json.loads(line) for line in f]
+        self.assertEqual([result['id'] for result in streamed],
+                         [result['id'] for result in results])
+        standings = leaderboard(results)
+        self.assertEqual([(s.name, s.games, s.wins) for s in standings],
+                         [('second', 3, 3), ('first', 3, 0)])
+
+    def test_self_play_should_rank_both_seats(self):
+        manifest = os.path.join(self.directory, 'manifest.json')
+        _, uri = self.agents[0]
+        with open(manifest, 'w') as f:
+            json.dump([{'agents': [uri, uri], 'time': 10.0, 'repeat': 2}], f)
+        results = run_batch(read_manifest(manifest), 2)
+
+        self.assertEqual([result['status'] for result in results], [FINISHED] * 2)
+        standings = leaderboard(results)
+        self.assertEqual([(s.name, s.games, s.wins) for s in standings],
+                         [(f'{uri} #2', 2, 2), (f'{uri} #1', 2, 0)])
+
+
+if __name__ == '__main__':
+    unittest.main(
+        testRunner=xmlrunner.XMLTestRunner(output='test-reports'),
+        # these make sure that some options that are not applicable
+        # remain hidden from the help menu.
+        failfast=False, buffer=False, catchbreak=False)
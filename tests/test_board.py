@@ -648,6 +648,15 @@ class TestBoardBasics(unittest.TestCase):
         self.assertEqual(self.board2.player_walls[PLAYER_1], 9)
         self.assertEqual(len(self.board2.verti_walls), 1)
 
+    def test_apply_action_should_match_play_action(self):
+        for action in [(WALL_H, 3, 3), (WALL_V, 0, 0), (MOVE, 1, 4)]:
+            played = self.board2.clone().play_action(action, PLAYER_1)
+            applied = self.board2.clone().apply_action(action, PLAYER_1)
+            self.assertEqual(applied.pawns, played.pawns)
+            self.assertEqual(applied.horiz_walls, played.horiz_walls)
+            self.assertEqual(applied.verti_walls, played.verti_walls)
+            self.assertEqual(applied.player_walls, played.player_walls)
+
 
 if __name__ == '__main__':
     unittest.main(
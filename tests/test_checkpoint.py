@@ -0,0 +1,158 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import xmlrunner
+
+from game.checkpoint import CannotLoadCheckpoint, read_checkpoint
+from game.constants import MOVE, WALL_H
+from game.game import CONNECTION_LOST, Game
+from game.quoridor import Agent, Board
+
+PLAYER_1 = 0
+PLAYER_2 = 1
+
+
+class Crash(BaseException):
+    """Stops a game like the death of its server."""
+
+
+class PathAgent(Agent):
+    """Agent walking along its shortest path, placing a wall at step 2."""
+
+    def __init__(self, crash_step=None, unreachable_step=None):
+        self.crash_step = crash_step
+        self.unreachable_step = unreachable_step
+        self.initialized = 0
+
+    def initialize(self, percepts, players, time_left):
+        self.initialized += 1
+
+    def play(self, percepts, player, step, time_left):
+        if step == self.crash_step:
+            raise Crash
+        if step == self.unreachable_step:
+            # e.g. the container of a remote agent restarting
+            raise ConnectionRefusedError(111, 'Connection refused')
+        if step == 2:
+            return WALL_H, 4, 0
+        i, j = percepts.get_shortest_path(player)[0]
+        return MOVE, i, j
+
+
+def moves(trace):
+    return [(player, action) for player, action, _ in trace.actions]
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'game.checkpoint')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def crash(self, step, interval=3, **options):
+        game = Game([PathAgent(step), PathAgent(step)], Board(), None, [60.0, 60.0],
+                    player_names=['a', 'b'], checkpoint=self.path, checkpoint_interval=interval,
+                    **options)
+        with self.assertRaises(Crash):
+            game.play()
+        return game
+
+    def test_should_save_every_interval_steps(self):
+        self.crash(8)
+        state, trace = read_checkpoint(self.path)
+        self.assertEqual(state['step'], 6)
+        self.assertEqual(len(trace.actions), 6)
+        self.assertEqual(trace.player_names, ['a', 'b'])
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+    def test_resumed_game_should_end_like_uninterrupted_game(self):
+        reference = Game([PathAgent(), PathAgent()], Board(), None, [60.0, 60.0])
+        reference.play()
+
+        self.crash(8)
+        agents = [PathAgent(), PathAgent()]
+        game = Game.resume(self.path, agents)
+        game.play()
+        self.assertEqual(moves(game.trace), moves(reference.trace))
+        self.assertEqual(game.trace.winner, reference.trace.winner)
+        self.assertEqual(game.trace.players_ranking, reference.trace.players_ranking)
+        self.assertEqual(len(game.trace.metrics), len(game.trace.actions))
+        self.assertEqual([agent.initialized for agent in agents], [1, 1])
+        # the checkpoint of a finished game is removed
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_should_restore_clock_and_disconnections(self):
+        game = self.crash(8, ponder=True, clock='fischer', increment=1.0)
+        game.is_connected[PLAYER_2] = False
+        game.reasons[PLAYER_2] = (6, 'Timeout ')
+        game.save_checkpoint()
+
+        agents = [PathAgent(), PathAgent()]
+        resumed = Game.resume(self.path, agents)
+        self.assertEqual(resumed.step, game.step)
+        self.assertEqual(resumed.player, game.player)
+        self.assertEqual(resumed.credits, game.credits)
+        self.assertEqual(resumed.starting_credits, [60.0, 60.0])
+        self.assertEqual((resumed.clock, resumed.increment, resumed.ponder), ('fischer', 1.0, True))
+        self.assertEqual(resumed.board.pawns, game.board.pawns)
+        self.assertEqual(resumed.board.horiz_walls, game.board.horiz_walls)
+        resumed.play()
+        self.assertEqual(agents[PLAYER_2].initialized, 0)
+        self.assertEqual(resumed.trace.winner, PLAYER_1)
+        self.assertEqual(resumed.trace.reasons[PLAYER_2], (6, 'Timeout '))
+
+    def test_game_should_be_resumed_with_an_unreachable_agent(self):
+        reference = Game([PathAgent(), PathAgent()], Board(), None, [60.0, 60.0])
+        reference.play()
+
+        game = Game([PathAgent(), PathAgent(unreachable_step=8)], Board(), None, [60.0, 60.0],
+                    checkpoint=self.path, checkpoint_interval=3)
+        game.play()
+        self.assertEqual(game.trace.reasons[PLAYER_2][0], 8)
+        self.assertTrue(game.trace.reasons[PLAYER_2][1].startswith(CONNECTION_LOST))
+        # the last checkpoint before the expulsion is kept
+        state, trace = read_checkpoint(self.path)
+        self.assertEqual(state['step'], 6)
+        self.assertEqual(state['is_connected'], [True, True])
+
+        agents = [PathAgent(), PathAgent()]
+        resumed = Game.resume(self.path, agents)
+        resumed.play()
+        self.assertEqual(moves(resumed.trace), moves(reference.trace))
+        self.assertEqual(resumed.trace.players_ranking, reference.trace.players_ranking)
+        self.assertEqual([agent.initialized for agent in agents], [1, 1])
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_resume_should_reconnect_unreachable_agents(self):
+        game = self.crash(8, ponder=True)
+        game.is_connected[PLAYER_2] = False
+        game.reasons[PLAYER_2] = (6, f'{CONNECTION_LOST} [Errno 111] Connection refused')
+        game.is_notified[PLAYER_2] = False
+        game.save_checkpoint()
+
+        agents = [PathAgent(), PathAgent()]
+        resumed = Game.resume(self.path, agents)
+        self.assertEqual(resumed.is_connected, [True, True])
+        self.assertEqual(resumed.is_notified, [True, True])
+        resumed.play()
+        self.assertEqual(agents[PLAYER_2].initialized, 1)
+        self.assertEqual(resumed.trace.reasons[PLAYER_2], (None, ''))
+
+    def test_should_reject_invalid_checkpoint(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'{"format": "quoridor-trace-stream"}\n')
+        with self.assertRaises(CannotLoadCheckpoint):
+            Game.resume(self.path, [PathAgent(), PathAgent()])
+
+
+if __name__ == '__main__':
+    unittest.main(
+        testRunner=xmlrunner.XMLTestRunner(output='test-reports'),
+        # these make sure that some options that are not applicable
+        # remain hidden from the help menu.
+        failfast=False, buffer=False, catchbreak=False)
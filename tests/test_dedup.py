@@ -0,0 +1,110 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import xmlrunner
+
+from game.constants import MOVE, WALL_H
+from game.dedup import HASH_INDEX, deduplicate_directory, trace_hash, write_deduplicated
+from game.quoridor import Board
+from game.trace import CannotLoadTrace, Trace, is_reference_file, load_trace, read_trace_file, \
+    write_trace_file
+
+PLAYER_1 = 0
+PLAYER_2 = 1
+
+
+def make_trace(names=('alpha', 'beta'), times=(0.1, 0.2, 0.3), last_move=(MOVE, 2, 4)):
+    trace = Trace(Board(), [10.0, 10.0], list(names))
+    for (player, action), t in zip([(PLAYER_1, (MOVE, 1, 4)), (PLAYER_2, (WALL_H, 5, 3)),
+                                    (PLAYER_1, last_move)], times):
+        trace.add_action(player, action, t)
+    trace.set_winner(PLAYER_1, "Goal reached")
+    trace.set_ranking([PLAYER_1, PLAYER_2])
+    trace.set_reasons([(None, ''), (None, '')])
+    return trace
+
+
+class TestTraceHash(unittest.TestCase):
+
+    def test_hash_should_ignore_times_and_format(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'game.qtrace.gz')
+        write_trace_file(make_trace(), path)
+        self.assertEqual(trace_hash(make_trace(times=(1, 2, 3))), trace_hash(make_trace()))
+        self.assertEqual(trace_hash(read_trace_file(path)), trace_hash(make_trace()))
+
+    def test_hash_should_cover_names_and_actions(self):
+        self.assertNotEqual(trace_hash(make_trace(names=('beta', 'alpha'))),
+                            trace_hash(make_trace()))
+        self.assertNotEqual(trace_hash(make_trace(last_move=(MOVE, 1, 3))),
+                            trace_hash(make_trace()))
+
+
+class TestDeduplication(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def test_duplicate_should_be_written_as_reference(self):
+        self.assertIsNone(write_deduplicated(make_trace(), self.path('a.qtrace')))
+        duplicate = make_trace(times=(1, 2, 3))
+        duplicate.set_winner(PLAYER_2, "Timeout")
+        self.assertEqual(write_deduplicated(duplicate, self.path('b.json')), self.path('a.qtrace'))
+        self.assertIsNone(write_deduplicated(make_trace(names=('x', 'y')), self.path('c.json')))
+
+        self.assertTrue(is_reference_file(self.path('b.json')))
+        self.assertFalse(is_reference_file(self.path('c.json')))
+        trace = read_trace_file(self.path('b.json'))
+        self.assertEqual([action for _, action, _ in trace.actions],
+                         [action for _, action, _ in duplicate.actions])
+        self.assertEqual(trace.winner, PLAYER_2)
+        self.assertEqual(trace.reason, "Timeout")
+        with open(self.path('b.json')) as f:
+            with self.assertRaises(CannotLoadTrace):
+                load_trace(f)
+
+    def test_rewriting_original_should_not_reference_itself(self):
+        write_deduplicated(make_trace(), self.path('a.json'))
+        self.assertIsNone(write_deduplicated(make_trace(), self.path('a.json')))
+        self.assertFalse(is_reference_file(self.path('a.json')))
+
+    def test_deleted_original_should_be_forgotten(self):
+        write_deduplicated(make_trace(), self.path('a.json'))
+        os.remove(self.path('a.json'))
+        self.assertIsNone(write_deduplicated(make_trace(), self.path('b.json')))
+        self.assertFalse(is_reference_file(self.path('b.json')))
+
+    def test_directory_pass(self):
+        os.mkdir(self.path('sub'))
+        for name in ('a.json', 'b.jsonl', 'sub/c.qtrace.xz'):
+            write_trace_file(make_trace(), self.path(name))
+        write_trace_file(make_trace(names=('x', 'y')), self.path('d.json'))
+        with open(self.path('e.json'), 'w') as f:
+            f.write('not a trace')
+
+        counts = deduplicate_directory(self.directory)
+        self.assertEqual(counts, {'originals': 2, 'duplicates': 2, 'references': 0, 'failed': 1})
+        self.assertTrue(os.path.exists(self.path(HASH_INDEX)))
+        trace = read_trace_file(self.path('sub/c.qtrace.xz'))
+        self.assertEqual(len(trace.actions), 3)
+        self.assertEqual(trace.player_names, ['alpha', 'beta'])
+
+        counts = deduplicate_directory(self.directory)
+        self.assertEqual(counts, {'originals': 2, 'duplicates': 0, 'references': 2, 'failed': 1})
+
+
+if __name__ == '__main__':
+    unittest.main(
+        testRunner=xmlrunner.XMLTestRunner(output='test-reports'),
+        # these make sure that some options that are not applicable
+        # remain hidden from the help menu.
+        failfast=False, buffer=False, catchbreak=False)
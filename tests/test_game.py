@@ -1,13 +1,15 @@
+import itertools
 import socket
 import unittest
 
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, call, patch
 
 import xmlrunner
 
-from game.constants import WALL_H, MOVE
-from game.game import Trace, Game, ConsoleViewer, TimeCreditExpiredError, HeadlessViewer
+from game.constants import WALL_H, MOVE, CLOCK_BANK, CLOCK_FISCHER, CLOCK_BRONSTEIN
+from game.game import Trace, Game, ConsoleViewer, TimeCreditExpiredError, HeadlessViewer, Viewer
 from game.quoridor import Board, Agent
+from game.rpc import CallTimings
 
 PLAYER_1 = 0
 PLAYER_2 = 1
@@ -15,6 +17,13 @@ PLAYER_3 = 2
 PLAYER_4 = 3
 
 
+def max_steps(steps):
+    """Return a context manager ending the games played in it after steps
+    steps, as if it was the limit of the game.
+    """
+    return patch('game.game.MAX_STEPS_GAME_OVER', steps)
+
+
 class TestGameInit(unittest.TestCase):
 
     def test_should_support_being_sent_2_players(self):
@@ -82,54 +91,54 @@ class TestGamePlay(unittest.TestCase):
         self.game4 = Game(self.agents[0:4], self.board4, self.viewer, credits[0:4], self.trace4)
 
     def test_play_with_2_players_should_call_initialize(self):
-        self.board2.is_finished = MagicMock(return_value=True)
-        self.game2.play()
+        with max_steps(0):
+            self.game2.play()
         self.agent1.initialize.assert_called_with(self.board2, [0], None)
         self.agent2.initialize.assert_called_with(self.board2, [1], None)
 
     def test_play_with_2_players_should_play_while_not_finished(self):
-        self.board2.is_finished = MagicMock(side_effect=[False, False, True])
         self.agent1.play = MagicMock(return_value=(WALL_H, 1, 2))
         self.agent2.play = MagicMock(return_value=(WALL_H, 2, 4))
-        self.game2.play()
+        with max_steps(2):
+            self.game2.play()
         self.agent1.play.assert_called_with(self.board2, 0, 1, None)
         self.agent2.play.assert_called_with(self.board2, 1, 2, None)
 
     def test_play_with_4_players_should_call_initialize(self):
-        self.board4.is_finished = MagicMock(return_value=True)
-        self.game4.play()
+        with max_steps(0):
+            self.game4.play()
         self.agent1.initialize.assert_called_with(self.board4, [0], None)
         self.agent2.initialize.assert_called_with(self.board4, [1], None)
         self.agent3.initialize.assert_called_with(self.board4, [2], None)
         self.agent4.initialize.assert_called_with(self.board4, [3], None)
 
     def test_play_with_4_players_should_play_while_not_finished(self):
-        self.board4.is_finished = MagicMock(side_effect=[False, False, False, False, True])
         self.agent1.play = MagicMock(return_value=(WALL_H, 1, 2))
         self.agent2.play = MagicMock(return_value=(WALL_H, 2, 4))
         self.agent3.play = MagicMock(return_value=(WALL_H, 3, 5))
         self.agent4.play = MagicMock(return_value=(WALL_H, 2, 4))
-        self.game4.play()
+        with max_steps(4):
+            self.game4.play()
         self.agent1.play.assert_called_with(self.board4, 0, 1, None)
         self.agent2.play.assert_called_with(self.board4, 1, 2, None)
         self.agent3.play.assert_called_with(self.board4, 2, 3, None)
         self.agent4.play.assert_called_with(self.board4, 3, 4, None)
 
     def test_play_with_2_players_should_correctly_set_the_winner(self):
-        self.board2.is_finished = MagicMock(side_effect=[False, False, True])
         self.agent1.play = MagicMock(return_value=(WALL_H, 1, 2))
         self.agent2.play = MagicMock(return_value=(MOVE, 7, 4))
-        self.game2.play()
+        with max_steps(2):
+            self.game2.play()
         self.trace2.set_winner.assert_called_with(PLAYER_2, "")
         self.viewer.finished.assert_called_with(2, PLAYER_2, "")
 
     def test_play_with_4_players_should_correctly_set_the_winner(self):
-        self.board4.is_finished = MagicMock(side_effect=[False, False, False, False, True])
         self.agent1.play = MagicMock(return_value=(WALL_H, 1, 2))
         self.agent2.play = MagicMock(return_value=(WALL_H, 5, 7))
         self.agent3.play = MagicMock(return_value=(MOVE, 7, 4))
         self.agent4.play = MagicMock(return_value=(WALL_H, 2, 2))
-        self.game4.play()
+        with max_steps(4):
+            self.game4.play()
         self.trace4.set_winner.assert_called_with(PLAYER_3, "")
         self.viewer.finished.assert_called_with(4, PLAYER_3, "")
 
@@ -138,19 +147,19 @@ class TestGamePlay(unittest.TestCase):
         trace4 = Trace(self.board4, credits[0:4])
         viewer = HeadlessViewer()
         game4 = Game(self.agents[0:4], self.board4, viewer, credits, trace4)
-        self.board4.is_finished = MagicMock(side_effect=[False, False, False, False, False, True])
         self.agent1.play = MagicMock(return_value=[(WALL_H, 1, 2), (WALL_H, 3, 4)])
         self.agent2.play = MagicMock(return_value=(WALL_H, 5, 7))
         self.agent3.play = MagicMock(return_value=(MOVE, 7, 4))
         self.agent4.play = MagicMock(return_value=(WALL_H, 2, 2))
-        game4.play()
+        with max_steps(4):
+            game4.play()
         self.assertAlmostEqual(self.agent1.play.call_args[0][3], 5.0)
 
     def test_should_return_ranking_with_all_2_players(self):
-        self.board2.is_finished = MagicMock(side_effect=[False, False, True])
         self.agent1.play = MagicMock(return_value=(WALL_H, 1, 2))
         self.agent2.play = MagicMock(return_value=(MOVE, 7, 4))
-        self.game2.play()
+        with max_steps(2):
+            self.game2.play()
         self.trace2.set_winner.assert_called_with(PLAYER_2, "")
         self.trace2.set_ranking.assert_called_with([PLAYER_2, PLAYER_1])
         self.viewer.finished.assert_called_with(2, PLAYER_2, "")
@@ -159,12 +168,6 @@ class TestGamePlay(unittest.TestCase):
         # They're both close to the victory but PLAYER_2 wins
         self.board2.move_pawn((6, 4), PLAYER_1)
         self.board2.move_pawn((1, 4), PLAYER_2)
-        self.board2.players_on_goal = MagicMock(side_effect=[
-            [False, False],
-            [False, False],
-            [False, True]])
-        self.board2.is_finished = MagicMock(side_effect=[False, False, True])
-        self.board2.is_player_on_goal = MagicMock(side_effect=[False, False, False, True])
         self.board2.get_scores = MagicMock(return_value=[(PLAYER_2, 50), (PLAYER_1, 49)])
         self.agent1.play = MagicMock(return_value=(MOVE, 7, 4))
         self.agent2.play = MagicMock(return_value=(MOVE, 0, 4))
@@ -177,12 +180,6 @@ class TestGamePlay(unittest.TestCase):
         # They're both close to the victory but PLAYER_2 disconnect before reaching the end
         self.board2.move_pawn((6, 4), PLAYER_1)
         self.board2.move_pawn((1, 4), PLAYER_2)
-        self.board2.players_on_goal = MagicMock(side_effect=[
-            [False, False],
-            [False, False],
-            [False, False]])
-        self.board2.is_finished = MagicMock(side_effect=[False, False, False])
-        self.board2.is_player_on_goal = MagicMock(side_effect=[False, False, False])
         self.board2.get_scores = MagicMock(return_value=[(PLAYER_1, 50), (PLAYER_2, 49)])
         self.agent1.play = MagicMock(return_value=(MOVE, 7, 4))
         self.agent2.play = MagicMock(side_effect=[socket.timeout])
@@ -198,14 +195,6 @@ class TestGamePlay(unittest.TestCase):
         self.board4.move_pawn((1, 4), PLAYER_3)
         self.board4.move_pawn((4, 7), PLAYER_4)
 
-        self.board4.players_on_goal = MagicMock(side_effect=[
-            [False, False, False, False],
-            [False, False, False, False],
-            [False, True, False, False],
-            [False, True, True, False],
-            [False, True, True, True]])
-        self.board4.is_finished = MagicMock(side_effect=[False, False, False, False, True])
-        self.board4.is_player_on_goal = MagicMock(side_effect=[False, False, False, True, False, True, False, True])
         self.board4.get_scores = MagicMock(
             return_value=[(PLAYER_2, 50), (PLAYER_3, 50), (PLAYER_4, 50), (PLAYER_1, 49)])
         self.agent1.play = MagicMock(return_value=(MOVE, 7, 4))  # rekt
@@ -224,14 +213,6 @@ class TestGamePlay(unittest.TestCase):
         self.board4.move_pawn((1, 4), PLAYER_3)
         self.board4.move_pawn((4, 7), PLAYER_4)
 
-        self.board4.players_on_goal = MagicMock(side_effect=[
-            [False, False, False, False],
-            [False, False, False, False],
-            [False, True, False, False],
-            [False, True, True, False],
-            [False, True, True, True]])
-        self.board4.is_finished = MagicMock(side_effect=[False, False, False, False, True])
-        self.board4.is_player_on_goal = MagicMock(side_effect=[False, False, False, True, False, True, False, True])
         self.board4.get_scores = MagicMock(
             return_value=[(PLAYER_4, 50), (PLAYER_3, 50), (PLAYER_2, 50), (PLAYER_1, 49)])
         self.agent1.play = MagicMock(return_value=(MOVE, 7, 4))  # rekt
@@ -250,17 +231,6 @@ class TestGamePlay(unittest.TestCase):
         self.board4.move_pawn((1, 4), PLAYER_3)
         self.board4.move_pawn((4, 7), PLAYER_4)
 
-        self.board4.players_on_goal = MagicMock(side_effect=[
-            [False, False, False, False],
-            [False, False, False, False],
-            [False, False, False, False],
-            [False, False, True, False],
-            [False, False, True, True],
-            [True, False, True, True]])
-
-        self.board4.is_finished = MagicMock(side_effect=[False, False, False, False, False, True])
-        self.board4.is_player_on_goal = MagicMock(
-            side_effect=[False, False, False, False, False, True, False, True, False, True])
         self.board4.get_scores = MagicMock(
             return_value=[(PLAYER_2, 50), (PLAYER_3, 50), (PLAYER_4, 50), (PLAYER_1, 49)])
         self.agent1.play = MagicMock(side_effect=[(MOVE, 7, 4), (MOVE, 8, 4)])
@@ -279,18 +249,6 @@ class TestGamePlay(unittest.TestCase):
         self.board4.move_pawn((1, 4), PLAYER_3)
         self.board4.move_pawn((4, 7), PLAYER_4)
 
-        self.board4.players_on_goal = MagicMock(side_effect=[
-            [False, False, False, False],
-            [False, False, False, False],
-            [False, False, False, False],
-            [False, False, False, False],
-            [False, False, True, False],
-            [True, False, True, False],
-            [True, False, True, False]])
-
-        self.board4.is_finished = MagicMock(side_effect=[False, False, False, False, False, True])
-        self.board4.is_player_on_goal = MagicMock(
-            side_effect=[False, False, False, False, False, False, True, False, True])
         self.board4.get_scores = MagicMock(
             return_value=[(PLAYER_2, 50), (PLAYER_3, 50), (PLAYER_4, 50), (PLAYER_1, 49)])
         self.agent1.play = MagicMock(side_effect=[(MOVE, 7, 4), (MOVE, 8, 4)])
@@ -309,23 +267,6 @@ class TestGamePlay(unittest.TestCase):
         self.board4.move_pawn((1, 4), PLAYER_3)
         self.board4.move_pawn((4, 7), PLAYER_4)
 
-        self.board4.players_on_goal = MagicMock(side_effect=[
-            [False, False, False, False],
-            [False, False, False, False],
-            [False, False, False, False],
-            [False, False, True, False],
-            [False, False, True, False],
-            [False, False, True, True],
-            [False, False, True, True],
-            [False, False, True, True],
-            [False, False, True, True],
-            [False, False, True, True],
-            [True, False, True, True]])
-        self.board4.is_finished = MagicMock(
-            side_effect=[False, False, False, False, False, False, False, False, False, True])
-        self.board4.is_player_on_goal = MagicMock(
-            side_effect=[False, False, False, False, False, True, False, True, False, False, False, False, True, True,
-                         False, True])
         self.board4.get_scores = MagicMock(
             return_value=[(PLAYER_2, 50), (PLAYER_3, 50), (PLAYER_4, 50), (PLAYER_1, 49)])
         self.agent1.play = MagicMock(side_effect=[(MOVE, 6, 4), (MOVE, 7, 4), (MOVE, 8, 4)])
@@ -344,11 +285,6 @@ class TestGamePlay(unittest.TestCase):
         self.board4.move_pawn((1, 4), PLAYER_3)  # win
         self.board4.move_pawn((4, 7), PLAYER_4)  # dc
 
-        self.board4.is_finished = MagicMock(return_value=False)
-        self.board4.players_on_goal = MagicMock(
-            side_effect=[[False, False, False, False], [True, False, False, False], [True, False, False, False],
-                         [True, False, True, False], [True, False, True, False]])
-        self.board4.is_player_on_goal = MagicMock(side_effect=[False, True, False, False, True, False])
         self.board4.get_scores = MagicMock(
             return_value=[(PLAYER_2, 50), (PLAYER_3, 50), (PLAYER_4, 50), (PLAYER_1, 49)])
         self.agent1.play = MagicMock(side_effect=[(MOVE, 8, 4)])  # win
@@ -360,6 +296,22 @@ class TestGamePlay(unittest.TestCase):
         self.trace4.set_ranking.assert_called_with([PLAYER_1, PLAYER_3, PLAYER_4, PLAYER_2])
         self.viewer.finished.assert_called_with(3, PLAYER_1, "")
 
+    def test_should_track_players_on_goal_without_scanning_the_board(self):
+        self.board2.move_pawn((6, 3), PLAYER_1)
+        self.board2.is_finished = MagicMock(wraps=self.board2.is_finished)
+        self.board2.players_on_goal = MagicMock(wraps=self.board2.players_on_goal)
+        self.board2.get_scores = MagicMock(wraps=self.board2.get_scores)
+        self.agent1.play = MagicMock(side_effect=[(MOVE, 7, 3), (MOVE, 8, 3)])
+        self.agent2.play = MagicMock(return_value=(MOVE, 8, 5))
+        self.game2.play()
+        self.board2.is_finished.assert_not_called()
+        self.board2.players_on_goal.assert_called_once_with()
+        self.board2.get_scores.assert_called_once_with()
+        self.assertEqual(self.game2.on_goal, [True, False])
+        self.assertEqual((self.game2.connected_count, self.game2.on_goal_count), (2, 1))
+        self.trace2.set_ranking.assert_called_with([PLAYER_1, PLAYER_2])
+        self.viewer.finished.assert_called_with(3, PLAYER_1, "")
+
 
 class TestGameDisconnect2Players(unittest.TestCase):
     def setUp(self):
@@ -374,7 +326,6 @@ class TestGameDisconnect2Players(unittest.TestCase):
         self.trace2 = Trace(self.board2, credits[0:2])
         self.trace2.set_winner = MagicMock()
         self.trace2.set_ranking = MagicMock()
-        self.board2.is_player_on_goal = MagicMock(return_value=False)
         self.viewer = HeadlessViewer()
         self.viewer.finished = MagicMock()
         self.game2 = Game(agents[0:2], self.board2, self.viewer, credits[0:2], self.trace2)
@@ -393,7 +344,6 @@ class TestGameDisconnect2Players(unittest.TestCase):
         self.trace2.set_winner.assert_called_with(PLAYER_1, "Opponent's have been expelled.")
 
     def test_play_should_call_play_and_make_player1_win_on_player2_disconnect(self):
-        self.board2.is_finished = MagicMock(return_value=False)
         self.agent1.play = MagicMock(return_value=(WALL_H, 1, 2))
         self.agent2.play = MagicMock(side_effect=socket.timeout)
         self.game2.play()
@@ -404,7 +354,6 @@ class TestGameDisconnect2Players(unittest.TestCase):
         self.trace2.set_winner.assert_called_with(PLAYER_1, "Opponent's have been expelled.")
 
     def test_play_should_call_play_and_make_player2_win_on_player1_disconnect(self):
-        self.board2.is_finished = MagicMock(return_value=False)
         self.agent1.play = MagicMock(side_effect=socket.timeout)
         self.game2.play()
         self.agent1.initialize.assert_called_with(self.board2, [0], None)
@@ -413,7 +362,6 @@ class TestGameDisconnect2Players(unittest.TestCase):
         self.trace2.set_winner.assert_called_with(PLAYER_2, "Opponent's have been expelled.")
 
     def test_should_return_ranking_with_player_2_when_player_1_disconnect(self):
-        self.board2.is_finished = MagicMock(return_value=False)
         self.agent1.play = MagicMock(side_effect=socket.timeout)
         self.game2.play()
         self.agent1.initialize.assert_called_with(self.board2, [0], None)
@@ -422,7 +370,6 @@ class TestGameDisconnect2Players(unittest.TestCase):
         self.trace2.set_ranking.assert_called_with([PLAYER_2, PLAYER_1])
 
     def test_should_return_ranking_with_player_1_when_player_2_disconnect(self):
-        self.board2.is_finished = MagicMock(return_value=False)
         self.agent1.play = MagicMock(return_value=(WALL_H, 1, 2))
         self.agent2.play = MagicMock(side_effect=socket.timeout)
         self.game2.play()
@@ -434,7 +381,6 @@ class TestGameDisconnect2Players(unittest.TestCase):
     def test_play_should_call_initialize_and_not_declare_a_winner_if_none_can_connect(self):
         self.agent1.initialize = MagicMock(side_effect=TimeCreditExpiredError)
         self.agent2.initialize = MagicMock(side_effect=TimeCreditExpiredError)
-        self.board2.is_finished = MagicMock(return_value=True)
         self.game2.play()
         self.agent1.initialize.assert_called_with(self.board2, [PLAYER_1], None)
         self.agent2.initialize.assert_called_with(self.board2, [PLAYER_2], None)
@@ -462,8 +408,8 @@ class TestGameDisconnect4Players(unittest.TestCase):
 
     def test_play_should_call_initialize_and_not_leave_the_game_if_one_player_disconnect(self):
         self.agent2.initialize = MagicMock(side_effect=TimeCreditExpiredError)
-        self.board4.is_finished = MagicMock(return_value=True)
-        self.game4.play()
+        with max_steps(0):
+            self.game4.play()
         self.agent1.initialize.assert_called_with(self.board4, [PLAYER_1], None)
         self.agent2.initialize.assert_called_with(self.board4, [PLAYER_2], None)
         self.agent3.initialize.assert_called_with(self.board4, [PLAYER_3], None)
@@ -474,7 +420,6 @@ class TestGameDisconnect4Players(unittest.TestCase):
         self.agent2.initialize = MagicMock(side_effect=TimeCreditExpiredError)
         self.agent3.initialize = MagicMock(side_effect=TimeCreditExpiredError)
         self.agent4.initialize = MagicMock(side_effect=TimeCreditExpiredError)
-        self.board4.is_finished = MagicMock(return_value=True)
         self.game4.play()
         self.agent1.initialize.assert_called_with(self.board4, [PLAYER_1], None)
         self.agent2.initialize.assert_called_with(self.board4, [PLAYER_2], None)
@@ -484,11 +429,11 @@ class TestGameDisconnect4Players(unittest.TestCase):
 
     def test_play_should_call_initialize_and_not_make_player_play_if_disconnected(self):
         self.agent3.initialize = MagicMock(side_effect=TimeCreditExpiredError)
-        self.board4.is_finished = MagicMock(side_effect=[False, False, False, False, True])
         self.agent1.play = MagicMock(return_value=(WALL_H, 1, 2))
         self.agent2.play = MagicMock(return_value=(WALL_H, 2, 3))
         self.agent4.play = MagicMock(return_value=(WALL_H, 4, 5))
-        self.game4.play()
+        with max_steps(3):
+            self.game4.play()
         self.agent1.initialize.assert_called_with(self.board4, [PLAYER_1], None)
         self.agent2.initialize.assert_called_with(self.board4, [PLAYER_2], None)
         self.agent3.initialize.assert_called_with(self.board4, [PLAYER_3], None)
@@ -500,7 +445,6 @@ class TestGameDisconnect4Players(unittest.TestCase):
         self.agent4.play.assert_called_with(self.board4, PLAYER_4, 3, None)
 
     def test_play_should_call_play_while_there_are_connected_players(self):
-        self.board4.is_finished = MagicMock(return_value=False)
         self.agent1.play = MagicMock(side_effect=[(WALL_H, 1, 1), (WALL_H, 1, 3), (WALL_H, 1, 5), socket.timeout])
         self.agent2.play = MagicMock(side_effect=[(WALL_H, 2, 1), socket.timeout])
         self.agent3.play = MagicMock(side_effect=[(WALL_H, 3, 1), (WALL_H, 3, 3), socket.timeout])
@@ -539,11 +483,11 @@ class TestGameDisconnect4Players(unittest.TestCase):
 
     def test_play_should_not_show_all_player_to_ranking_even_if_disconnected(self):
         self.agent3.initialize = MagicMock(side_effect=TimeCreditExpiredError)
-        self.board4.is_finished = MagicMock(side_effect=[False, False, False, False, True])
         self.agent1.play = MagicMock(return_value=(WALL_H, 1, 2))
         self.agent2.play = MagicMock(return_value=(WALL_H, 2, 3))
         self.agent4.play = MagicMock(return_value=(WALL_H, 4, 5))
-        self.game4.play()
+        with max_steps(3):
+            self.game4.play()
         self.agent1.initialize.assert_called_with(self.board4, [PLAYER_1], None)
         self.agent2.initialize.assert_called_with(self.board4, [PLAYER_2], None)
         self.agent3.initialize.assert_called_with(self.board4, [PLAYER_3], None)
@@ -573,7 +517,6 @@ class TestGameMetaInformation(unittest.TestCase):
         self.game4 = Game(agents, self.board4, self.viewer, credits, self.trace4)
 
     def test_should_add_information_about_disconnection(self):
-        self.board4.is_finished = MagicMock(return_value=False)
         self.agent1.play = MagicMock(side_effect=[(WALL_H, 1, 1), (WALL_H, 1, 3), (WALL_H, 1, 5), socket.timeout])
         self.agent2.play = MagicMock(side_effect=[(WALL_H, 2, 1), socket.timeout])
         self.agent3.play = MagicMock(side_effect=[(WALL_H, 3, 1), (WALL_H, 3, 3), socket.timeout])
@@ -583,6 +526,177 @@ class TestGameMetaInformation(unittest.TestCase):
         self.trace4.set_reasons.assert_called_with([(12, "Timeout "), (6, "Timeout "), (10, "Timeout "), (None, "")])
 
 
+class TestGamePonder(unittest.TestCase):
+    def setUp(self):
+        self.agent1 = Agent()
+        self.agent2 = Agent()
+        self.agent1.play = MagicMock(side_effect=[(MOVE, 6, 3), (MOVE, 7, 3), (MOVE, 8, 3)])
+        self.agent2.play = MagicMock(side_effect=[(MOVE, 8, 5), (MOVE, 8, 4)])
+        self.agent1.notify = MagicMock()
+        self.agent2.notify = MagicMock()
+        self.board2 = Board()
+        self.board2.move_pawn((5, 3), PLAYER_1)
+
+    def test_should_not_notify_agents_by_default(self):
+        Game([self.agent1, self.agent2], self.board2).play()
+        self.agent1.notify.assert_not_called()
+        self.agent2.notify.assert_not_called()
+
+    def test_should_notify_other_agents_of_every_action(self):
+        game = Game([self.agent1, self.agent2], self.board2, ponder=True)
+        game.play()
+        self.assertEqual(self.agent1.notify.call_args_list,
+                         [call(2, PLAYER_2, (MOVE, 8, 5)), call(4, PLAYER_2, (MOVE, 8, 4))])
+        self.assertEqual(self.agent2.notify.call_args_list,
+                         [call(1, PLAYER_1, (MOVE, 6, 3)), call(3, PLAYER_1, (MOVE, 7, 3)),
+                          call(5, PLAYER_1, (MOVE, 8, 3))])
+
+    def test_should_stop_notifying_failing_agent_without_expelling_it(self):
+        self.agent2.notify = MagicMock(side_effect=socket.timeout)
+        game = Game([self.agent1, self.agent2], self.board2, ponder=True)
+        game.play()
+        self.agent2.notify.assert_called_once_with(1, PLAYER_1, (MOVE, 6, 3))
+        self.assertEqual(game.trace.reasons, [(None, ""), (None, "")])
+        self.assertEqual(game.trace.winner, PLAYER_1)
+
+
+class TestGameClock(unittest.TestCase):
+    def setUp(self):
+        self.agent1 = Agent()
+        self.agent2 = Agent()
+        self.agent1.play = MagicMock(side_effect=[(MOVE, 6, 3), (MOVE, 7, 3), (MOVE, 8, 3)])
+        self.agent2.play = MagicMock(side_effect=[(MOVE, 8, 5), (MOVE, 8, 4)])
+        self.board2 = Board()
+        self.board2.move_pawn((5, 3), PLAYER_1)
+        # every call to an agent lasts exactly half a second
+        self.perf_counter = patch('time.perf_counter', side_effect=itertools.count(0.0, 0.5))
+        self.perf_counter.start()
+
+    def tearDown(self):
+        self.perf_counter.stop()
+
+    def time_left(self, agent):
+        return [c[0][3] for c in agent.play.call_args_list]
+
+    def test_should_reject_unknown_clock(self):
+        with self.assertRaises(ValueError):
+            Game([self.agent1, self.agent2], self.board2, clock='hourglass')
+
+    def test_bank_clock_should_not_reset_credits(self):
+        Game([self.agent1, self.agent2], self.board2, None, [5.0, 5.0], clock=CLOCK_BANK).play()
+        self.assertEqual(self.time_left(self.agent1), [4.5, 4.0, 3.5])
+
+    def test_fischer_clock_should_add_increment_after_every_move(self):
+        Game([self.agent1, self.agent2], self.board2, None, [5.0, 5.0],
+             clock=CLOCK_FISCHER, increment=1.0).play()
+        self.assertEqual(self.time_left(self.agent1), [4.5, 5.0, 5.5])
+
+    def test_bronstein_clock_should_not_count_delay(self):
+        Game([self.agent1, self.agent2], self.board2, None, [5.0, 5.0],
+             clock=CLOCK_BRONSTEIN, increment=0.375).play()
+        self.assertEqual(self.time_left(self.agent1), [4.875, 4.75, 4.625])
+
+    def test_should_credit_transport_overhead_back(self):
+        self.agent1.last_timings = CallTimings(0.125, 0.125, 0.25, 0.125)
+        game = Game([self.agent1, self.agent2], self.board2, None, [5.0, 5.0], clock=CLOCK_BANK)
+        game.play()
+        self.assertEqual(self.time_left(self.agent1), [4.875, 4.75, 4.625])
+        self.assertEqual([t for player, _, t in game.trace.actions if player == PLAYER_1],
+                         [0.125, 0.125, 0.125])
+
+    def test_trace_should_keep_the_starting_credits(self):
+        game = Game([self.agent1, self.agent2], self.board2, None, [5.0, 4.0], clock=CLOCK_BANK)
+        game.play()
+        self.assertEqual(game.trace.time_limits, [5.0, 4.0])
+
+
+class RecordingViewer(Viewer):
+    """Viewer recording its events, taking render_time seconds of a fake
+    clock to show each step.
+    """
+
+    def __init__(self, clock, render_time=0.0):
+        super().__init__()
+        self.clock = clock
+        self.render_time = render_time
+        self.events = []
+
+    def init_viewer(self, board):
+        super().init_viewer(board)
+        self.events.append(('init', board.pawns[PLAYER_1]))
+
+    def playing(self, step, player):
+        self.events.append(('playing', step))
+
+    def update(self, step, action, player):
+        self.clock[0] += self.render_time
+        self.events.append(('update', step))
+
+    def show(self, step, board):
+        super().show(step, board)
+        self.clock[0] += self.render_time
+        self.events.append(('show', step, board.pawns[PLAYER_1]))
+
+    def finished(self, steps, winner, reason=""):
+        self.events.append(('finished', steps))
+
+
+class TestViewerReplay(unittest.TestCase):
+    def setUp(self):
+        self.trace = Trace(Board(), [None, None])
+        for row in range(1, 5):
+            self.trace.add_action(PLAYER_1, (MOVE, row, 4), 0.5)
+            self.trace.add_action(PLAYER_2, (MOVE, 8 - row, 4), 0.5)
+        self.clock = [0.0]
+        self.sleeps = []
+
+        def sleep(seconds):
+            self.sleeps.append(seconds)
+            self.clock[0] += seconds
+
+        patcher = patch.multiple('game.game.time', perf_counter=lambda: self.clock[0],
+                                 sleep=sleep)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_should_show_every_step_in_order(self):
+        viewer = RecordingViewer(self.clock)
+        viewer.replay(self.trace, 1.0)
+        self.assertEqual(viewer.events[0], ('init', (0, 4)))
+        self.assertEqual(viewer.events[1:-1],
+                         [(kind, step) for step in range(1, 9) for kind in ('playing', 'update')])
+        self.assertEqual(viewer.events[-1], ('finished', 8))
+        self.assertEqual(self.clock[0], 8.0)
+
+    def test_should_scale_real_durations(self):
+        viewer = RecordingViewer(self.clock)
+        viewer.replay(self.trace, -4.0)
+        self.assertEqual(self.clock[0], 8 * 0.5 / 4)
+
+    def test_should_not_sleep_without_delay(self):
+        viewer = RecordingViewer(self.clock)
+        viewer.replay(self.trace, 0)
+        self.assertEqual(self.sleeps, [])
+        self.assertEqual(len([event for event in viewer.events if event[0] == 'update']), 8)
+
+    def test_should_start_at_given_step(self):
+        viewer = RecordingViewer(self.clock)
+        viewer.replay(self.trace, 0, start=6)
+        self.assertEqual(viewer.events, [('init', (3, 4)), ('playing', 7), ('update', 7),
+                                         ('playing', 8), ('update', 8), ('finished', 8)])
+
+    def test_should_coalesce_steps_when_viewer_is_behind(self):
+        viewer = RecordingViewer(self.clock, render_time=2.5)
+        viewer.replay(self.trace, 1.0)
+        shown = [event for event in viewer.events if event[0] in ('update', 'show')]
+        self.assertLess(len(shown), 8)
+        self.assertIn('show', [event[0] for event in shown])
+        self.assertEqual(shown[-1][1], 8)
+        # the replay keeps its pace instead of taking 8 * (1 + 2.5) seconds
+        self.assertLess(self.clock[0], 8 + 2 * 2.5)
+        self.assertEqual(viewer.board.pawns, self.trace.snapshots()[8].pawns)
+
+
 if __name__ == '__main__':
     unittest.main(
         testRunner=xmlrunner.XMLTestRunner(output='test-reports'),
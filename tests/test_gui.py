@@ -0,0 +1,117 @@
+import itertools
+import unittest
+
+import xmlrunner
+
+from game.constants import MOVE, WALL_H, WALL_V
+from game.game import Viewer
+from game.gui import TkViewer
+from game.quoridor import Board
+
+PLAYER_1 = 0
+PLAYER_2 = 1
+
+
+class FakeCanvas:
+    """Canvas recording the changes of its items."""
+
+    def __init__(self):
+        self.ids = itertools.count(1)
+        self.items = {}
+        self.calls = []
+
+    def _create(self, *coords, **options):
+        item = next(self.ids)
+        self.items[item] = dict(options, coords=coords)
+        return item
+
+    create_rectangle = create_oval = create_text = _create
+
+    def coords(self, item, *coords):
+        self.calls.append(('coords', item))
+        self.items[item]['coords'] = coords
+
+    def delete(self, item):
+        self.calls.append(('delete', item))
+        del self.items[item]
+
+    def itemconfigure(self, item, **options):
+        self.calls.append(('itemconfigure', item))
+        self.items[item].update(options)
+
+    def tag_lower(self, item, below):
+        self.calls.append(('tag_lower', item))
+
+    def tag_raise(self, item, above):
+        self.calls.append(('tag_raise', item))
+
+
+def make_viewer(board):
+    # a viewer drawing on fake canvases, without Tk
+    viewer = TkViewer.__new__(TkViewer)
+    Viewer.__init__(viewer)
+    viewer._board = board
+    viewer.canvas = FakeCanvas()
+    viewer.scoreboard = FakeCanvas()
+    viewer.canvas_height = 2 * viewer.y_offset + viewer.w * board.rows
+    viewer.tile_ids = [[0] * board.cols for _ in range(board.rows)]
+    viewer.bg_h_wall_ids = [[0] * (board.cols - 1) for _ in range(board.rows - 1)]
+    viewer.bg_v_wall_ids = [[0] * (board.cols - 1) for _ in range(board.rows - 1)]
+    viewer.h_wall_ids = {}
+    viewer.v_wall_ids = {}
+    viewer.scoreboard_wall_ids = [[0] * walls for walls in board.player_walls]
+    viewer.pawn_ids = [0] * board.player_count
+    viewer.draw_board(board)
+    viewer.canvas.calls.clear()
+    viewer.scoreboard.calls.clear()
+    return viewer
+
+
+class TestRetainedScene(unittest.TestCase):
+
+    def setUp(self):
+        self.board = Board()
+        self.viewer = make_viewer(self.board)
+
+    def test_move_should_only_move_the_pawn(self):
+        self.viewer.redraw_board(self.board.clone().apply_action((MOVE, 1, 4), PLAYER_1))
+        self.assertEqual(self.viewer.canvas.calls,
+                         [('coords', self.viewer.pawn_ids[PLAYER_1])])
+        self.assertEqual(self.viewer.scoreboard.calls, [])
+
+    def test_wall_should_add_item_and_hide_one_counter(self):
+        count = len(self.viewer.canvas.items)
+        board = self.board.clone().apply_action((WALL_H, 3, 4), PLAYER_2)
+        self.viewer.redraw_board(board)
+        self.assertEqual(self.viewer.canvas.calls, [])
+        self.assertEqual(len(self.viewer.canvas.items), count + 1)
+        slot = self.viewer.scoreboard_wall_ids[PLAYER_2][board.player_walls[PLAYER_2]]
+        self.assertEqual(self.viewer.scoreboard.calls, [('itemconfigure', slot)])
+        self.assertEqual(self.viewer.scoreboard.items[slot]['state'], 'hidden')
+
+    def test_going_back_should_restore_the_scene(self):
+        items = {item: dict(options) for item, options in self.viewer.canvas.items.items()}
+        board = self.board.clone()
+        for action, player in [((MOVE, 1, 4), PLAYER_1), ((WALL_V, 2, 2), PLAYER_2),
+                               ((WALL_H, 6, 0), PLAYER_1)]:
+            board.apply_action(action, player)
+            self.viewer.redraw_board(board)
+        self.viewer.scoreboard.calls.clear()
+        self.viewer.redraw_board(self.board)
+        self.assertEqual(self.viewer.canvas.items, items)
+        self.assertEqual(len(self.viewer.scoreboard.calls), 2)
+        self.assertTrue(all(options.get('state', 'normal') == 'normal'
+                            for options in self.viewer.scoreboard.items.values()))
+
+    def test_same_board_should_change_nothing(self):
+        self.viewer.redraw_board(self.board.clone())
+        self.assertEqual(self.viewer.canvas.calls, [])
+        self.assertEqual(self.viewer.scoreboard.calls, [])
+
+
+if __name__ == '__main__':
+    unittest.main(
+        testRunner=xmlrunner.XMLTestRunner(output='test-reports'),
+        # these make sure that some options that are not applicable
+        # remain hidden from the help menu.
+        failfast=False, buffer=False, catchbreak=False)
@@ -0,0 +1,73 @@
+import math
+import unittest
+
+import xmlrunner
+
+from game.constants import MOVE
+from game.game import Game
+from game.metrics import StepMetrics, percentile, step_metrics, timing_report
+from game.quoridor import Board, Agent
+from game.trace import Trace
+
+PLAYER_1 = 0
+PLAYER_2 = 1
+
+
+class ForwardAgent(Agent):
+    """Agent walking straight to its goal on an empty board."""
+
+    def play(self, percepts, player, step, time_left):
+        i, j = percepts.pawns[player]
+        return MOVE, i + (1 if percepts.goals[player][0] else -1), j
+
+
+class TestPercentile(unittest.TestCase):
+
+    def test_percentile(self):
+        values = [5.0, 1.0, 4.0, 2.0, 3.0]
+        self.assertEqual(percentile(values, 50), 3.0)
+        self.assertEqual(percentile(values, 90), 5.0)
+        self.assertEqual(percentile(values, 100), 5.0)
+        self.assertEqual(percentile(values, 0), 1.0)
+
+    def test_percentile_of_nothing_is_nan(self):
+        self.assertTrue(math.isnan(percentile([], 50)))
+
+
+class TestGameMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.board = Board()
+        self.board.move_pawn((4, 3), PLAYER_1)
+        self.received = []
+        self.game = Game([ForwardAgent(), ForwardAgent()], self.board, None, None, None,
+                         ['fast', 'furious'], metrics_sink=self.received.append)
+        self.game.play()
+
+    def test_sink_should_receive_every_step(self):
+        self.assertEqual([m.step for m in self.received], list(range(1, 8)))
+        self.assertEqual([m.player for m in self.received], [0, 1, 0, 1, 0, 1, 0])
+        for metrics in self.received:
+            self.assertIsInstance(metrics, StepMetrics)
+            self.assertEqual(metrics.serialize, 0.0)
+            self.assertGreaterEqual(metrics.validate, 0.0)
+
+    def test_metrics_should_be_recorded_in_trace(self):
+        self.assertEqual(step_metrics(self.game.trace), self.received)
+
+    def test_timing_report_should_list_every_agent(self):
+        report = timing_report(self.game.trace)
+        self.assertIn('fast', report)
+        self.assertIn('furious', report)
+        self.assertIn('validate', report)
+
+    def test_timing_report_without_metrics(self):
+        self.assertEqual(timing_report(Trace(Board(), [None, None])), 'No timing recorded.')
+
+
+if __name__ == '__main__':
+    unittest.main(
+        testRunner=xmlrunner.XMLTestRunner(output='test-reports'),
+        # these make sure that some options that are not applicable
+        # remain hidden from the help menu.
+        failfast=False, buffer=False, catchbreak=False)
@@ -0,0 +1,116 @@
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+import zlib
+
+import xmlrunner
+
+from game.constants import MOVE, WALL_H
+from game.geometry import BoardGeometry
+from game.quoridor import Board
+from game.render import PNG_SIGNATURE, image_size, render_board, render_file, render_files
+from game.trace import Trace, write_trace_file
+
+PLAYER_1 = 0
+PLAYER_2 = 1
+
+
+def decode_png(data):
+    """Return the width, height and RGB rows of a PNG written by Raster."""
+    assert data.startswith(PNG_SIGNATURE)
+    offset = len(PNG_SIGNATURE)
+    chunks = {}
+    while offset < len(data):
+        length, = struct.unpack_from('>I', data, offset)
+        kind = data[offset + 4:offset + 8]
+        chunk = data[offset + 8:offset + 8 + length]
+        crc, = struct.unpack_from('>I', data, offset + 8 + length)
+        assert crc == zlib.crc32(kind + chunk)
+        chunks[kind] = chunk
+        offset += 12 + length
+    width, height = struct.unpack_from('>II', chunks[b'IHDR'])
+    raw = zlib.decompress(chunks[b'IDAT'])
+    stride = 3 * width + 1
+    return width, height, [raw[row * stride + 1:(row + 1) * stride] for row in range(height)]
+
+
+class TestRender(unittest.TestCase):
+
+    def setUp(self):
+        self.board = Board()
+        self.board.apply_action((WALL_H, 3, 4), PLAYER_1)
+
+    def test_svg(self):
+        svg = render_board(self.board, 'svg', title='Step 1').decode('utf-8')
+        self.assertTrue(svg.startswith('<svg'))
+        self.assertIn('<title>Step 1</title>', svg)
+        self.assertEqual(svg.count('<ellipse'), 2)
+        # background, tiles and wall
+        self.assertEqual(svg.count('<rect'), 1 + 1 + 81 + 1)
+
+    def test_png_pixels(self):
+        width, height, rows = decode_png(render_board(self.board, 'png'))
+        self.assertEqual((width, height), image_size(self.board))
+        geometry = BoardGeometry()
+        for player, (i, j) in enumerate(self.board.pawns):
+            x, y = geometry.get_tile_xy(i, j)
+            pixel = rows[int(y)][3 * int(x):3 * int(x) + 3]
+            self.assertEqual(pixel.hex(), geometry.pawn_colors[player].lstrip('#').lower())
+        x, y = geometry.get_wall_xy(3, 4)
+        self.assertEqual(rows[int(y)][3 * int(x):3 * int(x) + 3].hex(),
+                         geometry.wall_color.lstrip('#').lower())
+
+    def test_png_scale(self):
+        width, height, _ = decode_png(render_board(self.board, 'png', scale=0.5))
+        self.assertEqual((width, height), tuple(round(size / 2) for size in image_size(self.board)))
+
+
+class TestRenderFile(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        trace = Trace(Board(), [None, None])
+        for player, action in [(PLAYER_1, (MOVE, 1, 4)), (PLAYER_2, (WALL_H, 5, 3))]:
+            trace.add_action(player, action, 0.1)
+        self.path = os.path.join(self.directory, 'game.qtrace.gz')
+        write_trace_file(trace, self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_every_step(self):
+        output = os.path.join(self.directory, 'frames')
+        self.assertEqual(render_file(self.path, output, 'svg'), 3)
+        self.assertEqual(sorted(os.listdir(os.path.join(output, 'game'))),
+                         ['frame_0000.svg', 'frame_0001.svg', 'frame_0002.svg'])
+
+    def test_final(self):
+        output = os.path.join(self.directory, 'thumbnails')
+        self.assertEqual(render_file(self.path, output, 'png', 0.25, final=True), 1)
+        with open(os.path.join(output, 'game.png'), 'rb') as f:
+            self.assertTrue(f.read().startswith(PNG_SIGNATURE))
+
+    def test_files_of_subdirectories_should_not_collide(self):
+        traces = os.path.join(self.directory, 'traces')
+        for subdirectory in ('a', 'b'):
+            os.makedirs(os.path.join(traces, subdirectory))
+            shutil.copy(self.path, os.path.join(traces, subdirectory))
+        with open(os.path.join(traces, 'a', 'broken.json'), 'w') as f:
+            f.write('not a trace')
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                output = os.path.join(self.directory, f'thumbnails{workers}')
+                self.assertEqual(render_files([traces, self.path], output, final=True,
+                                              workers=workers), [0, 1, 1, 1])
+                self.assertEqual(sorted(os.listdir(output)), ['a', 'b', 'game.svg'])
+                self.assertEqual(os.listdir(os.path.join(output, 'b')), ['game.svg'])
+
+
+if __name__ == '__main__':
+    unittest.main(
+        testRunner=xmlrunner.XMLTestRunner(output='test-reports'),
+        # these make sure that some options that are not applicable
+        # remain hidden from the help menu.
+        failfast=False, buffer=False, catchbreak=False)
@@ -0,0 +1,83 @@
+import asyncio
+import threading
+import unittest
+import xmlrpc.client
+from xmlrpc.server import SimpleXMLRPCServer
+
+import xmlrunner
+
+from game.constants import MOVE
+from game.game import Game
+from game.quoridor import Board, Agent
+from game.rpc import AsyncServerProxy, TimedServerProxy, CallTimings
+
+PLAYER_1 = 0
+
+
+class WinningAgent(Agent):
+    """Agent playing the winning move of a prepared board."""
+
+    def play(self, percepts, player, step, time_left):
+        return MOVE, 8, 3
+
+    def name(self):
+        return xmlrpc.client.Binary(b'winner')
+
+
+class TestTimedServerProxy(unittest.TestCase):
+
+    def setUp(self):
+        self.server = SimpleXMLRPCServer(('localhost', 0), allow_none=True, logRequests=False)
+        self.server.register_instance(WinningAgent())
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.proxy = TimedServerProxy(f'http://localhost:{self.server.server_address[1]}')
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def test_call_should_return_result_and_record_timings(self):
+        self.assertIsNone(self.proxy.last_timings)
+        self.assertEqual(self.proxy.play(None, PLAYER_1, 1, None), [MOVE, 8, 3])
+        self.assertIsInstance(self.proxy.last_timings, CallTimings)
+        self.assertGreater(self.proxy.last_timings.roundtrip, 0.0)
+        self.assertAlmostEqual(self.proxy.last_timings.overhead,
+                               self.proxy.last_timings.serialize +
+                               self.proxy.last_timings.connect +
+                               self.proxy.last_timings.deserialize)
+
+    def test_call_should_raise_fault_on_remote_error(self):
+        with self.assertRaises(xmlrpc.client.Fault):
+            self.proxy.unknown_method()
+
+    def test_both_proxies_should_decode_results_the_same_way(self):
+        async_proxy = AsyncServerProxy(self.proxy.uri)
+
+        async def call():
+            try:
+                return await async_proxy.name()
+            finally:
+                async_proxy.close()
+
+        self.assertEqual(self.proxy.name(), b'winner')
+        self.assertEqual(asyncio.run(call()), b'winner')
+
+    def test_game_against_remote_agent(self):
+        board = Board()
+        board.move_pawn((7, 3), PLAYER_1)
+        game = Game([self.proxy, Agent()], board, None, [5.0, 5.0])
+        game.play()
+        self.assertEqual(game.trace.winner, PLAYER_1)
+        _, action, t = game.trace.actions[0]
+        self.assertEqual(action, [MOVE, 8, 3])
+        self.assertLess(t, 5.0)
+
+
+if __name__ == '__main__':
+    unittest.main(
+        testRunner=xmlrunner.XMLTestRunner(output='test-reports'),
+        # these make sure that some options that are not applicable
+        # remain hidden from the help menu.
+        failfast=False, buffer=False, catchbreak=False)
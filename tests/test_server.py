@@ -0,0 +1,194 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import socketserver
+import threading
+import time
+import unittest
+import urllib.request
+from xmlrpc.server import SimpleXMLRPCServer
+
+import xmlrunner
+
+from game.constants import MOVE
+from game.quoridor import Agent
+from game.server import MatchServer, MatchRequest, MatchHTTPServer, InvalidMatchError, AgentPool, \
+    FINISHED
+from game.trace import load_trace
+
+
+class ForwardAgent(Agent):
+    """Agent walking straight to its goal on an empty board."""
+
+    def play(self, percepts, player, step, time_left):
+        i, j = percepts['pawns'][player]
+        direction = 1 if percepts['goals'][player][0] else -1
+        i += direction
+        if [i, j] in percepts['pawns']:
+            i += direction  # jump over the opponent
+        return MOVE, i, j
+
+
+class CountingAgent(ForwardAgent):
+    """Agent recording the largest number of calls it served at once."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+
+    def play(self, percepts, player, step, time_left):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(0.01)
+            return super().play(percepts, player, step, time_left)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+class ThreadingXMLRPCServer(socketserver.ThreadingMixIn, SimpleXMLRPCServer):
+    daemon_threads = True
+
+
+def serve(agent, server_class=SimpleXMLRPCServer):
+    server = server_class(('localhost', 0), allow_none=True, logRequests=False)
+    server.register_instance(agent)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://localhost:{server.server_address[1]}'
+
+
+class TestMatchRequest(unittest.TestCase):
+
+    def test_from_dict(self):
+        request = MatchRequest.from_dict({'agents': ['http://a:1', 'http://b:2'], 'time': 2,
+                                          'walls': [5, 5]})
+        self.assertEqual(request.agents, ['http://a:1', 'http://b:2'])
+        self.assertEqual(request.time, 2.0)
+        self.assertEqual(request.walls, [5, 5])
+        self.assertEqual(request.names, [])
+
+    def test_should_reject_3_agents(self):
+        with self.assertRaises(InvalidMatchError):
+            MatchRequest(['http://a:1', 'http://b:2', 'http://c:3'])
+
+    def test_should_reject_unsupported_uris(self):
+        with self.assertRaises(InvalidMatchError):
+            MatchRequest(['http://a:1', 'ftp://b:2'])
+        with self.assertRaises(InvalidMatchError):
+            MatchRequest.from_dict({'agents': ['http://a:1', 'b']})
+
+    def test_should_reject_missing_agents(self):
+        with self.assertRaises(InvalidMatchError):
+            MatchRequest.from_dict({'names': ['a', 'b']})
+
+
+class TestAgentPool(unittest.TestCase):
+
+    def test_should_reuse_released_connections(self):
+        pool = AgentPool()
+        first = pool.acquire('http://localhost:8000')
+        second = pool.acquire('http://localhost:8000')
+        self.assertIsNot(first, second)
+        pool.release(first)
+        self.assertIs(pool.acquire('http://localhost:8000'), first)
+
+    def test_lease_should_wait_for_the_agents_to_be_free(self):
+        pool = AgentPool()
+        events = []
+
+        async def match(name, uris):
+            async with pool.lease(uris) as proxies:
+                self.assertEqual([proxy.uri for proxy in proxies], uris)
+                events.append(f'{name} start')
+                await asyncio.sleep(0.01)
+                events.append(f'{name} end')
+
+        async def play_all():
+            await asyncio.gather(match('first', ['http://a:1', 'http://b:2']),
+                                 match('second', ['http://c:3', 'http://a:1']),
+                                 match('third', ['http://d:4', 'http://d:4']))
+
+        asyncio.run(play_all())
+        self.assertLess(events.index('first end'), events.index('second start'))
+        self.assertLess(events.index('third start'), events.index('first end'))
+
+
+class TestMatchServer(unittest.TestCase):
+
+    def setUp(self):
+        self.agents = [serve(ForwardAgent()) for _ in range(2)]
+        self.trace_dir = tempfile.mkdtemp()
+        self.matches = MatchServer(workers=4, trace_dir=self.trace_dir)
+        self.matches.start()
+
+    def tearDown(self):
+        self.matches.stop()
+        for server, _ in self.agents:
+            server.shutdown()
+            server.server_close()
+        shutil.rmtree(self.trace_dir)
+
+    def test_should_play_submitted_matches(self):
+        results = self.matches.subscribe()
+        uris = [uri for _, uri in self.agents]
+        ids = {self.matches.submit(MatchRequest(uris, ['first', 'second'], 10.0)) for _ in range(3)}
+        finished = [results.get(timeout=10) for _ in range(3)]
+
+        self.assertEqual({result['id'] for result in finished}, ids)
+        for result in finished:
+            self.assertEqual(result['status'], FINISHED)
+            self.assertEqual(result['winner'], 1)
+            self.assertEqual(result['ranking'], [{'team_name': 'second', 'rank': 0},
+                                                 {'team_name': 'first', 'rank': 1}])
+            with open(result['trace']) as f:
+                self.assertEqual(len(load_trace(f).actions), 14)
+            self.assertEqual(self.matches.status(result['id']), result)
+
+    def test_matches_against_the_same_agent_should_not_overlap(self):
+        shared = CountingAgent()
+        server, uri = serve(shared, ThreadingXMLRPCServer)
+        try:
+            results = self.matches.subscribe()
+            for _, opponent in self.agents:
+                self.matches.submit(MatchRequest([uri, opponent], time=10.0))
+            finished = [results.get(timeout=10) for _ in self.agents]
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual([result['status'] for result in finished], [FINISHED, FINISHED])
+        self.assertEqual(shared.max_active, 1)
+
+    def test_http_api(self):
+        http = MatchHTTPServer('localhost', 0, self.matches)
+        threading.Thread(target=http.serve_forever, daemon=True).start()
+        base = f'http://localhost:{http.server_address[1]}'
+        try:
+            stream = urllib.request.urlopen(base + '/results', timeout=10)
+            request = urllib.request.Request(
+                base + '/matches', json.dumps({'agents': [uri for _, uri in self.agents]}).encode())
+            with urllib.request.urlopen(request, timeout=10) as response:
+                self.assertEqual(response.status, 202)
+                match_id = json.load(response)['id']
+
+            result = json.loads(stream.readline())
+            stream.close()
+            self.assertEqual(result['id'], match_id)
+            with urllib.request.urlopen(f'{base}/matches/{match_id}', timeout=10) as response:
+                self.assertEqual(json.load(response)['status'], FINISHED)
+            self.assertTrue(os.path.exists(result['trace']))
+        finally:
+            http.shutdown()
+            http.server_close()
+
+
+if __name__ == '__main__':
+    unittest.main(
+        testRunner=xmlrunner.XMLTestRunner(output='test-reports'),
+        # these make sure that some options that are not applicable
+        # remain hidden from the help menu.
+        failfast=False, buffer=False, catchbreak=False)
@@ -0,0 +1,74 @@
+import os
+import random
+import subprocess
+import sys
+import unittest
+
+import xmlrunner
+
+from game.constants import MOVE
+from game.quoridor import Agent
+from game.simulation import RandomAgent, THINK_TIME, VirtualClock, derive_seed, simulate, \
+    simulate_game, trace_digest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class GlobalRandomAgent(Agent):
+    """Agent moving to a random legal square chosen with the random module."""
+
+    def play(self, percepts, player, step, time_left):
+        return random.choice(percepts.get_legal_pawn_moves(player))
+
+
+def digests(seed, games=2, factory=RandomAgent):
+    return [trace_digest(trace) for trace in simulate([factory] * 2, seed, games)]
+
+
+class TestSimulation(unittest.TestCase):
+
+    def test_derive_seed_should_be_stable(self):
+        self.assertEqual(derive_seed(42, 0, 1), derive_seed(42, 0, 1))
+        self.assertNotEqual(derive_seed(42, 0, 1), derive_seed(42, 1, 0))
+
+    def test_virtual_clock(self):
+        clock = VirtualClock()
+        clock.advance(0.25)
+        self.assertEqual(clock(), 0.25)
+
+    def test_same_seed_should_give_identical_traces(self):
+        self.assertEqual(digests(7), digests(7))
+        self.assertNotEqual(digests(7), digests(8))
+
+    def test_should_seed_the_random_module_and_restore_it(self):
+        state = random.getstate()
+        first = digests(7, 1, lambda rng: GlobalRandomAgent())
+        self.assertEqual(random.getstate(), state)
+        self.assertEqual(digests(7, 1, lambda rng: GlobalRandomAgent()), first)
+
+    def test_should_charge_virtual_think_time(self):
+        trace = simulate_game([RandomAgent] * 2, 7, time_credits=[5.0, 5.0], think_time=0.5)
+        self.assertEqual({t for _, _, t in trace.actions}, {0.5})
+        self.assertEqual({metrics['validate'] for metrics in trace.metrics}, {0.0})
+        self.assertAlmostEqual(simulate_game([RandomAgent] * 2, 7).actions[0][2], THINK_TIME)
+
+    def test_should_not_depend_on_hash_seed(self):
+        code = ('from game.simulation import RandomAgent, simulate, trace_digest\n'
+                'print(" ".join(trace_digest(t) for t in simulate([RandomAgent] * 2, 7, 2)))')
+        env = dict(os.environ, PYTHONHASHSEED='12345')
+        output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.split(), digests(7))
+
+    def test_should_play_4_player_games(self):
+        trace = simulate_game([lambda rng: GlobalRandomAgent()] * 4, 3, player_names=list('abcd'))
+        self.assertEqual(len(trace.initial_board.pawns), 4)
+        self.assertEqual(trace.actions[0][1][0], MOVE)
+
+
+if __name__ == '__main__':
+    unittest.main(
+        testRunner=xmlrunner.XMLTestRunner(output='test-reports'),
+        # these make sure that some options that are not applicable
+        # remain hidden from the help menu.
+        failfast=False, buffer=False, catchbreak=False)
@@ -0,0 +1,29 @@
+import unittest
+
+import xmlrunner
+
+from benchmarks.startup import UNUSED_MODULES, import_times
+
+
+class TestHeadlessStartup(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.modules = {t.module for t in import_times()}
+
+    def test_should_import_game_and_transport(self):
+        self.assertLessEqual({'game.game', 'game.trace', 'game.rpc'}, self.modules)
+
+    def test_should_not_import_unused_modules(self):
+        self.assertEqual(self.modules & set(UNUSED_MODULES), set())
+
+    def test_should_not_import_compressions_of_traces(self):
+        times = import_times("import game.trace")
+        self.assertFalse({'bz2', 'lzma'} & {t.module for t in times})
+
+
+if __name__ == '__main__':
+    unittest.main(
+        testRunner=xmlrunner.XMLTestRunner(output='test-reports'),
+        # these make sure that some options that are not applicable
+        # remain hidden from the help menu.
+        failfast=False, buffer=False, catchbreak=False)
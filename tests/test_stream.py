@@ -0,0 +1,173 @@
+import json
+import threading
+import time
+import unittest
+import urllib.request
+
+import xmlrunner
+
+from game.constants import MOVE
+from game.game import Game, TeeViewer, Viewer
+from game.quoridor import Agent, Board
+from game.stream import GameChannel, StreamServer, StreamingViewer
+
+PLAYER_1 = 0
+PLAYER_2 = 1
+
+
+class BeeLineAgent(Agent):
+    """Agent always moving along its shortest path."""
+
+    def play(self, percepts, player, step, time_left):
+        i, j = percepts.get_shortest_path(player)[0]
+        return MOVE, i, j
+
+
+class RecordingViewer(Viewer):
+
+    def __init__(self):
+        super().__init__()
+        self.steps = []
+
+    def playing(self, step, player):
+        pass
+
+    def update(self, step, action, player):
+        self.board.apply_action(action, player)
+        self.steps.append(step)
+
+    def finished(self, steps, winner, reason=""):
+        self.steps.append('finished')
+
+
+def parse_events(messages):
+    """Return the (kind, data) of Server-Sent Events messages."""
+    events = []
+    for message in messages:
+        lines = dict(line.split(': ', 1) for line in message.decode('utf-8').strip().split('\n'))
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def read_all(subscriber):
+    messages = []
+    while True:
+        message = subscriber.get(timeout=1)
+        if message is None:
+            return messages
+        messages.append(message)
+
+
+class TestGameChannel(unittest.TestCase):
+
+    def setUp(self):
+        self.channel = GameChannel('test', capacity=4)
+        self.channel.start(Board(), ['alpha', 'beta'])
+
+    def play(self, steps):
+        board = Board()
+        for step in range(1, steps + 1):
+            player = (step + 1) % 2
+            i, j = board.get_shortest_path(player)[0]
+            board.apply_action((MOVE, i, j), player)
+            self.channel.playing(step, player)
+            self.channel.action(step, (MOVE, i, j), player)
+        return board
+
+    def test_events(self):
+        subscriber = self.channel.subscribe()
+        self.play(1)
+        self.channel.finish(1, PLAYER_1, '')
+        events = parse_events(read_all(subscriber))
+        self.assertEqual([kind for kind, _ in events], ['state', 'playing', 'action', 'finished'])
+        self.assertEqual(events[0][1]['player_names'], ['alpha', 'beta'])
+        self.assertEqual(events[2][1], {'step': 1, 'player': PLAYER_1, 'action': ['P', 1, 4]})
+
+    def test_slow_spectator_should_be_resynchronized(self):
+        subscriber = self.channel.subscribe()
+        board = self.play(5)
+        self.channel.finish(5, PLAYER_1, '')
+        events = parse_events(read_all(subscriber))
+        self.assertEqual(events[0][0], 'state')
+        self.assertEqual(events[-1][0], 'finished')
+        self.assertLessEqual(len(events), 4 + 1)
+        # the last state followed by the actions after it give the final board
+        last = max(index for index, (kind, _) in enumerate(events) if kind == 'state')
+        pawns = [tuple(pawn) for pawn in events[last][1]['board']['pawns']]
+        for kind, data in events[last + 1:]:
+            if kind == 'action':
+                pawns[data['player']] = tuple(data['action'][1:])
+        self.assertEqual(pawns, board.pawns)
+
+    def test_late_spectator_should_get_current_state(self):
+        board = self.play(3)
+        subscriber = self.channel.subscribe()
+        self.channel.finish(3, PLAYER_1, '')
+        events = parse_events(read_all(subscriber))
+        self.assertEqual([kind for kind, _ in events], ['state', 'finished'])
+        self.assertEqual(events[0][1]['step'], 3)
+        self.assertEqual([tuple(pawn) for pawn in events[0][1]['board']['pawns']], board.pawns)
+        finished = self.channel.subscribe()
+        self.assertEqual([kind for kind, _ in parse_events(read_all(finished))],
+                         ['state', 'finished'])
+
+    def test_streaming_viewer_should_not_play(self):
+        viewer = StreamingViewer(self.channel)
+        viewer.init_viewer(Board())
+        with self.assertRaises(NotImplementedError):
+            viewer.play(Board(), PLAYER_1, 1, None)
+
+
+class TestStreamServer(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StreamServer('localhost', 0)
+        self.server.start()
+        self.base = f'http://localhost:{self.server.server_address[1]}'
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_spectators_should_follow_game(self):
+        channel = self.server.channel('live')
+        recorder = RecordingViewer()
+        viewer = TeeViewer(recorder, StreamingViewer(channel, ['alpha', 'beta']))
+        viewer.init_viewer(Board())
+        streams = []
+
+        def follow():
+            with urllib.request.urlopen(self.base + '/games/live/events', timeout=5) as response:
+                self.assertEqual(response.headers['Content-Type'], 'text/event-stream')
+                streams.append(response.read().split(b'\n\n')[:-1])
+
+        spectators = [threading.Thread(target=follow) for _ in range(3)]
+        for spectator in spectators:
+            spectator.start()
+        while len(channel._subscribers) < len(spectators):
+            time.sleep(0.01)
+        game = Game([BeeLineAgent(), BeeLineAgent()], Board(), viewer)
+        game.play()
+        for spectator in spectators:
+            spectator.join(5)
+
+        self.assertEqual(len(streams), 3)
+        for stream in streams:
+            events = parse_events(message + b'\n\n' for message in stream)
+            actions = [data for kind, data in events if kind == 'action']
+            self.assertEqual(len(actions), len(game.trace.actions))
+            self.assertEqual(events[-1], ('finished', {'steps': game.step,
+                                                      'winner': game.trace.winner,
+                                                      'reason': game.trace.reason}))
+        self.assertEqual(recorder.steps[-1], 'finished')
+
+        with urllib.request.urlopen(self.base + '/games', timeout=5) as response:
+            games = json.loads(response.read())
+        self.assertEqual(games, [{'id': 'live', 'step': game.step, 'finished': True}])
+
+
+if __name__ == '__main__':
+    unittest.main(
+        testRunner=xmlrunner.XMLTestRunner(output='test-reports'),
+        # these make sure that some options that are not applicable
+        # remain hidden from the help menu.
+        failfast=False, buffer=False, catchbreak=False)
@@ -1,15 +1,22 @@
 import unittest
 import json
 
+import io
 import os
+import threading
 import uuid
 
+from unittest.mock import patch
+
+import jsonpickle
 import xmlrunner
 
-from game.constants import MOVE
+from game.constants import MOVE, WALL_H
 from game.game import Trace, Game
 from game.quoridor import Board, Agent
-from game.trace import load_trace
+from game.trace import load_trace, StreamingTrace, follow_trace, board_to_dict, board_from_dict, \
+    write_binary, load_binary, read_trace_file, write_trace_file, CannotLoadTrace, ACTION_RECORD, \
+    decode_trace, encode_trace, open_trace, read_trace, _decode_action
 
 PLAYER_1 = 0
 PLAYER_2 = 1
@@ -85,6 +92,409 @@ class TestTrace(unittest.TestCase):
             self.assertEqual(replay['winner'], 1)
 
 
+class BeeLineAgent(Agent):
+    """Agent always moving along its shortest path."""
+
+    def play(self, percepts, player, step, time_left):
+        i, j = percepts.get_shortest_path(player)[0]
+        return MOVE, i, j
+
+
+class TestStreamingTrace(unittest.TestCase):
+
+    def setUp(self):
+        self.replay_file_name = "./" + REPLAY_FILENAME_ROOT + str(uuid.uuid4()) + ".jsonl"
+
+    def tearDown(self):
+        if os.path.exists(self.replay_file_name):
+            os.remove(self.replay_file_name)
+
+    def play(self, file):
+        initial_board = Board()
+        initial_board.move_pawn((6, 4), PLAYER_1)
+        trace = StreamingTrace(initial_board, [None, None], ['first', 'second'], file)
+        game = Game([BeeLineAgent(), BeeLineAgent()], initial_board, trace=trace)
+        game.play()
+        return game
+
+    def test_board_dict_round_trip(self):
+        board = Board()
+        board.play_action(('WH', 3, 4), PLAYER_1)
+        board.move_pawn((7, 4), PLAYER_2)
+        copy = board_from_dict(json.loads(json.dumps(board_to_dict(board))))
+        self.assertEqual(copy.pawns, board.pawns)
+        self.assertEqual(copy.goals, board.goals)
+        self.assertEqual(copy.horiz_walls, [(3, 4)])
+        self.assertEqual(copy.player_walls, board.player_walls)
+
+    def test_should_write_one_line_per_action(self):
+        with open(self.replay_file_name, "w") as file:
+            trace = StreamingTrace(Board(), [None, None], [], file)
+            with open(self.replay_file_name) as written:
+                self.assertEqual(len(written.readlines()), 1)
+                trace.add_action(PLAYER_1, (MOVE, 1, 4), 0.5)
+                self.assertEqual(json.loads(written.readline()),
+                                 {'player': PLAYER_1, 'action': [MOVE, 1, 4], 't': 0.5})
+
+    def test_export_and_load(self):
+        with open(self.replay_file_name, "w") as file:
+            game = self.play(file)
+        with open(self.replay_file_name) as file:
+            loaded_trace = load_trace(file)
+        self.assertEqual(list(loaded_trace.actions), game.trace.actions)
+        self.assertEqual(list(loaded_trace.metrics), game.trace.metrics)
+        self.assertEqual(loaded_trace.winner, PLAYER_1)
+        self.assertEqual(loaded_trace.players_ranking, [PLAYER_1, PLAYER_2])
+        self.assertEqual(loaded_trace.reasons, [(None, ""), (None, "")])
+        self.assertEqual(loaded_trace.player_names, ['first', 'second'])
+        self.assertEqual(loaded_trace.get_initial_board().pawns, [(6, 4), (8, 4)])
+
+    def test_load_should_decode_actions_on_access(self):
+        with open(self.replay_file_name, "w") as file:
+            game = self.play(file)
+        with open(self.replay_file_name) as file:
+            with patch('game.trace._decode_action', wraps=_decode_action) as decode:
+                loaded_trace = load_trace(file)
+                decode.assert_not_called()
+                self.assertEqual(loaded_trace.actions[-1], game.trace.actions[-1])
+                decode.assert_called_once()
+
+    def test_load_unfinished_game(self):
+        with open(self.replay_file_name, "w") as file:
+            trace = StreamingTrace(Board(), [None, None], [], file)
+            trace.add_action(PLAYER_1, (MOVE, 1, 4), 0.5)
+        with open(self.replay_file_name) as file:
+            loaded_trace = load_trace(file)
+        self.assertEqual(loaded_trace.actions[0], (PLAYER_1, (MOVE, 1, 4), 0.5))
+        self.assertEqual(loaded_trace.players_ranking, [])
+
+    def test_write_should_convert_to_jsonpickle_format(self):
+        with open(self.replay_file_name, "w") as file:
+            game = self.play(file)
+        converted = io.StringIO()
+        game.trace.write(converted)
+        converted.seek(0)
+        self.assertEqual(json.loads(converted.getvalue())['py/object'], 'game.trace.Trace')
+        self.assertEqual(load_trace(converted).actions, game.trace.actions)
+
+    def test_follow_game_in_progress(self):
+        open(self.replay_file_name, "w").close()
+        followed = []
+
+        def follow():
+            with open(self.replay_file_name) as file:
+                trace, actions = follow_trace(file, poll_interval=0.01)
+                followed.extend(actions)
+                followed.append(trace)
+
+        thread = threading.Thread(target=follow)
+        thread.start()
+        with open(self.replay_file_name, "a") as file:
+            game = self.play(file)
+        thread.join(timeout=10)
+        *actions, trace = followed
+        self.assertEqual(actions, game.trace.actions)
+        self.assertEqual(trace.winner, PLAYER_1)
+
+    def test_follow_should_give_up_on_a_dead_game(self):
+        with open(self.replay_file_name, "w") as file:
+            trace = StreamingTrace(Board(), [None, None], [], file)
+            trace.add_action(PLAYER_1, (MOVE, 1, 4), 0.5)
+            # the game dies before finishing its trace
+        with open(self.replay_file_name) as file:
+            followed, actions = follow_trace(file, poll_interval=0.01, idle_timeout=0.05)
+            self.assertEqual(list(actions), [(PLAYER_1, (MOVE, 1, 4), 0.5)])
+        self.assertEqual(followed.players_ranking, [])
+
+    def test_follow_should_reject_an_empty_file(self):
+        open(self.replay_file_name, "w").close()
+        with open(self.replay_file_name) as file:
+            with self.assertRaises(CannotLoadTrace):
+                follow_trace(file, poll_interval=0.01, idle_timeout=0.05)
+
+
+class TraceFileTestCase(unittest.TestCase):
+
+    def setUp(self):
+        initial_board = Board()
+        initial_board.move_pawn((6, 4), PLAYER_1)
+        initial_board.add_wall((2, 3), True, PLAYER_2)
+        self.game = Game([BeeLineAgent(), BeeLineAgent()], initial_board, time_credits=[5.0, 5.0],
+                         player_names=['first', 'second'])
+        self.game.play()
+        self.trace = self.game.trace
+        self.file_names = []
+
+    def tearDown(self):
+        for file_name in self.file_names:
+            os.remove(file_name)
+
+    def file_name(self, extension):
+        file_name = "./" + REPLAY_FILENAME_ROOT + str(uuid.uuid4()) + extension
+        self.file_names.append(file_name)
+        return file_name
+
+    def assertSameTrace(self, loaded_trace, trace):
+        self.assertEqual(list(loaded_trace.actions), trace.actions)
+        self.assertEqual(list(loaded_trace.metrics), trace.metrics)
+        self.assertEqual(loaded_trace.time_limits, trace.time_limits)
+        self.assertEqual(loaded_trace.player_names, trace.player_names)
+        self.assertEqual(loaded_trace.winner, trace.winner)
+        self.assertEqual(loaded_trace.players_ranking, trace.players_ranking)
+        self.assertEqual(loaded_trace.reasons, trace.reasons)
+        loaded_board = loaded_trace.get_initial_board()
+        initial_board = trace.get_initial_board()
+        self.assertEqual(loaded_board.pawns, initial_board.pawns)
+        self.assertEqual(loaded_board.goals, initial_board.goals)
+        self.assertEqual(loaded_board.horiz_walls, initial_board.horiz_walls)
+        self.assertEqual(loaded_board.player_walls, initial_board.player_walls)
+
+
+class TestBinaryTrace(TraceFileTestCase):
+
+    def test_export_and_load(self):
+        file = io.BytesIO()
+        write_binary(self.trace, file)
+        file.seek(0)
+        self.assertSameTrace(load_binary(file), self.trace)
+
+    def test_random_access(self):
+        file = io.BytesIO()
+        write_binary(self.trace, file)
+        file.seek(0)
+        actions = load_binary(file).actions
+        self.assertEqual(actions[-1], self.trace.actions[-1])
+        self.assertEqual(actions[1:], self.trace.actions[1:])
+        with self.assertRaises(IndexError):
+            actions[len(self.trace.actions)]
+
+    def test_sequence_methods(self):
+        file = io.BytesIO()
+        write_binary(self.trace, file)
+        file.seek(0)
+        actions = load_binary(file).actions
+        self.assertEqual(actions.count(self.trace.actions[0]), 1)
+        self.assertEqual(actions.index(self.trace.actions[1]), 1)
+
+    def test_should_be_smaller_than_jsonpickle(self):
+        binary, text = io.BytesIO(), io.StringIO()
+        write_binary(self.trace, binary)
+        self.trace.write(text)
+        self.assertLess(len(binary.getvalue()), len(text.getvalue()) / 2)
+        self.assertGreaterEqual(len(binary.getvalue()), len(self.trace.actions) * ACTION_RECORD.size)
+
+    def test_should_reject_other_files(self):
+        with self.assertRaises(CannotLoadTrace):
+            load_binary(io.BytesIO(b'{"py/object": "game.trace.Trace"}'))
+
+    def test_convert_between_formats(self):
+        source = self.trace
+        for extension in ('.qtrace', '.jsonl', '.json', '.qtrace'):
+            file_name = self.file_name(extension)
+            write_trace_file(source, file_name)
+            source = read_trace_file(file_name)
+            self.assertSameTrace(source, self.trace)
+
+
+class TestDecodeTrace(unittest.TestCase):
+
+    def setUp(self):
+        initial_board = Board()
+        initial_board.add_wall((2, 3), False, PLAYER_2)
+        trace = Trace(initial_board, [10.0, None], ['first', 'second'])
+        trace.add_action(PLAYER_1, (MOVE, 1, 4), 0.25)
+        trace.add_action(PLAYER_2, (WALL_H, 4, 4), 1)
+        trace.set_ranking([PLAYER_2, PLAYER_1])
+        trace.set_reasons([(2, 'Timeout'), (None, "")])
+        trace.set_winner(PLAYER_2, "")
+        file = io.StringIO()
+        trace.write(file)
+        self.text = file.getvalue()
+        self.trace = trace
+
+    def test_should_match_jsonpickle(self):
+        decoded = decode_trace(self.text)
+        reference = jsonpickle.decode(self.text)
+        for field in ('time_limits', 'actions', 'winner', 'reason', 'player_names',
+                      'players_ranking', 'reasons', 'metrics'):
+            self.assertEqual(getattr(decoded, field), getattr(reference, field), field)
+        for field in ('player_count', 'pawns', 'goals', 'starting_wall_count', 'player_walls',
+                      'horiz_walls', 'verti_walls'):
+            self.assertEqual(getattr(decoded.initial_board, field),
+                             getattr(reference.initial_board, field), field)
+
+    def test_should_resolve_jsonpickle_references(self):
+        # jsonpickle writes an object appearing twice once, then as {"py/id": N}
+        shared = [PLAYER_2, PLAYER_1]
+        self.trace.set_ranking(shared)
+        self.trace.add_metrics({'step': 1, 'ranking': shared})
+        self.trace.add_metrics({'step': 2, 'ranking': shared})
+        text = jsonpickle.encode(self.trace)
+        self.assertIn('"py/id"', text)
+        decoded = decode_trace(text)
+        reference = jsonpickle.decode(text)
+        self.assertEqual(decoded.players_ranking, reference.players_ranking)
+        self.assertEqual(decoded.metrics, reference.metrics)
+        self.assertEqual(decoded.actions, reference.actions)
+        self.assertEqual(decoded.reasons, reference.reasons)
+        self.assertEqual(decoded.metrics[1]['ranking'], [PLAYER_2, PLAYER_1])
+
+    def test_should_reject_invalid_references(self):
+        for index in (-1, 1000, 'actions', None):
+            data = json.loads(self.text)
+            data['players_ranking'] = {'py/id': index}
+            with self.assertRaises(CannotLoadTrace, msg=repr(index)):
+                decode_trace(json.dumps(data))
+
+    def test_should_accept_traces_without_optional_fields(self):
+        data = json.loads(self.text)
+        for field in ('player_names', 'players_ranking', 'reasons', 'metrics'):
+            del data[field]
+        self.assertEqual(decode_trace(json.dumps(data)).player_names, [])
+
+    def test_should_reject_other_objects(self):
+        data = json.loads(self.text)
+        data['py/object'] = 'os.system'
+        with self.assertRaises(CannotLoadTrace):
+            decode_trace(json.dumps(data))
+        data = json.loads(self.text)
+        data['initial_board']['py/object'] = 'subprocess.Popen'
+        with self.assertRaises(CannotLoadTrace):
+            decode_trace(json.dumps(data))
+
+    def test_should_reject_invalid_fields(self):
+        for field, value in [('winner', 'first'), ('actions', [{'py/tuple': [0, ['X', 1, 1], 0.0]}]),
+                             ('time_limits', None), ('reasons', [1])]:
+            data = json.loads(self.text)
+            data[field] = value
+            with self.assertRaises(CannotLoadTrace, msg=field):
+                decode_trace(json.dumps(data))
+        with self.assertRaises(CannotLoadTrace):
+            decode_trace(self.text[:-10])
+        data = json.loads(self.text)
+        del data['actions']
+        with self.assertRaises(CannotLoadTrace):
+            decode_trace(json.dumps(data))
+
+
+class TestCompressedTrace(TraceFileTestCase):
+
+    def test_write_should_match_jsonpickle(self):
+        self.assertEqual(''.join(encode_trace(self.trace)), jsonpickle.encode(self.trace))
+        self.assertGreater(len(list(encode_trace(self.trace))), len(self.trace.actions))
+
+    def test_every_format_and_compression(self):
+        for extension in ('.json', '.jsonl', '.qtrace'):
+            for compression, magic in (('.gz', b'\x1f\x8b'), ('.bz2', b'BZh'), ('.xz', b'\xfd7zXZ')):
+                file_name = self.file_name(extension + compression)
+                write_trace_file(self.trace, file_name)
+                with open(file_name, 'rb') as file:
+                    self.assertEqual(file.read(len(magic)), magic)
+                self.assertSameTrace(read_trace_file(file_name), self.trace)
+
+    def test_compression_ratio(self):
+        for step in range(200):
+            self.trace.add_action(step % 2, (MOVE, step % 9, 4), 0.5)
+        plain, compressed = self.file_name('.json'), self.file_name('.json.xz')
+        write_trace_file(self.trace, plain)
+        write_trace_file(self.trace, compressed)
+        self.assertLess(os.path.getsize(compressed), os.path.getsize(plain) / 10)
+
+    def test_compression_flag(self):
+        file_name = self.file_name('.json')
+        write_trace_file(self.trace, file_name, compression='.gz')
+        with open(file_name, 'rb') as file:
+            self.assertEqual(file.read(2), b'\x1f\x8b')
+        self.assertSameTrace(read_trace_file(file_name), self.trace)
+
+    def test_read_trace_from_an_open_file(self):
+        for extension in ('.json.gz', '.qtrace'):
+            file_name = self.file_name(extension)
+            write_trace_file(self.trace, file_name)
+            with open(file_name, 'rb') as file:
+                # e.g. sys.stdin.buffer, of which only the name is known
+                self.assertSameTrace(read_trace(file, '<stdin>'), self.trace)
+
+    def test_truncated_or_corrupt_files_should_not_load(self):
+        for extension in ('.json', '.jsonl', '.qtrace'):
+            for compression in ('', '.gz', '.bz2', '.xz'):
+                file_name = self.file_name(extension + compression)
+                write_trace_file(self.trace, file_name)
+                with open(file_name, 'rb') as file:
+                    content = file.read()
+                middle = len(content) // 2
+                corrupts = [content[:middle]]
+                if compression:
+                    # checked by the decompression, unlike the records of a binary trace
+                    corrupts.append(content[:middle] + b'\xff' * 8 + content[middle + 8:])
+                for corrupt in corrupts:
+                    with open(file_name, 'wb') as file:
+                        file.write(corrupt)
+                    with self.assertRaises(CannotLoadTrace, msg=file_name):
+                        read_trace_file(file_name)
+
+    def test_stream_compressed_game(self):
+        file_name = self.file_name('.jsonl.gz')
+        initial_board = Board()
+        initial_board.move_pawn((6, 4), PLAYER_1)
+        with open_trace(file_name, 'w') as file:
+            trace = StreamingTrace(initial_board, [None, None], [], file)
+            Game([BeeLineAgent(), BeeLineAgent()], initial_board, trace=trace).play()
+        self.assertEqual(list(read_trace_file(file_name).actions), trace.actions)
+
+
+class TestBoardSnapshots(unittest.TestCase):
+
+    def setUp(self):
+        self.trace = Trace(Board(), [None, None])
+        board = Board()
+        for step in range(40):
+            if board.is_finished():
+                break
+            player = step % 2
+            if step < 10:
+                action = (WALL_H, 2 * (step // 4), 2 * (step % 4))
+            else:
+                i, j = board.get_shortest_path(player)[0]
+                action = (MOVE, i, j)
+            board.play_action(action, player)
+            self.trace.add_action(player, action, 0.0)
+        self.boards = [Board()]
+        for player, action, t in self.trace.actions:
+            self.boards.append(self.boards[-1].clone().play_action(action, player))
+
+    def assertSameBoard(self, board, expected):
+        self.assertEqual(board.pawns, expected.pawns)
+        self.assertEqual(board.horiz_walls, expected.horiz_walls)
+        self.assertEqual(board.player_walls, expected.player_walls)
+
+    def test_every_step_in_any_order(self):
+        snapshots = self.trace.snapshots(interval=8)
+        self.assertEqual(len(snapshots), len(self.boards))
+        last = len(self.boards) - 1
+        for step in [last, 0, 17, 16, 3, last - 1, last - 2, 18, 19, 20, 2, -1]:
+            self.assertSameBoard(snapshots[step], self.boards[step])
+
+    def test_should_apply_at_most_interval_actions(self):
+        snapshots = self.trace.snapshots(interval=8)
+        snapshots[-1]  # computes the keyframes once
+        with patch.object(Board, 'apply_action', autospec=True,
+                          side_effect=Board.apply_action) as apply_action:
+            for step in reversed(range(len(snapshots))):
+                snapshots[step]
+                self.assertLess(apply_action.call_count, 8)
+                apply_action.reset_mock()
+
+    def test_returned_boards_should_be_copies(self):
+        snapshots = self.trace.snapshots()
+        snapshots[3].move_pawn((4, 4), PLAYER_1)
+        self.assertSameBoard(snapshots[3], self.boards[3])
+
+    def test_should_reject_out_of_range_steps(self):
+        with self.assertRaises(IndexError):
+            self.trace.snapshots()[len(self.boards)]
+
+
 if __name__ == '__main__':
     unittest.main(
         testRunner=xmlrunner.XMLTestRunner(output='test-reports'),
@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import xmlrunner
+
+from game.constants import MOVE
+from game.game import Game, TimeCreditExpiredError
+from game.quoridor import Board, Agent
+from game.trace import write_trace_file
+from game.trace_index import TraceIndex
+
+PLAYER_1 = 0
+PLAYER_2 = 1
+
+
+class BeeLineAgent(Agent):
+    """Agent always moving along its shortest path."""
+
+    def play(self, percepts, player, step, time_left):
+        i, j = percepts.get_shortest_path(player)[0]
+        return MOVE, i, j
+
+
+class SlowAgent(Agent):
+    """Agent always exceeding its time credit."""
+
+    def play(self, percepts, player, step, time_left):
+        raise TimeCreditExpiredError(player)
+
+
+def play(names, agents, board=None):
+    game = Game(agents, board or Board(), time_credits=[10.0, 10.0], player_names=names)
+    game.play()
+    return game.trace
+
+
+class TestTraceIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.index = TraceIndex(os.path.join(self.directory, 'index.db'))
+        self.traces = os.path.join(self.directory, 'traces')
+        os.mkdir(self.traces)
+        board = Board()
+        board.move_pawn((6, 4), PLAYER_1)
+        self.write('a.json', play(['alpha', 'beta'], [BeeLineAgent(), BeeLineAgent()], board))
+        self.write('b.jsonl', play(['beta', 'alpha'], [BeeLineAgent(), BeeLineAgent()]))
+        self.write('c.qtrace', play(['alpha', 'gamma'], [SlowAgent(), BeeLineAgent()]))
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.directory)
+
+    def write(self, name, trace):
+        write_trace_file(trace, os.path.join(self.traces, name))
+
+    def test_ingest_every_format(self):
+        self.assertEqual(self.index.ingest([self.traces]),
+                         {'added': 3, 'updated': 0, 'unchanged': 0, 'failed': 0})
+        self.assertEqual(self.index.query('SELECT count(*) FROM games'), [(3,)])
+        steps = self.index.query('SELECT sum(steps) FROM games')[0][0]
+        self.assertEqual(self.index.query('SELECT count(*) FROM actions'), [(steps,)])
+        self.assertEqual(self.index.query('SELECT count(*) FROM timings'), [(steps,)])
+
+    def test_queries(self):
+        self.index.ingest([self.traces])
+        losses = self.index.losses('alpha', 'Timeout')
+        self.assertEqual([os.path.basename(path) for path, *_ in losses], ['c.qtrace'])
+        self.assertEqual(self.index.losses('alpha', 'Invalid'), [])
+        pairings = self.index.pairings()
+        self.assertEqual([(team1, team2, games) for team1, team2, games, _ in pairings],
+                         [('alpha', 'beta', 2), ('alpha', 'gamma', 1)])
+        self.assertEqual(self.index.query(
+            'SELECT winner_name, count(*) FROM games GROUP BY winner_name ORDER BY winner_name'),
+            [('alpha', 2), ('gamma', 1)])
+
+    def test_ingest_should_be_incremental(self):
+        self.index.ingest([self.traces])
+        self.assertEqual(self.index.ingest([self.traces])['unchanged'], 3)
+
+        time.sleep(0.01)
+        self.write('a.json', play(['alpha', 'delta'], [BeeLineAgent(), BeeLineAgent()]))
+        os.remove(os.path.join(self.traces, 'b.jsonl'))
+        self.assertEqual(self.index.ingest([self.traces]),
+                         {'added': 0, 'updated': 1, 'unchanged': 1, 'failed': 0})
+        self.assertEqual(self.index.remove_missing(), 1)
+        self.assertEqual(self.index.query('SELECT name FROM players ORDER BY name'),
+                         [('alpha',), ('alpha',), ('delta',), ('gamma',)])
+
+    def test_parallel_ingestion(self):
+        with open(os.path.join(self.traces, 'broken.json'), 'w') as f:
+            f.write('{"py/object": "os.system"}')
+        counts = self.index.ingest([self.traces], workers=2)
+        self.assertEqual(counts, {'added': 3, 'updated': 0, 'unchanged': 0, 'failed': 1})
+
+    def test_bad_traces_should_be_skipped(self):
+        truncated = os.path.join(self.traces, 'truncated.json.gz')
+        write_trace_file(play(['alpha', 'beta'], [BeeLineAgent(), BeeLineAgent()]), truncated)
+        with open(truncated, 'rb') as f:
+            content = f.read()
+        with open(truncated, 'wb') as f:
+            f.write(content[:len(content) // 2])
+        inconsistent = play(['alpha', 'beta'], [BeeLineAgent(), BeeLineAgent()])
+        inconsistent.set_reasons([(None, '')])
+        self.write('inconsistent.json', inconsistent)
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                self.index.connection.execute('DELETE FROM games')
+                self.assertEqual(self.index.ingest([self.traces], workers=workers),
+                                 {'added': 3, 'updated': 0, 'unchanged': 0, 'failed': 2})
+                self.assertEqual(self.index.query('SELECT count(*) FROM games'), [(3,)])
+
+    def test_missing_files_should_be_skipped(self):
+        os.symlink(os.path.join(self.traces, 'missing.json'), os.path.join(self.traces, 'link.json'))
+        self.assertEqual(self.index.ingest([self.traces]),
+                         {'added': 3, 'updated': 0, 'unchanged': 0, 'failed': 1})
+
+
+if __name__ == '__main__':
+    unittest.main(
+        testRunner=xmlrunner.XMLTestRunner(output='test-reports'),
+        # these make sure that some options that are not applicable
+        # remain hidden from the help menu.
+        failfast=False, buffer=False, catchbreak=False)
@@ -0,0 +1,123 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import xmlrunner
+
+from game.constants import MOVE, WALL_H, WALL_V
+from game.quoridor import Board
+from game.trace import CannotLoadTrace, Trace, write_trace_file
+from game.trace_pack import TracePack, pack_files, write_pack
+
+PLAYER_1 = 0
+PLAYER_2 = 1
+
+
+def make_trace(names, actions, winner):
+    trace = Trace(Board(), [10.0, 20.0], names)
+    for player, action, t in actions:
+        trace.add_action(player, action, t)
+    trace.set_winner(winner, "Goal reached")
+    trace.set_ranking([winner, 1 - winner])
+    return trace
+
+
+class TestTracePack(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'archive.qpack')
+        self.traces = [
+            make_trace(['alpha', 'beta'], [(PLAYER_1, (MOVE, 1, 4), 0.1),
+                                           (PLAYER_2, (WALL_H, 5, 3), 0.2),
+                                           (PLAYER_1, (MOVE, 2, 4), 0.3)], PLAYER_1),
+            make_trace(['beta', 'gamma'], [], PLAYER_2),
+            make_trace(['gamma', 'alpha'], [(PLAYER_1, (WALL_V, 0, 0), 0.4),
+                                            (PLAYER_2, (MOVE, 7, 4), 0.5)], PLAYER_2),
+        ]
+        with open(self.path, 'wb') as f:
+            self.assertEqual(write_pack(self.traces, f), 3)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_traces_should_be_restored(self):
+        with TracePack(self.path) as archive:
+            self.assertEqual(len(archive), len(self.traces))
+            for trace, expected in zip(archive, self.traces):
+                self.assertEqual(list(trace.actions), expected.actions)
+                self.assertEqual(trace.initial_board.pawns, expected.initial_board.pawns)
+                self.assertEqual(trace.player_names, expected.player_names)
+                self.assertEqual(trace.time_limits, expected.time_limits)
+                self.assertEqual(trace.winner, expected.winner)
+                self.assertEqual(list(trace.players_ranking), expected.players_ranking)
+            self.assertEqual(archive[-1].player_names, ['gamma', 'alpha'])
+
+    def test_actions_should_be_views_of_the_file(self):
+        with TracePack(self.path) as archive:
+            self.assertEqual(len(archive.actions), 5)
+            self.assertFalse(archive.actions.flags.owndata)
+            self.assertFalse(archive.actions.flags.writeable)
+            np.testing.assert_array_equal(archive.games['action_count'], [3, 0, 2])
+            actions = archive.game_actions(2)
+            np.testing.assert_array_equal(actions['i'], [0, 7])
+            np.testing.assert_allclose(actions['think'], [0.4, 0.5])
+            self.assertEqual(len(archive.game_actions(1)), 0)
+
+    def test_snapshots_of_packed_trace(self):
+        with TracePack(self.path) as archive:
+            boards = archive[0].snapshots()
+            self.assertEqual(len(boards), 4)
+            self.assertEqual(boards[3].pawns[PLAYER_1], (2, 4))
+
+    def test_other_file_should_not_load(self):
+        path = os.path.join(self.directory, 'other')
+        with open(path, 'wb') as f:
+            f.write(b'not a pack at all, but long enough for a header')
+        with self.assertRaises(CannotLoadTrace):
+            TracePack(path)
+
+    def test_pack_files_should_skip_unreadable_traces(self):
+        traces = os.path.join(self.directory, 'traces')
+        os.makedirs(traces)
+        for name, trace in zip(('a.json', 'c.qtrace'), self.traces):
+            write_trace_file(trace, os.path.join(traces, name))
+        with open(os.path.join(traces, 'b.json'), 'w') as f:
+            f.write('not a trace')
+        self.assertEqual(pack_files([traces], self.path), 2)
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+        with TracePack(self.path) as archive:
+            self.assertEqual([trace.player_names for trace in archive],
+                             [['alpha', 'beta'], ['beta', 'gamma']])
+
+    def test_failed_pack_should_keep_the_previous_archive(self):
+        with open(self.path, 'rb') as f:
+            content = f.read()
+        trace_file = os.path.join(self.directory, 'a.json')
+        write_trace_file(self.traces[0], trace_file)
+        with patch('game.trace_pack.read_trace_file', side_effect=[self.traces[0], MemoryError]):
+            with self.assertRaises(MemoryError):
+                pack_files([trace_file, trace_file], self.path)
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), content)
+
+    def test_empty_or_truncated_pack_should_not_load(self):
+        with open(self.path, 'rb') as f:
+            content = f.read()
+        for size in (0, len(content) // 2):
+            with open(self.path, 'wb') as f:
+                f.write(content[:size])
+            with self.assertRaises(CannotLoadTrace):
+                TracePack(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main(
+        testRunner=xmlrunner.XMLTestRunner(output='test-reports'),
+        # these make sure that some options that are not applicable
+        # remain hidden from the help menu.
+        failfast=False, buffer=False, catchbreak=False)
@@ -0,0 +1,110 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import xmlrunner
+
+from game.constants import MOVE, WALL_H
+from game.game import Game, TimeCreditExpiredError
+from game.quoridor import Board, Agent
+from game.trace import write_trace_file
+from game.verify import verify_trace, verify_file, verify_files
+
+PLAYER_1 = 0
+PLAYER_2 = 1
+
+
+class ScriptedAgent(Agent):
+    """Agent placing the walls given and then moving along its shortest path."""
+
+    def __init__(self, walls=()):
+        self.walls = list(walls)
+
+    def play(self, percepts, player, step, time_left):
+        if self.walls:
+            return self.walls.pop(0)
+        i, j = percepts.get_shortest_path(player)[0]
+        return MOVE, i, j
+
+
+class SlowAgent(Agent):
+    """Agent always exceeding its time credit."""
+
+    def play(self, percepts, player, step, time_left):
+        raise TimeCreditExpiredError(player)
+
+
+def play(agents, player_count=2):
+    game = Game(agents, Board(player_count=player_count))
+    game.play()
+    return game.trace
+
+
+class TestVerify(unittest.TestCase):
+
+    def test_played_games_should_be_consistent(self):
+        traces = [play([ScriptedAgent([(WALL_H, 4, 3)]), ScriptedAgent()]),
+                  play([SlowAgent(), ScriptedAgent()]),
+                  play([ScriptedAgent(), ScriptedAgent(), SlowAgent(), ScriptedAgent()], 4)]
+        for trace in traces:
+            verification = verify_trace(trace)
+            self.assertEqual(verification.mismatches, [])
+            self.assertEqual(verification.steps, len(trace.actions))
+            self.assertEqual(len(verification.scores), len(trace.initial_board.pawns))
+
+    def test_should_report_wrong_outcome(self):
+        trace = play([ScriptedAgent(), ScriptedAgent()])
+        loser = trace.players_ranking[1]
+        trace.set_winner(loser, "")
+        trace.set_ranking(list(reversed(trace.players_ranking)))
+        mismatches = verify_trace(trace).mismatches
+        self.assertEqual(len(mismatches), 2)
+        self.assertTrue(mismatches[0].startswith(f'winner {loser}'))
+
+    def test_should_report_illegal_actions(self):
+        trace = play([ScriptedAgent(), ScriptedAgent()])
+        player, _, t = trace.actions[2]
+        trace.actions[2] = (player, (MOVE, 4, 4), t)
+        self.assertEqual(verify_trace(trace).mismatches,
+                         [f"action 3: illegal action ('P', 4, 4) of player {player}"])
+        self.assertEqual(verify_trace(trace).steps, 3)
+
+    def test_verify_files_in_parallel(self):
+        directory = tempfile.mkdtemp()
+        try:
+            paths = []
+            for k in range(4):
+                paths.append(os.path.join(directory, f'{k}.json'))
+                write_trace_file(play([ScriptedAgent(), ScriptedAgent()]), paths[-1])
+            with open(paths[1], 'w') as f:
+                f.write('not a trace')
+            verifications = list(verify_files(paths, workers=2))
+            self.assertEqual([verification.path for verification in verifications], paths)
+            self.assertEqual([verification.ok for verification in verifications],
+                             [True, False, True, True])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_should_report_truncated_files(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'truncated.json.gz')
+            write_trace_file(play([ScriptedAgent(), ScriptedAgent()]), path)
+            with open(path, 'rb') as f:
+                content = f.read()
+            with open(path, 'wb') as f:
+                f.write(content[:len(content) // 2])
+            verification = verify_file(path)
+            self.assertFalse(verification.ok)
+            self.assertTrue(verification.mismatches[0].startswith('cannot load trace: EOFError'))
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main(
+        testRunner=xmlrunner.XMLTestRunner(output='test-reports'),
+        # these make sure that some options that are not applicable
+        # remain hidden from the help menu.
+        failfast=False, buffer=False, catchbreak=False)
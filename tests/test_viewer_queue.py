@@ -0,0 +1,134 @@
+import threading
+import time
+import unittest
+
+import xmlrunner
+
+from game.constants import MOVE, WALL_H
+from game.game import Game, Viewer
+from game.quoridor import Agent, Board
+from game.viewer_queue import QueuedViewer
+
+PLAYER_1 = 0
+PLAYER_2 = 1
+
+
+class RecordingViewer(Viewer):
+    """Viewer recording the events it receives, slowly if delay is given."""
+
+    def __init__(self, delay=0.0):
+        super().__init__()
+        self.delay = delay
+        self.events = []
+
+    def playing(self, step, player):
+        self.events.append(('playing', step, player))
+
+    def update(self, step, action, player):
+        time.sleep(self.delay)
+        self.board.apply_action(action, player)
+        self.events.append(('update', step, action, player))
+
+    def show(self, step, board):
+        time.sleep(self.delay)
+        super().show(step, board)
+        self.events.append(('show', step))
+
+    def finished(self, steps, winner, reason=""):
+        self.events.append(('finished', steps, winner))
+
+    def play(self, percepts, player, step, time_left):
+        self.events.append(('play', step))
+        i, j = self.board.get_shortest_path(player)[0]
+        return MOVE, i, j
+
+
+class BeeLineAgent(Agent):
+    """Agent always moving along its shortest path."""
+
+    def play(self, percepts, player, step, time_left):
+        i, j = percepts.get_shortest_path(player)[0]
+        return MOVE, i, j
+
+
+class TestQueuedViewer(unittest.TestCase):
+
+    def setUp(self):
+        self.target = RecordingViewer()
+        self.queue = QueuedViewer(self.target, capacity=8)
+        self.queue.init_viewer(Board())
+
+    def test_single_update_should_be_forwarded(self):
+        self.queue.playing(1, PLAYER_1)
+        self.queue.update(1, (MOVE, 1, 4), PLAYER_1)
+        self.assertEqual(self.target.events, [])
+        self.assertEqual(self.queue.drain(), 2)
+        self.assertEqual(self.target.events,
+                         [('playing', 1, PLAYER_1), ('update', 1, (MOVE, 1, 4), PLAYER_1)])
+        self.assertEqual(self.target.board.pawns, self.queue.board.pawns)
+
+    def test_burst_should_be_collapsed_to_latest_board(self):
+        for step, (action, player) in enumerate([((MOVE, 1, 4), PLAYER_1),
+                                                 ((WALL_H, 3, 3), PLAYER_2),
+                                                 ((MOVE, 2, 4), PLAYER_1)], 1):
+            self.queue.playing(step, player)
+            self.queue.update(step, action, player)
+        self.queue.playing(4, PLAYER_2)
+        self.queue.finished(4, PLAYER_1)
+        self.assertEqual(self.queue.drain(), 3)
+        self.assertEqual(self.target.events,
+                         [('show', 3), ('playing', 4, PLAYER_2), ('finished', 4, PLAYER_1)])
+        self.assertEqual(self.target.board.pawns[PLAYER_1], (2, 4))
+        self.assertEqual(self.target.board.horiz_walls, [(3, 3)])
+        self.assertIsNot(self.target.board, self.queue.board)
+        self.assertTrue(self.queue.is_finished)
+
+    def test_queue_should_be_bounded(self):
+        board = Board()
+        for step in range(1, 101):
+            player = (step + 1) % 2
+            i, j = board.get_shortest_path(player)[0]
+            board.apply_action((MOVE, i, j), player)
+            self.queue.playing(step, player)
+            self.queue.update(step, (MOVE, i, j), player)
+            self.assertLessEqual(len(self.queue._events), self.queue.capacity)
+            if board.is_finished():
+                break
+        self.queue.drain()
+        self.assertEqual(self.target.board.pawns, board.pawns)
+
+    def test_human_should_play_on_current_board(self):
+        self.queue.update(1, (MOVE, 1, 4), PLAYER_1)
+        drainer = threading.Timer(0.05, self.queue.drain)
+        drainer.start()
+        self.queue.play(self.queue.board.clone(), PLAYER_2, 2, 10.0)
+        drainer.join()
+        self.assertEqual(self.target.events[-1], ('play', 2))
+        self.assertEqual(self.target.board.pawns[PLAYER_1], (1, 4))
+
+
+class TestQueuedGame(unittest.TestCase):
+
+    def test_game_should_not_wait_for_slow_viewer(self):
+        target = RecordingViewer(delay=0.05)
+        queue = QueuedViewer(target)
+        game = Game([BeeLineAgent(), BeeLineAgent()], Board(), queue)
+        start = time.perf_counter()
+        game.play()
+        # 16 steps rendered one by one would take 0.8s
+        self.assertLess(time.perf_counter() - start, 0.4)
+
+        renderer = threading.Thread(target=queue.run, args=(100,))
+        renderer.start()
+        renderer.join(5)
+        self.assertFalse(renderer.is_alive())
+        self.assertEqual(target.events[-1], ('finished', game.step, game.trace.winner))
+        self.assertEqual(target.board.pawns, game.board.pawns)
+
+
+if __name__ == '__main__':
+    unittest.main(
+        testRunner=xmlrunner.XMLTestRunner(output='test-reports'),
+        # these make sure that some options that are not applicable
+        # remain hidden from the help menu.
+        failfast=False, buffer=False, catchbreak=False)